@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import TaskRollup
+
+@admin.register(TaskRollup)
+class TaskRollupAdmin(admin.ModelAdmin):
+    list_display = ('task_version', 'granularity', 'bucket_start', 'count', 'failed', 'duration_max', 'peak_rss')
+    list_filter = ('granularity', 'bucket_start')
+    search_fields = ('task__name',)
+    readonly_fields = ('updated_at',)
+    date_hierarchy = 'bucket_start'
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class MetricsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.metrics'
+    verbose_name = 'Metrics'
+
+    def ready(self):
+        import apps.metrics.signals  # noqa
\ No newline at end of file
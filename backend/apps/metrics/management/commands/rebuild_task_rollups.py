@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.tasks.models import TaskExecution
+from ...models import TaskRollup
+from ...rollups import FINISHED_STATUSES, record_execution
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los rollups a partir de las ejecuciones terminadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', type=int, help='Solo esta tarea')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, task, batch_size, **options):
+        # Los aciertos de la caché de resultados no se ejecutan: igual que en
+        # record_execution, no cuentan
+        executions = (
+            TaskExecution.objects.filter(status__in=FINISHED_STATUSES, cached_from__isnull=True)
+            .select_related('task_version')
+        )
+        rollups = TaskRollup.objects.all()
+        if task:
+            executions = executions.filter(task_version__task_id=task)
+            rollups = rollups.filter(task_id=task)
+
+        with transaction.atomic():
+            rollups.delete()
+            count = 0
+            for execution in executions.defer('logs').iterator(chunk_size=batch_size):
+                record_execution(execution)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups from {count} executions'))
@@ -0,0 +1,51 @@
+from django.db import models
+from apps.tasks.models import Task, TaskVersion
+
+# Límites superiores (segundos) de los buckets del histograma de duración;
+# el último bucket recoge todo lo que supera el último límite
+DURATION_BUCKETS = [0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600]
+
+def empty_histogram():
+    return [0] * (len(DURATION_BUCKETS) + 1)
+
+class TaskRollup(models.Model):
+    """
+    Agregado de las ejecuciones de una versión de tarea en una hora o un día,
+    actualizado cada vez que termina una ejecución
+    """
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='rollups')
+    task_version = models.ForeignKey(TaskVersion, on_delete=models.CASCADE, related_name='rollups')
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    timeout = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    duration_sum = models.FloatField(default=0)  # Segundos
+    duration_max = models.FloatField(default=0)
+    duration_histogram = models.JSONField(default=empty_histogram)
+    peak_rss = models.BigIntegerField(default=0)  # Bytes
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-bucket_start']
+        verbose_name = 'Task Rollup'
+        verbose_name_plural = 'Task Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task_version', 'granularity', 'bucket_start'],
+                name='unique_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['task', 'granularity', '-bucket_start'], name='rollup_task_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_version} - {self.granularity} {self.bucket_start:%Y-%m-%d %H:%M}"
\ No newline at end of file
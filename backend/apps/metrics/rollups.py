@@ -0,0 +1,142 @@
+import bisect
+from collections import Counter
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.tasks.sampling import decode_series
+from .models import DURATION_BUCKETS, TaskRollup, empty_histogram
+
+FINISHED_STATUSES = ('completed', 'failed', 'timeout', 'cancelled')
+
+
+def bucket_starts(moment):
+    """
+    Inicio de la hora y del día (UTC) que contienen `moment`
+    """
+    moment = moment.astimezone(dt_timezone.utc)
+    hour = moment.replace(minute=0, second=0, microsecond=0)
+    return {'hour': hour, 'day': hour.replace(hour=0)}
+
+
+def execution_duration(execution):
+    if execution.started_at and execution.completed_at:
+        return max((execution.completed_at - execution.started_at).total_seconds(), 0.0)
+    return None
+
+
+def execution_peak_rss(execution):
+    if execution.metrics.get('max_rss'):
+        return int(execution.metrics['max_rss'])
+    if execution.resources.get('series'):
+        return int(max(decode_series(execution.resources)['rss'], default=0))
+    return 0
+
+
+def record_execution(execution):
+    """
+    Suma una ejecución terminada a los rollups horario y diario de su versión.
+    Los aciertos de la caché de resultados no pasan por ningún worker y no
+    cuentan
+    """
+    if execution.status not in FINISHED_STATUSES or execution.cached_from_id:
+        return
+
+    moment = execution.completed_at or timezone.now()
+    duration = execution_duration(execution)
+    peak_rss = execution_peak_rss(execution)
+    version = execution.task_version
+
+    with transaction.atomic():
+        for granularity, start in bucket_starts(moment).items():
+            rollup, _ = TaskRollup.objects.select_for_update().get_or_create(
+                task_version=version,
+                granularity=granularity,
+                bucket_start=start,
+                defaults={'task_id': version.task_id}
+            )
+            rollup.count += 1
+            setattr(rollup, execution.status, getattr(rollup, execution.status) + 1)
+            if duration is not None:
+                rollup.duration_sum += duration
+                rollup.duration_max = max(rollup.duration_max, duration)
+                rollup.duration_histogram[bisect.bisect_left(DURATION_BUCKETS, duration)] += 1
+            rollup.peak_rss = max(rollup.peak_rss, peak_rss)
+            rollup.save()
+
+
+def record_cancelled(executions):
+    """
+    Suma ejecuciones canceladas antes de empezar: sin duración ni memoria,
+    así que basta con un contador por versión y bucket
+    """
+    counts = Counter()
+    for execution in executions:
+        moment = execution.completed_at or timezone.now()
+        version = execution.task_version
+        for granularity, start in bucket_starts(moment).items():
+            counts[(version.pk, version.task_id, granularity, start)] += 1
+
+    with transaction.atomic():
+        for (version_id, task_id, granularity, start), count in counts.items():
+            rollup, _ = TaskRollup.objects.select_for_update().get_or_create(
+                task_version_id=version_id,
+                granularity=granularity,
+                bucket_start=start,
+                defaults={'task_id': task_id}
+            )
+            rollup.count += count
+            rollup.cancelled += count
+            rollup.save()
+
+
+def percentile(histogram, q):
+    """
+    Estimación del percentil `q` (0-1) interpolando dentro del bucket
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        if count and seen + count >= target:
+            lower = DURATION_BUCKETS[index - 1] if index else 0.0
+            if index >= len(DURATION_BUCKETS):
+                return lower
+            upper = DURATION_BUCKETS[index]
+            return lower + (upper - lower) * (target - seen) / count
+        seen += count
+    return DURATION_BUCKETS[-1]
+
+
+def summarize(rollups):
+    """
+    Combina varios rollups en un resumen con tasas y percentiles
+    """
+    histogram = empty_histogram()
+    totals = {'count': 0, 'completed': 0, 'failed': 0, 'timeout': 0, 'cancelled': 0}
+    duration_sum = duration_max = 0.0
+    peak_rss = 0
+    for rollup in rollups:
+        for field in totals:
+            totals[field] += getattr(rollup, field)
+        duration_sum += rollup.duration_sum
+        duration_max = max(duration_max, rollup.duration_max)
+        peak_rss = max(peak_rss, rollup.peak_rss)
+        histogram = [a + b for a, b in zip(histogram, rollup.duration_histogram)]
+
+    timed = sum(histogram)
+    count = totals['count']
+    return {
+        **totals,
+        'failure_rate': (totals['failed'] + totals['timeout']) / count if count else None,
+        'duration_mean': duration_sum / timed if timed else None,
+        'duration_max': duration_max if timed else None,
+        'duration_p50': percentile(histogram, 0.5),
+        'duration_p95': percentile(histogram, 0.95),
+        'duration_p99': percentile(histogram, 0.99),
+        'duration_histogram': {'buckets': DURATION_BUCKETS, 'counts': histogram},
+        'peak_rss': peak_rss,
+    }
\ No newline at end of file
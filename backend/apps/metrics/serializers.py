@@ -0,0 +1,11 @@
+from rest_framework import serializers
+from .models import TaskRollup
+
+class TaskRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaskRollup
+        fields = [
+            'id', 'task', 'task_version', 'granularity', 'bucket_start',
+            'count', 'completed', 'failed', 'timeout', 'cancelled',
+            'duration_sum', 'duration_max', 'duration_histogram', 'peak_rss'
+        ]
\ No newline at end of file
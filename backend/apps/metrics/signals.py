@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.dispatch import receiver
+from apps.tasks.signals import execution_finished, executions_cancelled
+from .rollups import record_cancelled, record_execution
+
+@receiver(execution_finished)
+def update_rollups(sender, execution, **kwargs):
+    """
+    Actualiza los rollups cuando termina una ejecución
+    """
+    transaction.on_commit(lambda: record_execution(execution), robust=True)
+
+@receiver(executions_cancelled)
+def update_rollups_cancelled(sender, executions, **kwargs):
+    """
+    Suma a los rollups las ejecuciones canceladas en bloque
+    """
+    transaction.on_commit(lambda: record_cancelled(executions), robust=True)
\ No newline at end of file
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.tasks.models import Task, TaskVersion, TaskExecution
+from apps.tasks.signals import execution_finished
+from ..models import TaskRollup
+from ..rollups import percentile, record_execution
+
+User = get_user_model()
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(name='Test Task', owner=self.user)
+        self.version = TaskVersion.objects.create(task=self.task, file='test.py')
+        self.now = timezone.now().replace(minute=30)
+
+    def finish(self, status, seconds, max_rss=0):
+        return TaskExecution.objects.create(
+            task_version=self.version,
+            status=status,
+            started_at=self.now - timedelta(seconds=seconds),
+            completed_at=self.now,
+            metrics={'max_rss': max_rss}
+        )
+
+    def test_record_updates_hour_and_day_buckets(self):
+        record_execution(self.finish('completed', 3, max_rss=100))
+        record_execution(self.finish('failed', 40, max_rss=300))
+        record_execution(TaskExecution.objects.create(task_version=self.version, status='running'))
+
+        hour = TaskRollup.objects.get(granularity='hour')
+        day = TaskRollup.objects.get(granularity='day')
+        self.assertEqual(hour.bucket_start.minute, 0)
+        self.assertEqual(day.bucket_start.hour, 0)
+        for rollup in (hour, day):
+            self.assertEqual((rollup.count, rollup.completed, rollup.failed), (2, 1, 1))
+            self.assertEqual(rollup.duration_max, 40)
+            self.assertEqual(rollup.peak_rss, 300)
+            self.assertEqual(sum(rollup.duration_histogram), 2)
+
+    def test_finished_signal_records_after_commit(self):
+        execution = self.finish('completed', 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            execution_finished.send(sender=TaskExecution, execution=execution)
+        self.assertEqual(TaskRollup.objects.filter(task=self.task).count(), 2)
+
+    def test_rebuild_matches_incremental_rollups_with_cache_hits(self):
+        original = self.finish('completed', 30, max_rss=100)
+        with self.captureOnCommitCallbacks(execute=True):
+            execution_finished.send(sender=TaskExecution, execution=original)
+        # Creada ya completada al reutilizar el resultado, sin señal
+        TaskExecution.objects.create(
+            task_version=self.version,
+            status='completed',
+            started_at=self.now,
+            completed_at=self.now,
+            cached_from=original,
+            metrics={'cache': 'hit'}
+        )
+        fields = ('granularity', 'count', 'completed', 'duration_sum', 'duration_histogram', 'peak_rss')
+        incremental = list(TaskRollup.objects.order_by('granularity').values(*fields))
+
+        call_command('rebuild_task_rollups', stdout=StringIO())
+        self.assertEqual(list(TaskRollup.objects.order_by('granularity').values(*fields)), incremental)
+        self.assertEqual(incremental[0]['count'], 1)
+
+    def test_percentile_interpolates_within_bucket(self):
+        # 10 ejecuciones entre 1 y 2 segundos (bucket índice 3)
+        histogram = [0, 0, 0, 10] + [0] * 10
+        self.assertAlmostEqual(percentile(histogram, 0.5), 1.5)
+        self.assertIsNone(percentile([0] * 14, 0.5))
+
+    def test_summary_endpoint(self):
+        for seconds in (1.5, 1.5, 1.5, 50):
+            record_execution(self.finish('completed', seconds))
+        record_execution(self.finish('timeout', 4000))
+
+        response = self.client.get(f'/api/metrics/rollups/summary/?task={self.task.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['failure_rate'], 0.2)
+        self.assertLess(response.data['duration_p50'], 2)
+        self.assertGreaterEqual(response.data['duration_p95'], 60)
+
+        response = self.client.get(f'/api/metrics/rollups/?task={self.task.id}&granularity=day')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_rollups_of_other_users_are_hidden(self):
+        record_execution(self.finish('completed', 1))
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(user=other)
+        response = self.client.get('/api/metrics/rollups/')
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get('/api/metrics/rollups/summary/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
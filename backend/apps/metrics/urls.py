@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import TaskRollupViewSet
+
+router = DefaultRouter()
+router.register(r'rollups', TaskRollupViewSet, basename='taskrollup')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
\ No newline at end of file
@@ -0,0 +1,56 @@
+from rest_framework import viewsets, status, decorators
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from apps.tasks.filters import parse_datetime_param
+from .models import TaskRollup
+from .rollups import summarize
+from .serializers import TaskRollupSerializer
+
+class TaskRollupViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Rollups por tarea y versión. Filtros: ?task=, ?version=,
+    ?granularity=hour|day (hour por defecto), ?since= y ?until=
+    """
+    serializer_class = TaskRollupSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        params = self.request.query_params
+        granularity = params.get('granularity', 'hour')
+        if granularity not in dict(TaskRollup.GRANULARITY_CHOICES):
+            raise ValidationError({'granularity': 'Must be "hour" or "day"'})
+
+        queryset = TaskRollup.objects.filter(
+            task__owner=self.request.user,
+            granularity=granularity
+        )
+        for param, lookup in (('task', 'task_id'), ('version', 'task_version_id')):
+            value = params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: 'Expected an id'})
+                queryset = queryset.filter(**{lookup: int(value)})
+
+        if params.get('since'):
+            queryset = queryset.filter(bucket_start__gte=parse_datetime_param('since', params['since']))
+        if params.get('until'):
+            queryset = queryset.filter(bucket_start__lt=parse_datetime_param('until', params['until']))
+        return queryset
+
+    @decorators.action(detail=False)
+    def summary(self, request):
+        """
+        Resumen de los rollups filtrados: totales, tasa de fallos y
+        percentiles de duración
+        """
+        if not request.query_params.get('task'):
+            return Response(
+                {'error': 'task is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rollups = self.get_queryset().only(
+            'count', 'completed', 'failed', 'timeout', 'cancelled',
+            'duration_sum', 'duration_max', 'duration_histogram', 'peak_rss'
+        )
+        return Response(summarize(rollups))
\ No newline at end of file
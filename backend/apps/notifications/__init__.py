@@ -0,0 +1 @@
+default_app_config = 'apps.notifications.apps.NotificationsConfig'
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import NotificationChannel
+
+@admin.register(NotificationChannel)
+class NotificationChannelAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'kind', 'target', 'task', 'enabled')
+    list_filter = ('kind', 'enabled')
+    search_fields = ('name', 'target', 'owner__username')
+    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class NotificationsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.notifications'
+    verbose_name = 'Notifications'
+
+    def ready(self):
+        import apps.notifications.signals  # noqa
\ No newline at end of file
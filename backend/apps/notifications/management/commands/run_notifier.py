@@ -0,0 +1,16 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from ...notifier import Notifier
+
+
+class Command(BaseCommand):
+    help = 'Envía por lotes los avisos de ejecuciones terminadas; se pueden correr varias réplicas a la vez'
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: stopping.set())
+        Notifier().run(stopping)
\ No newline at end of file
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import models
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from apps.tasks.models import Task
+
+User = get_user_model()
+
+def default_statuses():
+    return ['failed', 'timeout']
+
+def is_slack_webhook(url):
+    """
+    Solo webhooks entrantes de Slack: el notificador no debe hacer peticiones
+    a hosts que elija el usuario
+    """
+    return url.startswith(settings.SLACK_WEBHOOK_URL) and not any(char.isspace() or char == '\\' for char in url)
+
+class NotificationChannel(models.Model):
+    """
+    Destino de los avisos de un usuario: una dirección de email, un webhook
+    entrante de Slack o un chat de Telegram. Recibe las ejecuciones de sus
+    tareas (o solo de `task`) que terminan en alguno de `statuses`.
+    """
+    KIND_CHOICES = [
+        ('email', 'Email'),
+        ('slack', 'Slack'),
+        ('telegram', 'Telegram'),
+    ]
+    STATUSES = ('completed', 'failed', 'timeout', 'cancelled')
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_channels')
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Email, URL del webhook de Slack o id del chat de Telegram
+    target = models.CharField(max_length=500)
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notification_channels'
+    )
+    statuses = models.JSONField(default=default_statuses)
+    enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Notification Channel'
+        verbose_name_plural = 'Notification Channels'
+
+    def __str__(self):
+        return f"{self.name} ({self.kind})"
+
+    def clean(self):
+        if not isinstance(self.statuses, list) or not set(self.statuses) <= set(self.STATUSES):
+            raise ValidationError({'statuses': f"Allowed statuses: {', '.join(self.STATUSES)}"})
+        if self.kind == 'email':
+            try:
+                validate_email(self.target)
+            except ValidationError:
+                raise ValidationError({'target': 'Invalid email address'})
+        elif self.kind == 'slack' and not is_slack_webhook(self.target):
+            raise ValidationError({'target': f'Slack webhook URL must start with {settings.SLACK_WEBHOOK_URL}'})
+        elif self.kind == 'telegram' and not self.target.lstrip('-').isdigit():
+            raise ValidationError({'target': 'Telegram chat id must be numeric'})
+
+    def accepts(self, task, status):
+        return task.owner_id == self.owner_id and self.task_id in (None, task.id) and status in self.statuses
\ No newline at end of file
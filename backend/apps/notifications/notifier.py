@@ -0,0 +1,216 @@
+"""
+Envío de avisos por lotes.
+
+El notificador espera al primer evento, deja pasar NOTIFICATIONS_BATCH_WINDOW
+segundos para recoger los que lleguen detrás y reparte el lote entre los
+canales que lo aceptan. Un canal con pocos eventos recibe un mensaje por
+ejecución; con más de NOTIFICATIONS_DIGEST_THRESHOLD, un solo resumen
+("37 runs failed in the last 60s"), así una tormenta de fallos son unos
+pocos mensajes por canal y minuto, no miles.
+
+Los emails de un lote salen por una sola conexión SMTP y las peticiones a
+Slack y Telegram por un pool de conexiones HTTP que se mantiene entre lotes.
+Lo que falla se reintenta más tarde (ver queue.schedule_retry). Los eventos
+del lote solo se quitan de Redis cuando se ha enviado (ver queue.ack).
+"""
+import json
+import logging
+import smtplib
+import uuid
+from collections import Counter, defaultdict
+
+import urllib3
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from apps.tasks.models import Task
+from . import queue
+from .models import NotificationChannel, is_slack_webhook
+
+logger = logging.getLogger(__name__)
+
+STATUS_VERBS = {
+    'completed': 'completed',
+    'failed': 'failed',
+    'timeout': 'timed out',
+    'cancelled': 'cancelled',
+}
+
+
+class DeliveryError(Exception):
+    """
+    Fallo de envío que merece reintento (red, 5xx, límite de peticiones)
+    """
+
+
+def compose(channel, events, tasks):
+    """
+    Mensajes ({'channel', 'subject', 'body'}) de los eventos de un canal
+    """
+    threshold = settings.NOTIFICATIONS_DIGEST_THRESHOLD
+    if len(events) <= threshold:
+        return [single_message(channel, event, tasks[event['task']]) for event in events]
+    return [digest_message(channel, events, tasks)]
+
+
+def single_message(channel, event, task):
+    subject = f"Run of {task.name} {STATUS_VERBS[event['status']]}"
+    body = f"{subject} (execution #{event['execution']})"
+    if event['error']:
+        body += f"\n\n{event['error']}"
+    return {'channel': channel.id, 'subject': subject, 'body': body}
+
+
+def digest_message(channel, events, tasks):
+    counts = Counter(event['status'] for event in events).most_common()
+    # "37 runs failed, 3 timed out"
+    (status, count), rest = counts[0], counts[1:]
+    parts = [f"{count} {'run' if count == 1 else 'runs'} {STATUS_VERBS[status]}"]
+    parts += [f'{count} {STATUS_VERBS[status]}' for status, count in rest]
+    summary = ', '.join(parts)
+    subject = f'{summary} in the last {settings.NOTIFICATIONS_BATCH_WINDOW:g}s'
+    lines = [
+        f"- {tasks[event['task']].name} #{event['execution']}: {event['status']}"
+        for event in events[:settings.NOTIFICATIONS_DIGEST_MAX_LINES]
+    ]
+    if len(events) > len(lines):
+        lines.append(f'... and {len(events) - len(lines)} more')
+    return {'channel': channel.id, 'subject': subject, 'body': '\n'.join([subject, '', *lines])}
+
+
+class Notifier:
+    def __init__(self):
+        self.http = urllib3.PoolManager(
+            maxsize=settings.NOTIFICATIONS_HTTP_POOL_SIZE,
+            timeout=settings.NOTIFICATIONS_HTTP_TIMEOUT,
+            retries=False,
+        )
+        self.smtp = None
+        self.consumer = uuid.uuid4().hex
+
+    def route(self, events):
+        """
+        Agrupa los eventos por canal con dos consultas por lote
+        """
+        tasks = Task.objects.only('id', 'name', 'owner_id').in_bulk({event['task'] for event in events})
+        events = [event for event in events if event['task'] in tasks]
+        owners = {task.owner_id for task in tasks.values()}
+        grouped = defaultdict(list)
+        for channel in NotificationChannel.objects.filter(enabled=True, owner_id__in=owners):
+            for event in events:
+                if channel.accepts(tasks[event['task']], event['status']):
+                    grouped[channel].append(event)
+        return grouped, tasks
+
+    def flush(self, events):
+        """
+        Compone y envía los mensajes de un lote de eventos. Devuelve cuántos
+        mensajes se enviaron
+        """
+        grouped, tasks = self.route(events)
+        messages = []
+        for channel, channel_events in grouped.items():
+            messages += compose(channel, channel_events, tasks)
+        return self.deliver(messages, {channel.id: channel for channel in grouped})
+
+    def send_retries(self):
+        messages = queue.take_due_retries()
+        if not messages:
+            return 0
+        channels = NotificationChannel.objects.filter(enabled=True).in_bulk({message['channel'] for message in messages})
+        return self.deliver([message for message in messages if message['channel'] in channels], channels)
+
+    def deliver(self, messages, channels):
+        sent = 0
+        try:
+            for message in messages:
+                channel = channels[message['channel']]
+                try:
+                    getattr(self, f'send_{channel.kind}')(channel, message)
+                    sent += 1
+                except DeliveryError as e:
+                    if queue.schedule_retry(message):
+                        logger.warning('Notification to channel %s failed, will retry: %s', channel.id, e)
+                    else:
+                        logger.error('Giving up on notification to channel %s: %s', channel.id, e)
+        finally:
+            self.close_smtp()
+        return sent
+
+    def send_email(self, channel, message):
+        if self.smtp is None:
+            self.smtp = get_connection(fail_silently=False)
+        email = EmailMessage(
+            subject=f"[TaskFlow] {message['subject']}",
+            body=message['body'],
+            to=[channel.target],
+            connection=self.smtp,
+        )
+        try:
+            # La conexión se abre con el primer email del lote y la reutilizan los demás
+            self.smtp.open()
+            email.send()
+        except (smtplib.SMTPException, OSError) as e:
+            self.close_smtp()
+            raise DeliveryError(str(e)) from e
+
+    def close_smtp(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.smtp = None
+
+    def send_slack(self, channel, message):
+        if not is_slack_webhook(channel.target):
+            # Canal guardado antes de restringir los webhooks
+            logger.error('Refusing to notify channel %s: not a Slack webhook URL', channel.id)
+            return
+        self.post(channel.target, {'text': message['body']})
+
+    def send_telegram(self, channel, message):
+        url = f'{settings.TELEGRAM_API_URL}/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage'
+        self.post(url, {'chat_id': channel.target, 'text': message['body']})
+
+    def post(self, url, payload):
+        try:
+            response = self.http.request(
+                'POST', url, body=json.dumps(payload), headers={'Content-Type': 'application/json'},
+                # Una redirección sacaría la petición del host permitido
+                redirect=False,
+            )
+        except urllib3.exceptions.HTTPError as e:
+            raise DeliveryError(str(e)) from e
+        if response.status == 429 or response.status >= 500:
+            raise DeliveryError(f'HTTP {response.status}')
+        if response.status >= 400:
+            # Webhook borrado, chat inexistente...: reintentar no lo arregla
+            logger.error('Notification rejected by %s: HTTP %s', urllib3.util.parse_url(url).host, response.status)
+
+    def run(self, stopping):
+        """
+        Bucle del notificador hasta que se active `stopping`
+        """
+        try:
+            while not stopping.is_set():
+                queue.alive(self.consumer)
+                queue.recover_orphans()
+                self.send_retries()
+                first = queue.wait_for_event(self.consumer, timeout=1)
+                if first is None:
+                    continue
+                # Al parar se envía lo recogido sin esperar al final de la ventana
+                stopping.wait(settings.NOTIFICATIONS_BATCH_WINDOW)
+                queue.alive(self.consumer)
+                events = [first, *queue.take_events(self.consumer, settings.NOTIFICATIONS_BATCH_SIZE)]
+                try:
+                    self.flush(events)
+                except Exception:
+                    # Vuelven a la cola para el siguiente lote
+                    logger.exception('Could not send a batch of %d notification events', len(events))
+                    queue.requeue(self.consumer)
+                else:
+                    queue.ack(self.consumer)
+        finally:
+            queue.leave(self.consumer)
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+Cola de avisos en Redis.
+
+Los workers solo dejan un evento por ejecución terminada (un RPUSH al
+confirmar la transacción); nada de consultas, plantillas ni conexiones
+SMTP/HTTP en el proceso que ejecuta. El notificador (manage.py
+run_notifier) los recoge por lotes, los agrupa por canal y los envía.
+
+Cada réplica del notificador mueve los eventos que recoge a su propia lista
+y solo la vacía (ack) después de enviar el lote; si muere a mitad, otra
+réplica devuelve esos eventos a la cola cuando deja de dar señales de vida
+durante NOTIFICATIONS_CONSUMER_TIMEOUT. Un aviso puede llegar repetido,
+pero no perderse.
+
+Claves (bajo NOTIFICATIONS_PREFIX):
+    events                  lista de eventos JSON pendientes de agrupar
+    processing:<consumidor> eventos recogidos por una réplica y aún sin enviar
+    consumers               zset de réplicas -> última señal de vida
+    retry                   zset de mensajes ya compuestos que fallaron -> cuándo reintentar
+"""
+import json
+import logging
+import time
+import uuid
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+# KEYS: events, processing. ARGV: límite. Mueve hasta `límite` eventos a la
+# lista de la réplica, en tandas para no desbordar la pila de Lua
+TAKE_SCRIPT = """
+local events = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #events > 0 then
+    redis.call('LTRIM', KEYS[1], #events, -1)
+    for i = 1, #events, 1000 do
+        redis.call('RPUSH', KEYS[2], unpack(events, i, math.min(i + 999, #events)))
+    end
+end
+return events
+"""
+
+# KEYS: events, processing. Devuelve los eventos de una réplica al principio
+# de la cola, en su orden
+REQUEUE_SCRIPT = """
+local count = 0
+while redis.call('RPOPLPUSH', KEYS[2], KEYS[1]) do
+    count = count + 1
+end
+return count
+"""
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        # Con timeout: emit() corre en los workers y no debe colgarlos si Redis no responde
+        _client = redis.Redis.from_url(
+            settings.NOTIFICATIONS_REDIS_URL,
+            decode_responses=True,
+            socket_timeout=settings.NOTIFICATIONS_REDIS_TIMEOUT,
+            socket_connect_timeout=settings.NOTIFICATIONS_REDIS_TIMEOUT,
+        )
+    return _client
+
+
+def _key(*parts):
+    return ':'.join([settings.NOTIFICATIONS_PREFIX, *map(str, parts)])
+
+
+def emit(*executions):
+    """
+    Encola un evento por ejecución terminada. Si Redis falla el aviso se
+    pierde, la ejecución no
+    """
+    events = [
+        json.dumps({
+            'execution': execution.id,
+            'task': execution.task_version.task_id,
+            'status': execution.status,
+            'error': execution.error_message[:500],
+            'completed_at': execution.completed_at,
+        }, default=str)
+        for execution in executions
+    ]
+    if not events:
+        return
+    try:
+        get_redis().rpush(_key('events'), *events)
+    except redis.RedisError as e:
+        logger.warning('Could not queue %d notification events: %s', len(events), e)
+
+
+def wait_for_event(consumer, timeout):
+    """
+    Bloquea hasta que llegue un evento o pase `timeout`; el evento queda en
+    la lista de `consumer` hasta ack()
+    """
+    event = get_redis().blmove(_key('events'), _key('processing', consumer), timeout, 'LEFT', 'RIGHT')
+    return json.loads(event) if event else None
+
+
+def take_events(consumer, limit):
+    """
+    Saca de una vez hasta `limit` eventos y los deja en la lista de
+    `consumer` hasta ack(); con varias réplicas del notificador cada una se
+    lleva eventos distintos
+    """
+    events = get_redis().register_script(TAKE_SCRIPT)(keys=[_key('events'), _key('processing', consumer)], args=[limit])
+    return [json.loads(event) for event in events]
+
+
+def ack(consumer):
+    """
+    Olvida los eventos de `consumer`: el lote ya se envió
+    """
+    get_redis().delete(_key('processing', consumer))
+
+
+def requeue(consumer):
+    """
+    Devuelve a la cola los eventos de `consumer` que no llegó a enviar
+    """
+    return get_redis().register_script(REQUEUE_SCRIPT)(keys=[_key('events'), _key('processing', consumer)])
+
+
+def alive(consumer, now=None):
+    get_redis().zadd(_key('consumers'), {consumer: now or time.time()})
+
+
+def leave(consumer):
+    requeue(consumer)
+    get_redis().zrem(_key('consumers'), consumer)
+
+
+def recover_orphans(now=None):
+    """
+    Devuelve a la cola los eventos de las réplicas que dejaron de dar
+    señales de vida. Devuelve cuántos eventos se recuperaron
+    """
+    now = now or time.time()
+    client = get_redis()
+    recovered = 0
+    for consumer in client.zrangebyscore(_key('consumers'), '-inf', now - settings.NOTIFICATIONS_CONSUMER_TIMEOUT):
+        recovered += requeue(consumer)
+        client.zrem(_key('consumers'), consumer)
+    if recovered:
+        logger.warning('Requeued %d notification events of stopped notifiers', recovered)
+    return recovered
+
+
+def schedule_retry(message):
+    """
+    Guarda un mensaje que no se pudo enviar para reintentarlo más tarde, con
+    espera exponencial; tras NOTIFICATIONS_MAX_ATTEMPTS intentos se descarta.
+    Devuelve False si se descarta
+    """
+    attempt = message.get('attempt', 0) + 1
+    if attempt >= settings.NOTIFICATIONS_MAX_ATTEMPTS:
+        return False
+    due = time.time() + settings.NOTIFICATIONS_RETRY_DELAY * 2 ** (attempt - 1)
+    member = json.dumps({**message, 'attempt': attempt, 'id': uuid.uuid4().hex})
+    get_redis().zadd(_key('retry'), {member: due})
+    return True
+
+
+def take_due_retries(now=None):
+    now = now or time.time()
+    pipe = get_redis().pipeline()
+    pipe.zrangebyscore(_key('retry'), '-inf', now)
+    pipe.zremrangebyscore(_key('retry'), '-inf', now)
+    messages, _ = pipe.execute()
+    return [json.loads(message) for message in messages]
\ No newline at end of file
@@ -0,0 +1,26 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from .models import NotificationChannel
+
+class NotificationChannelSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationChannel
+        fields = ['id', 'name', 'kind', 'target', 'task', 'statuses', 'enabled', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+    def validate_task(self, value):
+        if value is not None and value.owner != self.context['request'].user:
+            raise serializers.ValidationError('Task not found or access denied')
+        return value
+
+    def validate(self, attrs):
+        fields = ('kind', 'target', 'statuses')
+        channel = NotificationChannel(**{field: getattr(self.instance, field) for field in fields} if self.instance else {})
+        for field in fields:
+            if field in attrs:
+                setattr(channel, field, attrs[field])
+        try:
+            channel.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        return attrs
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.dispatch import receiver
+from apps.tasks.signals import execution_finished, executions_cancelled
+from . import queue
+
+@receiver(execution_finished)
+def queue_execution_notification(sender, execution, **kwargs):
+    """
+    Deja el aviso en la cola del notificador cuando termina una ejecución
+    """
+    transaction.on_commit(lambda: queue.emit(execution), robust=True)
+
+@receiver(executions_cancelled)
+def queue_cancelled_notifications(sender, executions, **kwargs):
+    transaction.on_commit(lambda: queue.emit(*executions), robust=True)
\ No newline at end of file
@@ -0,0 +1,238 @@
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import redis
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.tasks.models import Task, TaskVersion, TaskExecution
+from apps.tasks.signals import execution_finished
+from ..models import NotificationChannel
+from .. import queue
+from ..notifier import Notifier
+
+User = get_user_model()
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Keep-alive, para comprobar que el pool reutiliza la conexión
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((self.path, self.client_address[1], json.loads(body)))
+        code = self.server.responses.pop(0) if self.server.responses else 200
+        self.send_response(code)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+class HTTPStandIn:
+    def __init__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.received = []
+        self.server.responses = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def event(execution_id, task, status='failed', error=''):
+    return {'execution': execution_id, 'task': task.id, 'status': status, 'error': error, 'completed_at': None}
+
+class NotifierTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.task = Task.objects.create(name='Nightly', owner=self.user)
+        self.email = NotificationChannel.objects.create(
+            owner=self.user, name='Me', kind='email', target='me@example.com'
+        )
+        self.stand_in = HTTPStandIn()
+        self.addCleanup(self.stand_in.stop)
+        override = override_settings(SLACK_WEBHOOK_URL=f'{self.stand_in.url}/hooks/')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        patcher = patch('apps.notifications.queue.schedule_retry', return_value=True)
+        self.schedule_retry = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_few_events_are_sent_one_by_one(self):
+        sent = Notifier().flush([event(1, self.task, error='boom'), event(2, self.task, 'completed')])
+        # El canal solo acepta fallos y timeouts por defecto
+        self.assertEqual(sent, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, '[TaskFlow] Run of Nightly failed')
+        self.assertIn('boom', mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].to, ['me@example.com'])
+
+    def test_failure_storm_becomes_a_single_digest(self):
+        events = [event(i, self.task) for i in range(37)] + [event(100 + i, self.task, 'timeout') for i in range(3)]
+        with self.assertNumQueries(2):
+            Notifier().flush(events)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, '[TaskFlow] 37 runs failed, 3 timed out in the last 60s')
+        self.assertIn('... and 20 more', mail.outbox[0].body)
+
+    def test_other_owners_channels_do_not_receive_events(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        NotificationChannel.objects.create(owner=other, name='Other', kind='email', target='other@example.com')
+        Notifier().flush([event(1, self.task)])
+        self.assertEqual([message.to for message in mail.outbox], [['me@example.com']])
+
+    def test_http_channels_share_a_pooled_connection(self):
+        self.email.delete()
+        NotificationChannel.objects.create(
+            owner=self.user, name='Slack', kind='slack', target=f'{self.stand_in.url}/hooks/abc'
+        )
+        with override_settings(TELEGRAM_API_URL=self.stand_in.url, TELEGRAM_BOT_TOKEN='token'):
+            NotificationChannel.objects.create(owner=self.user, name='Telegram', kind='telegram', target='42')
+            notifier = Notifier()
+            notifier.flush([event(1, self.task)])
+            notifier.flush([event(2, self.task)])
+        received = self.stand_in.server.received
+        self.assertEqual(
+            sorted(path for path, _, _ in received),
+            ['/bottoken/sendMessage'] * 2 + ['/hooks/abc'] * 2
+        )
+        self.assertEqual(len({port for _, port, _ in received}), 1)
+        self.assertIn({'chat_id': '42', 'text': 'Run of Nightly failed (execution #1)'}, [payload for _, _, payload in received])
+
+    def test_server_errors_are_retried_and_client_errors_dropped(self):
+        self.email.delete()
+        NotificationChannel.objects.create(
+            owner=self.user, name='Slack', kind='slack', target=f'{self.stand_in.url}/hooks/abc'
+        )
+        self.stand_in.server.responses = [503, 404]
+        notifier = Notifier()
+        self.assertEqual(notifier.flush([event(1, self.task)]), 0)
+        self.schedule_retry.assert_called_once()
+        self.assertEqual(self.schedule_retry.call_args.args[0]['body'], 'Run of Nightly failed (execution #1)')
+
+        notifier.flush([event(2, self.task)])
+        self.schedule_retry.assert_called_once()
+
+    def test_slack_channels_only_reach_slack_webhooks(self):
+        self.email.delete()
+        # Guardado sin validar, como los canales anteriores a la restricción
+        NotificationChannel.objects.create(
+            owner=self.user, name='Slack', kind='slack', target=f'{self.stand_in.url}/admin'
+        )
+        self.assertEqual(Notifier().flush([event(1, self.task)]), 1)
+        self.assertEqual(self.stand_in.server.received, [])
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_PORT=1)
+    def test_unreachable_smtp_server_is_retried(self):
+        Notifier().flush([event(1, self.task)])
+        self.schedule_retry.assert_called_once()
+
+class EmitTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        task = Task.objects.create(name='Test Task', owner=user)
+        version = TaskVersion.objects.create(task=task, file='test.py')
+        self.execution = TaskExecution.objects.create(task_version=version, status='failed', error_message='boom')
+
+    @patch('apps.notifications.queue.get_redis')
+    def test_finished_execution_is_queued_after_commit(self, get_redis):
+        with self.captureOnCommitCallbacks(execute=True):
+            execution_finished.send(sender=TaskExecution, execution=self.execution)
+            get_redis.return_value.rpush.assert_not_called()
+        key, payload = get_redis.return_value.rpush.call_args.args
+        self.assertEqual(key, 'taskflow:notify:events')
+        self.assertEqual(json.loads(payload)['status'], 'failed')
+
+    @patch('apps.notifications.queue.get_redis')
+    def test_redis_errors_do_not_reach_the_worker(self, get_redis):
+        get_redis.return_value.rpush.side_effect = redis.ConnectionError('down')
+        with self.captureOnCommitCallbacks(execute=True):
+            execution_finished.send(sender=TaskExecution, execution=self.execution)
+
+class QueueTests(TestCase):
+    def setUp(self):
+        try:
+            queue.get_redis().ping()
+        except redis.RedisError:
+            self.skipTest('Redis is not available')
+        prefix = f'test:notify:{uuid.uuid4().hex}'
+        override = override_settings(NOTIFICATIONS_PREFIX=prefix, NOTIFICATIONS_MAX_ATTEMPTS=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(lambda: [queue.get_redis().delete(key) for key in queue.get_redis().scan_iter(f'{prefix}:*')])
+
+    def test_events_are_taken_in_batches(self):
+        queue.get_redis().rpush(queue._key('events'), *[json.dumps({'execution': i}) for i in range(5)])
+        self.assertEqual(queue.wait_for_event('a', timeout=1), {'execution': 0})
+        self.assertEqual([e['execution'] for e in queue.take_events('a', 3)], [1, 2, 3])
+        self.assertEqual([e['execution'] for e in queue.take_events('b', 3)], [4])
+        queue.ack('a')
+        self.assertEqual(queue.get_redis().llen(queue._key('processing', 'a')), 0)
+        self.assertEqual(queue.get_redis().llen(queue._key('processing', 'b')), 1)
+
+    def test_events_of_a_stopped_notifier_are_requeued(self):
+        queue.get_redis().rpush(queue._key('events'), *[json.dumps({'execution': i}) for i in range(3)])
+        queue.alive('dead', now=1)
+        queue.take_events('dead', 2)
+        queue.alive('live')
+        queue.take_events('live', 1)
+
+        self.assertEqual(queue.recover_orphans(), 2)
+        # Vuelven al principio de la cola, en su orden
+        self.assertEqual([e['execution'] for e in queue.take_events('live', 10)], [0, 1])
+        self.assertEqual(queue.recover_orphans(), 0)
+
+    def test_retries_back_off_and_give_up(self):
+        message = {'channel': 1, 'subject': 's', 'body': 'b'}
+        self.assertTrue(queue.schedule_retry(message))
+        self.assertEqual(queue.take_due_retries(), [])
+        retries = queue.take_due_retries(now=10 ** 10)
+        self.assertEqual([retry['attempt'] for retry in retries], [1])
+        self.assertFalse(queue.schedule_retry(retries[0]))
+
+class NotificationChannelViewSetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_channel(self):
+        response = self.client.post('/api/notifications/channels/', {
+            'name': 'Alerts', 'kind': 'email', 'target': 'me@example.com', 'statuses': ['failed']
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(NotificationChannel.objects.get().owner, self.user)
+
+    def test_target_is_validated_per_kind(self):
+        response = self.client.post('/api/notifications/channels/', {
+            'name': 'Alerts', 'kind': 'slack', 'target': 'me@example.com'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('target', response.data)
+
+    def test_slack_target_must_be_a_slack_webhook(self):
+        for target in ('https://169.254.169.254/latest/meta-data', 'https://hooks.slack.com.evil.example/services/x'):
+            response = self.client.post('/api/notifications/channels/', {
+                'name': 'Alerts', 'kind': 'slack', 'target': target
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/notifications/channels/', {
+            'name': 'Alerts', 'kind': 'slack', 'target': 'https://hooks.slack.com/services/T0/B0/xyz'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_task_of_another_owner_is_rejected(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        task = Task.objects.create(name='Other', owner=other)
+        response = self.client.post('/api/notifications/channels/', {
+            'name': 'Alerts', 'kind': 'telegram', 'target': '42', 'task': task.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import NotificationChannelViewSet
+
+router = DefaultRouter()
+router.register(r'channels', NotificationChannelViewSet, basename='notificationchannel')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
\ No newline at end of file
@@ -0,0 +1,14 @@
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+from .models import NotificationChannel
+from .serializers import NotificationChannelSerializer
+
+class NotificationChannelViewSet(viewsets.ModelViewSet):
+    serializer_class = NotificationChannelSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return NotificationChannel.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
\ No newline at end of file
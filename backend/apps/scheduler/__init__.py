@@ -0,0 +1 @@
+default_app_config = 'apps.scheduler.apps.SchedulerConfig'
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Schedule
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    list_display = ('task', 'kind', 'cron_expression', 'interval_seconds', 'enabled', 'next_run_at', 'last_run_at')
+    list_filter = ('kind', 'enabled')
+    search_fields = ('task__name', 'cron_expression')
+    readonly_fields = ('next_run_at', 'last_run_at', 'last_execution', 'created_at', 'updated_at')
\ No newline at end of file
@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+class SchedulerConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.scheduler'
+    verbose_name = 'Scheduler'
\ No newline at end of file
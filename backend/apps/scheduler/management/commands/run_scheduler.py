@@ -0,0 +1,28 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from ...scheduler import run_due_schedules, seconds_until_next_run
+
+
+class Command(BaseCommand):
+    help = 'Dispara las programaciones vencidas; se pueden correr varias réplicas a la vez'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Una sola pasada y salir')
+
+    def handle(self, *args, once, **options):
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+        while not stopping.is_set():
+            fired = run_due_schedules()
+            if fired:
+                self.stdout.write(f'Fired {fired} schedules')
+            if once:
+                break
+            # Despierta justo cuando vence la próxima o, como mucho, cada
+            # SCHEDULER_MAX_SLEEP segundos para ver programaciones nuevas
+            stopping.wait(seconds_until_next_run())
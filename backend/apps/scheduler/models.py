@@ -0,0 +1,81 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.db import models
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from croniter import croniter
+from apps.tasks.models import Task, TaskExecution
+
+class Schedule(models.Model):
+    """
+    Programación de una tarea, por expresión cron o por intervalo. La
+    siguiente ejecución se precalcula en next_run_at para que el scheduler
+    solo lea las filas que vencen.
+    """
+    KIND_CHOICES = [
+        ('cron', 'Cron'),
+        ('interval', 'Interval'),
+    ]
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='schedules')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='cron')
+    cron_expression = models.CharField(max_length=100, blank=True)
+    interval_seconds = models.PositiveIntegerField(null=True, blank=True)
+    timezone = models.CharField(max_length=64, default='UTC')
+    enabled = models.BooleanField(default=True)
+    next_run_at = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_execution = models.ForeignKey(
+        TaskExecution,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['next_run_at']
+        verbose_name = 'Schedule'
+        verbose_name_plural = 'Schedules'
+        indexes = [
+            # El scheduler solo recorre programaciones activas por vencimiento
+            models.Index(
+                fields=['next_run_at'],
+                name='schedule_due_idx',
+                condition=models.Q(enabled=True)
+            ),
+        ]
+
+    def __str__(self):
+        rule = self.cron_expression if self.kind == 'cron' else f'every {self.interval_seconds}s'
+        return f"{self.task.name} ({rule})"
+
+    def clean(self):
+        try:
+            ZoneInfo(self.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValidationError({'timezone': 'Unknown time zone'})
+        if self.kind == 'cron' and not croniter.is_valid(self.cron_expression):
+            raise ValidationError({'cron_expression': 'Invalid cron expression'})
+        if self.kind == 'interval' and not self.interval_seconds:
+            raise ValidationError({'interval_seconds': 'Interval is required'})
+
+    def compute_next_run(self, after=None):
+        """
+        Primera ejecución estrictamente posterior a `after`; las que se
+        perdieron mientras el scheduler no corría no se recuperan
+        """
+        after = after or timezone.now()
+        if self.kind == 'interval':
+            return after + timedelta(seconds=self.interval_seconds)
+        local = after.astimezone(ZoneInfo(self.timezone))
+        return croniter(self.cron_expression, local).get_next(type(local))
+
+    def save(self, *args, **kwargs):
+        if self.enabled and self.next_run_at is None:
+            self.next_run_at = self.compute_next_run()
+        elif not self.enabled:
+            self.next_run_at = None
+        super().save(*args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.tasks.dispatch import enqueue_executions
+from .models import Schedule
+
+logger = logging.getLogger(__name__)
+
+
+def claim_due_batch(now, batch_size):
+    """
+    Toma un lote de programaciones vencidas, las dispara y avanza su
+    next_run_at en la misma transacción. Con SKIP LOCKED cada réplica del
+    scheduler se lleva filas distintas, así que nada se dispara dos veces.
+    Devuelve el número de programaciones procesadas.
+    """
+    with transaction.atomic():
+        schedules = list(
+            Schedule.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(enabled=True, next_run_at__lte=now)
+            .select_related('task', 'task__active_version', 'task__owner')
+            .order_by('next_run_at')[:batch_size]
+        )
+        if not schedules:
+            return 0
+
+        runnable = [
+            schedule for schedule in schedules
+            if schedule.task.status == 'active' and schedule.task.active_version_id
+        ]
+        executions = enqueue_executions(
+            (schedule.task.active_version, schedule.task.owner, {}) for schedule in runnable
+        )
+        for schedule, execution in zip(runnable, executions):
+            schedule.last_execution = execution
+            schedule.last_run_at = now
+
+        for schedule in schedules:
+            schedule.next_run_at = schedule.compute_next_run(now)
+        Schedule.objects.bulk_update(schedules, ['next_run_at', 'last_run_at', 'last_execution'])
+
+    skipped = len(schedules) - len(runnable)
+    if skipped:
+        logger.info('Skipped %d due schedules without an active task version', skipped)
+    return len(schedules)
+
+
+def run_due_schedules(now=None, batch_size=None):
+    """
+    Dispara todas las programaciones vencidas, lote a lote
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.SCHEDULER_BATCH_SIZE
+    total = 0
+    while True:
+        claimed = claim_due_batch(now, batch_size)
+        total += claimed
+        if claimed < batch_size:
+            return total
+
+
+def seconds_until_next_run(now=None, maximum=None):
+    """
+    Cuánto puede dormir el scheduler hasta la próxima programación
+    """
+    now = now or timezone.now()
+    maximum = maximum if maximum is not None else settings.SCHEDULER_MAX_SLEEP
+    next_run_at = (
+        Schedule.objects.filter(enabled=True, next_run_at__isnull=False)
+        .order_by('next_run_at')
+        .values_list('next_run_at', flat=True)
+        .first()
+    )
+    if next_run_at is None:
+        return maximum
+    return min(max((next_run_at - now).total_seconds(), 0), maximum)
\ No newline at end of file
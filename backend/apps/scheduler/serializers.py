@@ -0,0 +1,34 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from .models import Schedule
+
+RULE_FIELDS = ('kind', 'cron_expression', 'interval_seconds', 'timezone')
+
+class ScheduleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Schedule
+        fields = [
+            'id', 'task', 'kind', 'cron_expression', 'interval_seconds',
+            'timezone', 'enabled', 'next_run_at', 'last_run_at',
+            'last_execution', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['next_run_at', 'last_run_at', 'last_execution', 'created_at', 'updated_at']
+
+    def validate_task(self, value):
+        if value.owner != self.context['request'].user:
+            raise serializers.ValidationError('Task not found or access denied')
+        return value
+
+    def validate(self, attrs):
+        rule = {field: getattr(self.instance, field) for field in RULE_FIELDS} if self.instance else {}
+        rule.update({field: attrs[field] for field in RULE_FIELDS if field in attrs})
+        try:
+            Schedule(**rule).clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        return attrs
+
+    def update(self, instance, validated_data):
+        # La regla pudo cambiar: next_run_at se recalcula al guardar
+        instance.next_run_at = None
+        return super().update(instance, validated_data)
\ No newline at end of file
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest.mock import patch
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.tasks.models import Task, TaskVersion, TaskExecution
+from ..models import Schedule
+from ..scheduler import run_due_schedules, seconds_until_next_run
+
+User = get_user_model()
+
+class ScheduleModelTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.task = Task.objects.create(name='Test Task', owner=self.user)
+
+    def test_cron_next_run_uses_schedule_timezone(self):
+        schedule = Schedule(task=self.task, cron_expression='0 9 * * *', timezone='Europe/Madrid')
+        after = datetime(2024, 1, 15, 12, 0, tzinfo=dt_timezone.utc)
+        # 9:00 en Madrid (UTC+1 en invierno) del día siguiente
+        self.assertEqual(schedule.compute_next_run(after), datetime(2024, 1, 16, 8, 0, tzinfo=dt_timezone.utc))
+
+    def test_interval_and_disabled_schedules(self):
+        schedule = Schedule.objects.create(task=self.task, kind='interval', interval_seconds=60)
+        self.assertAlmostEqual(
+            (schedule.next_run_at - timezone.now()).total_seconds(), 60, delta=5
+        )
+        schedule.enabled = False
+        schedule.save()
+        self.assertIsNone(schedule.next_run_at)
+
+class RunDueSchedulesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.task = Task.objects.create(name='Test Task', owner=self.user)
+        self.version = TaskVersion.objects.create(task=self.task, file='test.py', status='active')
+        self.idle_task = Task.objects.create(name='No Version', owner=self.user)
+        self.now = timezone.now()
+
+    def schedule(self, task, next_run_at):
+        return Schedule.objects.create(
+            task=task, kind='interval', interval_seconds=3600, next_run_at=next_run_at
+        )
+
+    @patch('apps.tasks.dispatch.send_executions')
+    def test_fires_only_due_schedules_in_batches(self, mock_send):
+        due = [self.schedule(self.task, self.now - timedelta(minutes=i)) for i in range(3)]
+        idle = self.schedule(self.idle_task, self.now - timedelta(minutes=1))
+        later = self.schedule(self.task, self.now + timedelta(minutes=5))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fired = run_due_schedules(now=self.now, batch_size=2)
+
+        self.assertEqual(fired, 4)
+        executions = TaskExecution.objects.filter(task_version=self.version)
+        self.assertEqual(executions.count(), 3)
+        self.assertTrue(all(e.status == 'pending' and e.celery_task_id for e in executions))
+        self.assertEqual(sum(len(call.args[0]) for call in mock_send.call_args_list), 3)
+
+        for schedule in due + [idle]:
+            schedule.refresh_from_db()
+            self.assertEqual(schedule.next_run_at, self.now + timedelta(hours=1))
+        idle.refresh_from_db()
+        self.assertIsNone(idle.last_execution)
+        later.refresh_from_db()
+        self.assertIsNone(later.last_run_at)
+
+        # Una segunda pasada no vuelve a disparar nada
+        self.assertEqual(run_due_schedules(now=self.now), 0)
+
+    def test_sleep_until_next_schedule(self):
+        self.schedule(self.task, self.now + timedelta(seconds=2))
+        self.assertAlmostEqual(seconds_until_next_run(now=self.now, maximum=10), 2, delta=0.01)
+        self.assertEqual(seconds_until_next_run(now=self.now, maximum=1), 1)
+
+class ScheduleViewSetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(name='Test Task', owner=self.user)
+
+    def test_create_and_update_schedule(self):
+        response = self.client.post('/api/scheduler/schedules/', {
+            'task': self.task.id, 'kind': 'cron', 'cron_expression': '*/5 * * * *'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNotNone(response.data['next_run_at'])
+
+        response = self.client.patch(f"/api/scheduler/schedules/{response.data['id']}/", {
+            'kind': 'interval', 'interval_seconds': 30
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        schedule = Schedule.objects.get()
+        self.assertLess((schedule.next_run_at - timezone.now()).total_seconds(), 31)
+
+    def test_rejects_invalid_rules_and_foreign_tasks(self):
+        response = self.client.post('/api/scheduler/schedules/', {
+            'task': self.task.id, 'kind': 'cron', 'cron_expression': 'every day'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cron_expression', response.data)
+
+        other = Task.objects.create(
+            name='Other', owner=User.objects.create_user(username='other', password='testpass123')
+        )
+        response = self.client.post('/api/scheduler/schedules/', {
+            'task': other.id, 'kind': 'interval', 'interval_seconds': 60
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import ScheduleViewSet
+
+router = DefaultRouter()
+router.register(r'schedules', ScheduleViewSet, basename='schedule')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
\ No newline at end of file
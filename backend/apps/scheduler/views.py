@@ -0,0 +1,15 @@
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+from .models import Schedule
+from .serializers import ScheduleSerializer
+
+class ScheduleViewSet(viewsets.ModelViewSet):
+    serializer_class = ScheduleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Schedule.objects.filter(task__owner=self.request.user).select_related('task')
+        task = self.request.query_params.get('task')
+        if task and task.isdigit():
+            queryset = queryset.filter(task_id=int(task))
+        return queryset
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Task, TaskVersion, TaskExecution
+from .models import FileBlob, ParameterSweep, ResultCacheEntry, Task, TaskVersion, TaskExecution, TaskUpload
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
@@ -21,6 +21,33 @@ class TaskVersionAdmin(admin.ModelAdmin):
 class TaskExecutionAdmin(admin.ModelAdmin):
     list_display = ('task_version', 'status', 'started_at', 'completed_at', 'triggered_by')
     list_filter = ('status', 'started_at')
-    search_fields = ('task_version__task__name', 'logs', 'error_message')
-    readonly_fields = ('started_at', 'completed_at')
-    date_hierarchy = 'started_at' 
\ No newline at end of file
+    search_fields = ('task_version__task__name', 'error_message')
+    readonly_fields = (
+        'started_at', 'completed_at', 'log_file', 'log_size', 'log_lines', 'cache_key', 'cached_from'
+    )
+    date_hierarchy = 'started_at'
+
+@admin.register(FileBlob)
+class FileBlobAdmin(admin.ModelAdmin):
+    list_display = ('file', 'size', 'ref_count', 'created_at')
+    search_fields = ('checksum', 'file')
+    readonly_fields = ('checksum', 'file', 'size', 'ref_count', 'created_at')
+
+@admin.register(TaskUpload)
+class TaskUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'task', 'owner', 'status', 'offset', 'size', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('filename', 'task__name', 'owner__username')
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(ResultCacheEntry)
+class ResultCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'task', 'execution', 'hits', 'last_used_at', 'expires_at')
+    search_fields = ('key', 'task__name')
+    readonly_fields = ('key', 'task', 'execution', 'hits', 'created_at', 'last_used_at', 'expires_at')
+
+@admin.register(ParameterSweep)
+class ParameterSweepAdmin(admin.ModelAdmin):
+    list_display = ('task', 'owner', 'total', 'completed', 'failed', 'created_at', 'finished_at')
+    search_fields = ('task__name', 'owner__username')
+    readonly_fields = ('total', 'completed', 'failed', 'created_at', 'finished_at')
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+Cancelación de ejecuciones.
+
+Una ejecución pendiente se cancela en la base de datos, solo si sigue
+pendiente, y se retira de su cola de reparto: ningún worker la empieza y,
+si ya estaba despachada, el worker la descarta al recibirla.
+
+A una en curso se le envía la orden por Redis, en una lista por ejecución
+que el worker espera con BLPOP mientras la ejecuta. Al recibirla mata solo
+el grupo de procesos de esa ejecución (o interrumpe su kernel), sin tocar
+el proceso del worker ni su intérprete precalentado, y cuando la ejecución
+queda cancelada y su hueco libre lo confirma en otra lista.
+
+Claves (bajo TASK_QUEUE_PREFIX):
+    cancel:<id>     orden de cancelar una ejecución en curso
+    cancelled:<id>  confirmación del worker
+"""
+import logging
+import threading
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import fairshare
+from .models import TaskExecution
+from .signals import executions_cancelled
+
+logger = logging.getLogger(__name__)
+
+CANCELLED_MESSAGE = 'Cancelled by user'
+# La orden espera a que el worker empiece a vigilar; la confirmación, a la API
+REQUEST_TTL = 3600
+CONFIRMATION_TTL = 60
+# Espera entre reintentos si el worker no puede leer de Redis
+RETRY_INTERVAL = 5
+
+
+def _key(*parts):
+    return ':'.join([settings.TASK_QUEUE_PREFIX, *map(str, parts)])
+
+
+def cancel_executions(queryset):
+    """
+    Cancela las ejecuciones pendientes o en curso de `queryset`. Devuelve los
+    ids de las que ya quedan canceladas y los de las que se ha pedido parar
+    """
+    rows = list(queryset.filter(status__in=('pending', 'running')).values_list('pk', 'status'))
+    pending = [pk for pk, status in rows if status == 'pending']
+    now = timezone.now()
+
+    with transaction.atomic():
+        # El bloqueo hace esperar al worker que intente empezar alguna, que
+        # después ya no la encontrará pendiente
+        cancelled = list(
+            TaskExecution.objects.select_for_update().select_related('task_version')
+            .filter(pk__in=pending, status='pending')
+        )
+        TaskExecution.objects.filter(pk__in=[execution.pk for execution in cancelled]).update(
+            status='cancelled', completed_at=now, error_message=CANCELLED_MESSAGE
+        )
+        for execution in cancelled:
+            execution.status = 'cancelled'
+            execution.completed_at = now
+            execution.error_message = CANCELLED_MESSAGE
+        if cancelled:
+            executions_cancelled.send(sender=TaskExecution, executions=cancelled)
+
+    # Las que empezaron mientras tanto se paran como las que ya estaban en curso
+    withdrawn = {execution.pk for execution in cancelled}
+    running = [pk for pk, _ in rows if pk not in withdrawn]
+
+    if cancelled:
+        fairshare.withdraw(cancelled)
+    request_stop(running)
+    if cancelled:
+        fairshare.dispatch()
+    return {'cancelled': sorted(withdrawn), 'cancelling': running}
+
+
+def request_stop(execution_ids):
+    """
+    Deja la orden de parar a los workers que ejecutan esas ejecuciones
+    """
+    if not execution_ids:
+        return
+    pipe = fairshare.get_redis().pipeline(transaction=False)
+    for execution_id in execution_ids:
+        pipe.rpush(_key('cancel', execution_id), 1)
+        pipe.expire(_key('cancel', execution_id), REQUEST_TTL)
+    pipe.execute()
+
+
+def wait_for_confirmation(execution_id, timeout):
+    """
+    Espera a que el worker confirme que ha parado la ejecución y liberado
+    su hueco
+    """
+    return fairshare.get_redis().blpop(_key('cancelled', execution_id), timeout=timeout) is not None
+
+
+def confirm(execution_id):
+    """
+    Lado del worker: la ejecución ya está cancelada y su hueco libre
+    """
+    try:
+        pipe = fairshare.get_redis().pipeline()
+        pipe.delete(_key('cancel', execution_id))
+        pipe.rpush(_key('cancelled', execution_id), 1)
+        pipe.expire(_key('cancelled', execution_id), CONFIRMATION_TTL)
+        pipe.execute()
+    except redis.RedisError:
+        logger.exception('Could not confirm cancellation of execution %s', execution_id)
+
+
+class CancelWatcher:
+    """
+    Hilo que espera la orden de cancelar una ejecución mientras el worker la
+    ejecuta. Quien la ejecuta registra con attach() cómo pararla y lo retira
+    con detach() al terminar; si la orden llega antes de registrarlo, se
+    aplica en cuanto se registra.
+    """
+    poll_timeout = 1
+
+    def __init__(self, execution_id):
+        self.execution_id = execution_id
+        self.cancelled = False
+        self._stop = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        # No se espera al hilo: sale solo en menos de poll_timeout
+        self._done.set()
+
+    def attach(self, stop):
+        with self._lock:
+            self._stop = stop
+            if self.cancelled:
+                stop()
+
+    def detach(self):
+        with self._lock:
+            self._stop = None
+
+    def _watch(self):
+        client = fairshare.get_redis()
+        key = _key('cancel', self.execution_id)
+        warned = False
+        while not self._done.is_set():
+            try:
+                order = client.blpop(key, timeout=self.poll_timeout)
+            except redis.RedisError as e:
+                if not warned:
+                    logger.warning('Could not watch cancellation of execution %s: %s', self.execution_id, e)
+                    warned = True
+                self._done.wait(RETRY_INTERVAL)
+                continue
+            if order and not self._done.is_set():
+                with self._lock:
+                    self.cancelled = True
+                    if self._stop is not None:
+                        self._stop()
+                return
\ No newline at end of file
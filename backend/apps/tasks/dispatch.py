@@ -0,0 +1,134 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from redis import RedisError
+
+from . import events, fairshare, read_cache, result_cache
+from .models import ParameterSweep, Task, TaskExecution, TaskVersion
+from .parameters import expand_grid
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_executions(items, sweep=None):
+    """
+    Crea las ejecuciones pendientes de `items` (tuplas versión, usuario,
+    parámetros) con un solo INSERT y las encola en Celery cuando se confirma
+    la transacción.
+
+    El id de la tarea de Celery se genera antes de insertar, así no hace
+    falta volver a actualizar las filas después de encolarlas; el envío a
+    los workers pasa por el reparto por usuario de fairshare. Si la tarea
+    reutiliza resultados y hay uno vigente, la ejecución se crea ya
+    completada y enlazada a la original, sin pasar por ningún worker.
+    """
+    items = list(items)
+    now = timezone.now()
+    keys = result_cache.cache_keys([(version, parameters) for version, _, parameters in items])
+    entries = result_cache.lookup(
+        {key: version.task_id for (version, _, _), key in zip(items, keys)}, now
+    )
+    priorities = dict(
+        TaskVersion.objects.filter(pk__in={version.pk for version, _, _ in items})
+        .values_list('pk', 'task__priority')
+    )
+
+    executions = []
+    pending = []
+    for (version, user, parameters), key in zip(items, keys):
+        entry = entries.get(key)
+        if entry is not None:
+            execution = TaskExecution(
+                task_version=version,
+                triggered_by=user,
+                parameters=parameters,
+                sweep=sweep,
+                priority=priorities.get(version.pk, 'normal'),
+                status='completed',
+                started_at=now,
+                completed_at=now,
+                cache_key=key,
+                cached_from_id=entry.execution_id,
+                metrics={'cache': 'hit'},
+            )
+        else:
+            execution = TaskExecution(
+                task_version=version,
+                triggered_by=user,
+                parameters=parameters,
+                sweep=sweep,
+                priority=priorities.get(version.pk, 'normal'),
+                status='pending',
+                queued_at=now,
+                celery_task_id=str(uuid.uuid4()),
+                cache_key=key,
+            )
+            pending.append(execution)
+        executions.append(execution)
+
+    if not executions:
+        return executions
+
+    TaskExecution.objects.bulk_create(executions)
+    if pending:
+        transaction.on_commit(lambda: send_executions(pending))
+    transaction.on_commit(lambda: events.publish_status(*executions))
+    return executions
+
+
+def send_executions(executions):
+    """
+    Pasa las ejecuciones a la cola de reparto y despacha las que quepan
+    en el límite de su usuario
+    """
+    try:
+        fairshare.submit(executions)
+        fairshare.dispatch()
+    except RedisError as e:
+        # Siguen pendientes en la base de datos: run_dispatcher las vuelve a encolar
+        logger.warning('Could not queue %d executions: %s', len(executions), e)
+
+
+def start_sweep(task, user, grid, parameters=None):
+    """
+    Crea un barrido con una ejecución por punto de la rejilla sobre la
+    versión activa de la tarea; los puntos ya cacheados cuentan como hechos
+    """
+    version = task.active_version
+    points = expand_grid(grid, parameters)
+    with transaction.atomic():
+        sweep = ParameterSweep.objects.create(
+            task=task,
+            task_version=version,
+            owner=user,
+            grid=grid,
+            parameters=parameters or {},
+            total=len(points),
+        )
+        executions = enqueue_executions(((version, user, point) for point in points), sweep=sweep)
+        hits = sum(execution.status == 'completed' for execution in executions)
+        if hits:
+            ParameterSweep.record(sweep.pk, succeeded=True, count=hits)
+        touch_last_run([task.pk])
+    sweep.refresh_from_db()
+    return sweep
+
+
+def touch_last_run(task_ids):
+    """
+    Adelanta Task.last_run a ahora en las tareas que no lo tengan ya dentro
+    de TASK_LAST_RUN_RESOLUTION: con muchas ejecuciones seguidas de una
+    misma tarea solo la primera de cada intervalo escribe en su fila, las
+    demás no encuentran nada que actualizar y no esperan a su bloqueo
+    """
+    now = timezone.now()
+    stale = Q(last_run__isnull=True) | Q(last_run__lt=now - timedelta(seconds=settings.TASK_LAST_RUN_RESOLUTION))
+    updated = Task.objects.filter(stale, pk__in=task_ids).update(last_run=now)
+    if updated:
+        read_cache.invalidate('task', *task_ids)
+    return updated
\ No newline at end of file
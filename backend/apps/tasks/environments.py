@@ -0,0 +1,235 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import venv
+from contextlib import contextmanager
+
+from django.conf import settings
+
+READY_MARKER = '.taskflow-ready'
+KERNEL_NAME = 'taskflow'
+
+# Nombres de import cuyo paquete en PyPI tiene otro nombre
+PACKAGE_ALIASES = {
+    'bs4': 'beautifulsoup4',
+    'cv2': 'opencv-python',
+    'dateutil': 'python-dateutil',
+    'dotenv': 'python-dotenv',
+    'PIL': 'Pillow',
+    'sklearn': 'scikit-learn',
+    'yaml': 'PyYAML',
+}
+
+
+class EnvironmentBuildError(Exception):
+    pass
+
+
+class Environment:
+    """
+    Entorno de ejecución listo para usar
+    """
+    def __init__(self, key, python, path=None):
+        self.key = key
+        self.python = python
+        self.path = path
+
+    @property
+    def kernel_dirs(self):
+        # Sin venv propio se usa el kernel python3 del worker
+        if self.path is None:
+            return None
+        return [os.path.join(self.path, 'share', 'jupyter', 'kernels')]
+
+    @property
+    def kernel_name(self):
+        return KERNEL_NAME if self.path else 'python3'
+
+
+def normalize_requirements(requirements):
+    """
+    Convierte el texto de requirements en una lista ordenada de paquetes
+    instalables, sin módulos de la librería estándar
+    """
+    packages = set()
+    for line in (requirements or '').splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line or line in sys.stdlib_module_names:
+            continue
+        packages.add(PACKAGE_ALIASES.get(line, line))
+    return sorted(packages, key=str.lower)
+
+
+def requirements_hash(packages):
+    payload = json.dumps({'python': sys.version.split()[0], 'packages': packages})
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EnvironmentManager:
+    """
+    Cache local de virtualenvs, uno por hash de requirements.
+
+    Cada entorno se construye una sola vez bajo su lock de construcción
+    (<entorno>.build.lock); mientras una ejecución lo usa mantiene un lock
+    compartido (<entorno>.lock) para que la expulsión LRU no lo borre. El
+    lock de uso solo se toma en exclusiva un instante, para colocar el
+    entorno recién construido.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or settings.TASK_ENVS_ROOT
+        self.max_bytes = max_bytes if max_bytes is not None else settings.TASK_ENVS_MAX_BYTES
+
+    def env_path(self, key):
+        return os.path.join(self.root, key)
+
+    @contextmanager
+    def environment(self, requirements):
+        packages = normalize_requirements(requirements)
+        if not packages:
+            yield Environment('system', sys.executable)
+            return
+
+        key = requirements_hash(packages)
+        path = self.env_path(key)
+        os.makedirs(self.root, exist_ok=True)
+
+        with open(f'{path}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            # La expulsión puede borrarlo entre la construcción y el lock compartido
+            while not self._is_ready(path):
+                fcntl.flock(lock, fcntl.LOCK_UN)
+                self._build_once(path, packages, lock)
+
+            # El mtime del marcador es la marca de último uso para el LRU
+            os.utime(os.path.join(path, READY_MARKER))
+            try:
+                yield Environment(key, os.path.join(path, 'bin', 'python'), path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        self.evict()
+
+    def _is_ready(self, path):
+        return os.path.exists(os.path.join(path, READY_MARKER))
+
+    def _build_once(self, path, packages, lock):
+        """
+        Construye el entorno si nadie lo ha hecho ya y vuelve con el lock de
+        uso compartido. Las ejecuciones que lo necesitan esperan al lock de
+        construcción, no a las que ya están usando otros entornos
+        """
+        with open(f'{path}.build.lock', 'a') as build_lock:
+            fcntl.flock(build_lock, fcntl.LOCK_EX)
+            # Otra ejecución pudo construirlo mientras esperábamos el lock
+            if self._is_ready(path):
+                fcntl.flock(lock, fcntl.LOCK_SH)
+                return
+            build_path = self._build(path, packages)
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(build_path, path)
+            fcntl.flock(lock, fcntl.LOCK_SH)
+
+    def _build(self, path, packages):
+        """
+        Construye el entorno en <entorno>.build y devuelve esa ruta; si algún
+        paquete no se instala no queda nada a medias
+        """
+        build_path = f'{path}.build'
+        shutil.rmtree(build_path, ignore_errors=True)
+        try:
+            # Con los site-packages del sistema las librerías ya instaladas en el
+            # worker no se vuelven a descargar
+            venv.EnvBuilder(system_site_packages=True, with_pip=False, symlinks=True).create(build_path)
+            python = os.path.join(build_path, 'bin', 'python')
+
+            if not self._pip_install(python, packages):
+                # Se instala paquete por paquete para decir cuáles fallan
+                failed = [package for package in packages if not self._pip_install(python, [package])]
+                raise EnvironmentBuildError(f'Could not install {", ".join(failed or packages)}')
+
+            self._write_kernel_spec(build_path, os.path.join(path, 'bin', 'python'))
+
+            with open(os.path.join(build_path, READY_MARKER), 'w') as marker:
+                json.dump({'packages': packages, 'size': self._disk_usage(build_path)}, marker)
+        except BaseException:
+            shutil.rmtree(build_path, ignore_errors=True)
+            raise
+        return build_path
+
+    def _pip_install(self, python, packages):
+        try:
+            result = subprocess.run(
+                [python, '-m', 'pip', 'install', '--disable-pip-version-check', '--no-input', *packages],
+                capture_output=True,
+                text=True,
+                timeout=settings.TASK_ENVS_BUILD_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            raise EnvironmentBuildError(f'Timed out installing {", ".join(packages)}')
+        return result.returncode == 0
+
+    def _write_kernel_spec(self, build_path, python):
+        kernel_dir = os.path.join(build_path, 'share', 'jupyter', 'kernels', KERNEL_NAME)
+        os.makedirs(kernel_dir, exist_ok=True)
+        with open(os.path.join(kernel_dir, 'kernel.json'), 'w') as f:
+            json.dump({
+                'argv': [python, '-m', 'ipykernel_launcher', '-f', '{connection_file}'],
+                'display_name': 'TaskFlow',
+                'language': 'python',
+            }, f)
+
+    def _disk_usage(self, path):
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def cached_environments(self):
+        """
+        Entornos listos, del menos al más recientemente usado
+        """
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+
+        for key in os.listdir(self.root):
+            marker = os.path.join(self.root, key, READY_MARKER)
+            try:
+                with open(marker) as f:
+                    info = json.load(f)
+                entries.append((os.path.getmtime(marker), key, info.get('size', 0)))
+            except (OSError, ValueError):
+                continue
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Elimina los entornos menos usados hasta respetar el presupuesto de disco.
+        Los entornos en uso (con lock tomado) se saltan.
+        """
+        entries = self.cached_environments()
+        total = sum(size for _, _, size in entries)
+
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            path = self.env_path(key)
+            with open(f'{path}.lock', 'a') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                os.remove(os.path.join(path, READY_MARKER))
+                shutil.rmtree(path, ignore_errors=True)
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            total -= size
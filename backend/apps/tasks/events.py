@@ -0,0 +1,297 @@
+"""
+Eventos de las ejecuciones en tiempo real.
+
+Los workers (y la API, al crear o cancelar ejecuciones) publican en Redis
+pub/sub los cambios de estado, los bloques nuevos del log y las muestras de
+recursos, cada evento en el canal de su ejecución y en el de su tarea. Los
+clientes se suscriben por Server-Sent Events (ver views.execution_events y
+views.task_events), servidos por un proceso ASGI.
+
+Cada proceso ASGI mantiene una sola suscripción a Redis para todos sus
+clientes (EventHub): un canal se suscribe con el primer cliente que lo pide
+y se abandona con el último, así miles de paneles abiertos son unas pocas
+conexiones a Redis y ninguna consulta a la base de datos por evento.
+
+Claves y canales (bajo TASK_EVENTS_PREFIX):
+    execution:<id>  canal de una ejecución
+    task:<id>       canal de todas las ejecuciones de una tarea
+    last:<id>       última muestra de recursos de una ejecución en curso
+    ticket:<ticket> usuario y canal de un ticket de stream aún sin usar
+"""
+import asyncio
+import json
+import logging
+import secrets
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+from .logstore import tail
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'failed', 'timeout', 'cancelled')
+# La última muestra caduca si el worker deja de publicar
+LAST_SAMPLE_TTL = 60
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.TASK_EVENTS_REDIS_URL, decode_responses=True)
+    return _client
+
+
+def _key(*parts):
+    return ':'.join([settings.TASK_EVENTS_PREFIX, *map(str, parts)])
+
+
+def execution_channel(execution_id):
+    return _key('execution', execution_id)
+
+
+def task_channel(task_id):
+    return _key('task', task_id)
+
+
+def issue_ticket(user, channel):
+    """
+    Ticket de un solo uso y vida corta para abrir el stream de `channel`.
+    EventSource no puede enviar cabeceras, y el JWT completo en la URL
+    acabaría en logs e historiales
+    """
+    ticket = secrets.token_urlsafe(32)
+    get_redis().set(
+        _key('ticket', ticket), json.dumps({'user': user.pk, 'channel': channel}),
+        ex=settings.TASK_EVENTS_TICKET_TTL
+    )
+    return ticket
+
+
+def redeem_ticket(ticket, channel):
+    """
+    Consume el ticket y devuelve el id de su usuario, o None si no existe,
+    ha caducado, ya se usó o es de otro canal
+    """
+    try:
+        data = get_redis().getdel(_key('ticket', ticket))
+    except redis.RedisError as e:
+        logger.warning('Could not redeem stream ticket: %s', e)
+        return None
+    if data is None:
+        return None
+    data = json.loads(data)
+    return data['user'] if data['channel'] == channel else None
+
+
+def encode_event(execution, event_type, data):
+    return json.dumps({
+        'type': event_type,
+        'execution': execution.id,
+        'task': execution.task_version.task_id,
+        'data': data,
+    }, default=str)
+
+
+def status_data(execution):
+    return {
+        'status': execution.status,
+        'started_at': execution.started_at,
+        'completed_at': execution.completed_at,
+        'error_message': execution.error_message,
+    }
+
+
+def publish(events):
+    """
+    Publica pares (ejecución, tipo, datos) en una sola ida y vuelta a Redis.
+    Los eventos son un aviso, no el registro: si Redis falla se pierden y la
+    ejecución sigue
+    """
+    events = list(events)
+    if not events:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for execution, event_type, data in events:
+            message = encode_event(execution, event_type, data)
+            pipe.publish(execution_channel(execution.id), message)
+            pipe.publish(task_channel(execution.task_version.task_id), message)
+            if event_type == 'resources':
+                pipe.set(_key('last', execution.id), json.dumps(data), ex=LAST_SAMPLE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning('Could not publish %d execution events: %s', len(events), e)
+
+
+def publish_status(*executions):
+    publish((execution, 'status', status_data(execution)) for execution in executions)
+
+
+def latest_sample(execution_id):
+    """
+    Última muestra de recursos publicada de una ejecución en curso
+    """
+    sample = get_redis().get(_key('last', execution_id))
+    return json.loads(sample) if sample else None
+
+
+class ExecutionPublisher:
+    """
+    Se engancha al muestreo de recursos de una ejecución en curso: con cada
+    muestra publica la muestra y el texto añadido al log desde la anterior,
+    con sus offsets, para que el cliente pueda pedir al endpoint de logs lo
+    que se haya perdido
+    """
+
+    def __init__(self, execution):
+        self.execution = execution
+        self.offset = 0
+
+    def __call__(self, sample):
+        self.publish(sample)
+
+    def publish(self, sample=None):
+        events = []
+        if sample is not None:
+            events.append((self.execution, 'resources', sample))
+        try:
+            chunk = tail(self.execution, since=self.offset, limit=settings.TASK_EVENTS_LOG_CHUNK)
+        except OSError:
+            chunk = None
+        if chunk and chunk['next_offset'] > self.offset:
+            events.append((self.execution, 'log', {
+                'offset': chunk['offset'],
+                'next_offset': chunk['next_offset'],
+                'text': chunk['logs'],
+            }))
+            self.offset = chunk['next_offset']
+        publish(events)
+
+
+class EventHub:
+    """
+    Suscripción compartida de un proceso ASGI: reparte cada mensaje de Redis
+    a las colas de los clientes suscritos a su canal. Si un cliente no da
+    abasto se descartan sus eventos más antiguos en vez de frenar al resto.
+    """
+
+    def __init__(self):
+        self._queues = {}  # canal -> colas de los clientes
+        self._pubsub = None
+        self._reader = None
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, channels):
+        queue = asyncio.Queue(maxsize=settings.TASK_EVENTS_CLIENT_BUFFER)
+        async with self._lock:
+            if self._pubsub is None:
+                client = redis.asyncio.Redis.from_url(settings.TASK_EVENTS_REDIS_URL, decode_responses=True)
+                self._pubsub = client.pubsub()
+            new = [channel for channel in channels if channel not in self._queues]
+            for channel in channels:
+                self._queues.setdefault(channel, set()).add(queue)
+            if new:
+                await self._pubsub.subscribe(*new)
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read())
+        return queue
+
+    async def unsubscribe(self, channels, queue):
+        async with self._lock:
+            gone = []
+            for channel in channels:
+                queues = self._queues.get(channel)
+                if queues is None:
+                    continue
+                queues.discard(queue)
+                if not queues:
+                    del self._queues[channel]
+                    gone.append(channel)
+            if gone:
+                try:
+                    await self._pubsub.unsubscribe(*gone)
+                except redis.RedisError:
+                    logger.warning('Could not unsubscribe from %d event channels', len(gone))
+
+    async def _read(self):
+        while True:
+            async with self._lock:
+                if not self._queues:
+                    # El siguiente subscribe() arranca otro lector
+                    self._reader = None
+                    return
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except redis.RedisError as e:
+                # redis-py reconecta y vuelve a suscribir en la siguiente lectura
+                logger.warning('Event subscription lost: %s', e)
+                await asyncio.sleep(1)
+                continue
+            if message is None or message['type'] != 'message':
+                continue
+            for queue in list(self._queues.get(message['channel'], ())):
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(message['data'])
+
+
+_hubs = {}
+
+
+def get_hub():
+    """
+    Hub del bucle de eventos en curso (uno por proceso con un servidor ASGI)
+    """
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        for stale in [other for other in _hubs if other.is_closed()]:
+            del _hubs[stale]
+        hub = _hubs[loop] = EventHub()
+    return hub
+
+
+def format_sse(message):
+    """
+    Mensaje publicado -> (evento, texto SSE con el tipo como nombre del evento)
+    """
+    event = json.loads(message)
+    return event, f"event: {event['type']}\ndata: {message}\n\n"
+
+
+def is_final(event):
+    return event['type'] == 'status' and event['data']['status'] in FINISHED_STATUSES
+
+
+async def stream_events(channels, snapshot, until_finished=False):
+    """
+    Cuerpo de una respuesta SSE: primero el estado actual (`snapshot`, una
+    corrutina que devuelve mensajes ya codificados) y después lo que se
+    publique en `channels`, con un comentario de vez en cuando para que los
+    proxies no cierren la conexión. Se suscribe antes de leer el estado para
+    no perder lo que pase entre medias.
+    """
+    hub = get_hub()
+    queue = await hub.subscribe(channels)
+    try:
+        for message in await snapshot():
+            event, text = format_sse(message)
+            yield text
+            if until_finished and is_final(event):
+                return
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=settings.TASK_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            event, text = format_sse(message)
+            yield text
+            if until_finished and is_final(event):
+                return
+    finally:
+        await hub.unsubscribe(channels, queue)
\ No newline at end of file
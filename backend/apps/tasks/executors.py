@@ -0,0 +1,195 @@
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runner.py')
+# Únicas variables del worker que ve el código del usuario, además de las
+# TASKFLOW_*; SECRET_KEY, DATABASE_URL, el broker o las credenciales no pasan
+RUNNER_ENV = ('PATH', 'HOME', 'LANG', 'LC_ALL', 'TZ', 'TMPDIR')
+
+
+class InterpreterError(Exception):
+    pass
+
+
+def runner_environment(**extra):
+    env = {
+        name: value for name, value in os.environ.items()
+        if name in RUNNER_ENV or name.startswith('TASKFLOW_')
+    }
+    env.update(extra)
+    return env
+
+
+class WarmInterpreter:
+    """
+    Proceso runner.py vivo, con las librerías pesadas ya importadas
+    """
+
+    def __init__(self, python, preload):
+        self.python = python
+        self.runs = 0
+        self.rss = 0
+        self.warm = False  # True si se tomó ya caliente del pool
+        env = runner_environment(TASKFLOW_PRELOAD=','.join(preload), PYTHONUNBUFFERED='1')
+        self.process = subprocess.Popen(
+            [python, RUNNER_PATH],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            text=True,
+            bufsize=1,
+        )
+        self._read_event('ready')
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def _read_event(self, expected):
+        line = self.process.stdout.readline()
+        if not line:
+            raise InterpreterError('Interpreter exited unexpectedly')
+        event = json.loads(line)
+        if event.get('event') != expected:
+            raise InterpreterError(f"Unexpected interpreter event {event.get('event')!r}")
+        return event
+
+    def run(self, path, cwd, log_path, argv=None, env=None, limits=None, on_start=None):
+        """
+        Ejecuta un script en un hijo aislado y espera a que termine.
+        `limits` admite 'wall' y 'cpu' (segundos) y 'memory' (bytes)
+        """
+        job = {
+            'path': path, 'cwd': cwd, 'log_path': log_path,
+            'argv': argv or [], 'env': env or {}, 'limits': limits or {},
+        }
+        self.process.stdin.write(json.dumps(job) + '\n')
+        self.process.stdin.flush()
+
+        started = self._read_event('started')
+        if on_start is not None:
+            on_start(started['pid'])
+
+        finished = self._read_event('finished')
+        self.runs += 1
+        self.rss = finished.get('runner_rss', 0)
+        return finished
+
+    def close(self):
+        if self.alive:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+class InterpreterPool:
+    """
+    Pool de intérpretes precalentados por worker, uno o más por python de entorno.
+
+    Cada intérprete se recicla tras `max_runs` ejecuciones o si su memoria
+    supera `max_rss`. Solo se conservan `max_idle` intérpretes ociosos en total;
+    al superarse se cierran los menos usados recientemente.
+    """
+
+    def __init__(self, preload=None, max_idle=None, max_runs=None, max_rss=None):
+        self.preload = preload if preload is not None else settings.TASK_EXECUTOR_PRELOAD
+        self.max_idle = max_idle if max_idle is not None else settings.TASK_EXECUTOR_MAX_IDLE
+        self.max_runs = max_runs if max_runs is not None else settings.TASK_EXECUTOR_MAX_RUNS
+        self.max_rss = max_rss if max_rss is not None else settings.TASK_EXECUTOR_MAX_RSS
+        self._idle = OrderedDict()  # python -> [WarmInterpreter]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _pop_idle(self, python):
+        with self._lock:
+            interpreters = self._idle.get(python) or []
+            while interpreters:
+                interpreter = interpreters.pop()
+                if interpreter.alive:
+                    interpreter.warm = True
+                    return interpreter
+        return None
+
+    def acquire(self, python):
+        interpreter = self._pop_idle(python)
+        if interpreter is not None:
+            self.hits += 1
+            return interpreter
+        self.misses += 1
+        return WarmInterpreter(python, self.preload)
+
+    def release(self, interpreter):
+        if (
+            not interpreter.alive
+            or interpreter.runs >= self.max_runs
+            or interpreter.rss > self.max_rss
+        ):
+            interpreter.close()
+            return
+
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(interpreter.python, []).append(interpreter)
+            self._idle.move_to_end(interpreter.python)
+            while sum(len(items) for items in self._idle.values()) > self.max_idle:
+                python, items = next(iter(self._idle.items()))
+                evicted.append(items.pop(0))
+                if not items:
+                    del self._idle[python]
+        for item in evicted:
+            item.close()
+
+    def prewarm(self, python, count=1):
+        for _ in range(count):
+            self.release(WarmInterpreter(python, self.preload))
+
+    def close_all(self):
+        with self._lock:
+            interpreters = [i for items in self._idle.values() for i in items]
+            self._idle.clear()
+        for interpreter in interpreters:
+            interpreter.close()
+
+    @contextmanager
+    def lease(self, python):
+        interpreter = self.acquire(python)
+        try:
+            yield interpreter
+        except Exception:
+            # Estado del protocolo desconocido: no se reutiliza
+            interpreter.close()
+            raise
+        else:
+            self.release(interpreter)
+
+    def run(self, python, path, cwd, log_path, **kwargs):
+        with self.lease(python) as interpreter:
+            return interpreter.run(path, cwd, log_path, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            idle = {python: len(items) for python, items in self._idle.items()}
+        return {'hits': self.hits, 'misses': self.misses, 'idle': idle}
+
+
+_pool = None
+
+
+def get_interpreter_pool():
+    """
+    Pool del proceso actual; cada proceso del worker tiene el suyo
+    """
+    global _pool
+    if _pool is None:
+        _pool = InterpreterPool()
+    return _pool
@@ -0,0 +1,404 @@
+"""
+Reparto justo de los workers entre usuarios.
+
+Las ejecuciones no van directas a Celery: se encolan en Redis, en una lista
+por prioridad y usuario (quien lanza la ejecución). Cada prioridad tiene un
+anillo con los usuarios que tienen trabajo pendiente y el despacho lo
+recorre por turnos, así 5.000 ejecuciones de un usuario no retrasan la
+primera de otro. Un usuario nunca tiene más de su límite de ejecuciones en
+curso: el despacho solo saca de su cola cuando termina una de las suyas.
+
+Cada hueco ocupado lleva la hora del despacho, que el worker renueva
+mientras ejecuta (Heartbeat). reconcile() recupera los huecos caducados: si
+la ejecución estaba en curso y no late desde hace TASK_QUEUE_CLAIM_TIMEOUT
+se da por fallida porque su worker murió. Una pendiente no late hasta que un
+worker la empieza, y con los workers saturados puede pasar mucho tiempo en
+la cola de Celery; solo vuelve a la cola si lleva más de
+TASK_QUEUE_DISPATCH_TIMEOUT despachada (el despacho o el mensaje se
+perdieron), así la saturación no llena el broker de duplicados. También vuelve a encolar las pendientes que no están en
+Redis, por ejemplo si Redis falló al crearlas.
+
+Claves (bajo TASK_QUEUE_PREFIX):
+    queue:<prioridad>:<usuario>  lista de ids de ejecución pendientes
+    ring:<prioridad>             usuarios con algo en su cola de esa prioridad
+    running:<usuario>            zset de ids despachados y sin terminar -> último latido
+    caps                         hash usuario -> límite propio de concurrencia
+    duration:<usuario>           media móvil de la duración de sus ejecuciones
+"""
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ('high', 'normal', 'low')
+# Los scripts admiten listas largas, pero unpack() de Lua tiene un límite
+SUBMIT_CHUNK_SIZE = 1000
+# Peso de la última duración en la media móvil
+DURATION_SMOOTHING = 0.2
+WORKER_LOST_MESSAGE = 'Worker lost while running the execution'
+
+# KEYS: cola del usuario, anillo de la prioridad. ARGV: usuario, ids...
+SUBMIT_SCRIPT = """
+local before = redis.call('LLEN', KEYS[1])
+redis.call('RPUSH', KEYS[1], unpack(ARGV, 2))
+if before == 0 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+end
+return before + #ARGV - 1
+"""
+
+# ARGV: prefijo, límite por defecto, hora, prioridades de mayor a menor.
+# Devuelve {usuario, id, prioridad} o nil si nadie puede despachar nada
+CLAIM_SCRIPT = """
+local prefix = ARGV[1]
+local default_cap = tonumber(ARGV[2])
+local now = ARGV[3]
+for i = 4, #ARGV do
+    local priority = ARGV[i]
+    local ring = prefix .. ':ring:' .. priority
+    for _ = 1, redis.call('LLEN', ring) do
+        local owner = redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+        local queue = prefix .. ':queue:' .. priority .. ':' .. owner
+        local running = prefix .. ':running:' .. owner
+        local cap = tonumber(redis.call('HGET', prefix .. ':caps', owner) or default_cap)
+        if redis.call('ZCARD', running) < cap then
+            local id = redis.call('LPOP', queue)
+            if id then
+                redis.call('ZADD', running, now, id)
+                if redis.call('LLEN', queue) == 0 then
+                    redis.call('LREM', ring, 0, owner)
+                end
+                return {owner, id, priority}
+            end
+            redis.call('LREM', ring, 0, owner)
+        end
+    end
+end
+return nil
+"""
+
+# KEYS: cola del usuario, anillo de la prioridad, en curso del usuario.
+# ARGV: usuario, ids... Reescribe la cola de una pasada en vez de un LREM
+# por id, que con miles de cancelaciones sería cuadrático
+WITHDRAW_SCRIPT = """
+local drop = {}
+for i = 2, #ARGV do
+    drop[ARGV[i]] = true
+end
+redis.call('ZREM', KEYS[3], unpack(ARGV, 2))
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+local keep = {}
+for _, id in ipairs(items) do
+    if not drop[id] then
+        keep[#keep + 1] = id
+    end
+end
+if #keep == #items then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 1, #keep, 1000 do
+    redis.call('RPUSH', KEYS[1], unpack(keep, i, math.min(i + 999, #keep)))
+end
+if #keep == 0 then
+    redis.call('LREM', KEYS[2], 0, ARGV[1])
+end
+return #items - #keep
+"""
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.TASK_QUEUE_REDIS_URL, decode_responses=True)
+    return _client
+
+
+def _key(*parts):
+    return ':'.join([settings.TASK_QUEUE_PREFIX, *map(str, parts)])
+
+
+def owner_of(execution):
+    return execution.triggered_by_id or 0
+
+
+def queue_name(priority):
+    """
+    Cola de Celery de los workers que ejecutan tareas de esa prioridad
+    """
+    return f'executions.{priority}'
+
+
+def submit(executions):
+    """
+    Añade las ejecuciones a la cola de su usuario y prioridad
+    """
+    client = get_redis()
+    script = client.register_script(SUBMIT_SCRIPT)
+    groups = {}
+    for execution in executions:
+        groups.setdefault((execution.priority, owner_of(execution)), []).append(execution.id)
+
+    for (priority, owner), ids in groups.items():
+        for start in range(0, len(ids), SUBMIT_CHUNK_SIZE):
+            script(
+                keys=[_key('queue', priority, owner), _key('ring', priority)],
+                args=[owner, *ids[start:start + SUBMIT_CHUNK_SIZE]]
+            )
+
+
+def withdraw(executions):
+    """
+    Quita ejecuciones canceladas de su cola y, si ya se habían despachado,
+    libera su hueco; devuelve cuántas seguían en cola
+    """
+    client = get_redis()
+    script = client.register_script(WITHDRAW_SCRIPT)
+    groups = {}
+    for execution in executions:
+        groups.setdefault((execution.priority, owner_of(execution)), []).append(execution.id)
+
+    removed = 0
+    for (priority, owner), ids in groups.items():
+        for start in range(0, len(ids), SUBMIT_CHUNK_SIZE):
+            removed += script(
+                keys=[_key('queue', priority, owner), _key('ring', priority), _key('running', owner)],
+                args=[owner, *ids[start:start + SUBMIT_CHUNK_SIZE]]
+            )
+    return removed
+
+
+def claim():
+    """
+    Siguiente ejecución a despachar según prioridad, turno y límite de su
+    usuario: (usuario, id, prioridad) o None
+    """
+    client = get_redis()
+    claimed = client.register_script(CLAIM_SCRIPT)(
+        args=[settings.TASK_QUEUE_PREFIX, settings.TASK_OWNER_MAX_CONCURRENCY, time.time(), *PRIORITIES]
+    )
+    if not claimed:
+        return None
+    owner, execution_id, priority = claimed
+    return int(owner), int(execution_id), priority
+
+
+def dispatch(limit=None):
+    """
+    Envía a Celery todo lo que cabe en los límites de cada usuario;
+    devuelve cuántas ejecuciones se han despachado
+    """
+    from .models import TaskExecution
+    from .tasks import execute_task
+
+    sent = 0
+    while limit is None or sent < limit:
+        claimed = claim()
+        if claimed is None:
+            break
+        _, execution_id, priority = claimed
+        celery_task_id = (
+            TaskExecution.objects.filter(pk=execution_id, status='pending')
+            .values_list('celery_task_id', flat=True).first()
+        )
+        if celery_task_id is None:
+            # Cancelada o borrada mientras esperaba: libera el hueco
+            get_redis().zrem(_key('running', claimed[0]), execution_id)
+            continue
+        execute_task.apply_async(
+            (execution_id,), task_id=celery_task_id or None, queue=queue_name(priority)
+        )
+        sent += 1
+    return sent
+
+
+def release(execution, duration=None):
+    """
+    Libera el hueco de una ejecución terminada, actualiza la duración media
+    de su usuario y despacha lo que quepa ahora
+    """
+    client = get_redis()
+    owner = owner_of(execution)
+    try:
+        client.zrem(_key('running', owner), execution.id)
+        if duration is not None:
+            key = _key('duration', owner)
+            previous = client.get(key)
+            average = duration if previous is None else (
+                DURATION_SMOOTHING * duration + (1 - DURATION_SMOOTHING) * float(previous)
+            )
+            client.set(key, average)
+        dispatch()
+    except redis.RedisError:
+        # El hueco caduca sin latidos y lo recupera reconcile()
+        logger.exception('Could not release fair-share slot of execution %s', execution.id)
+
+
+def owner_cap(owner):
+    cap = get_redis().hget(_key('caps'), owner)
+    return int(cap) if cap is not None else settings.TASK_OWNER_MAX_CONCURRENCY
+
+
+def set_owner_cap(owner, cap):
+    """
+    Límite propio de ejecuciones simultáneas de un usuario; None vuelve al
+    valor por defecto
+    """
+    if cap is None:
+        get_redis().hdel(_key('caps'), owner)
+    else:
+        get_redis().hset(_key('caps'), owner, cap)
+
+
+def queue_status(execution):
+    """
+    Posición de una ejecución pendiente en la cola de su usuario y una
+    estimación de la espera: delante tiene las de su cola, que salen a
+    medida que terminan las que ya están en curso, cada una tardando lo
+    que suele tardar una ejecución de ese usuario. No cuenta la espera
+    adicional si los workers están todos ocupados.
+    """
+    client = get_redis()
+    owner = owner_of(execution)
+    position = client.lpos(_key('queue', execution.priority, owner), execution.id)
+    if position is None:
+        return None
+
+    cap = max(owner_cap(owner), 1)
+    running = client.zcard(_key('running', owner))
+    average = client.get(_key('duration', owner))
+    estimate = None
+    if average is not None:
+        ahead = position + running - cap + 1
+        estimate = math.ceil(max(ahead, 0) / cap) * float(average)
+    return {
+        'position': position,
+        'running': running,
+        'concurrency_limit': cap,
+        'estimated_wait': estimate,
+    }
+
+
+def heartbeat(execution):
+    """
+    Renueva el hueco de una ejecución en curso; no lo crea si ya se liberó
+    """
+    get_redis().zadd(_key('running', owner_of(execution)), {execution.id: time.time()}, xx=True)
+
+
+class Heartbeat:
+    """
+    Hilo del worker que renueva el hueco de la ejecución mientras dura, para
+    que reconcile() no lo tome por abandonado
+    """
+
+    def __init__(self, execution):
+        self.execution = execution
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._done.set()
+
+    def _beat(self):
+        while not self._done.wait(settings.TASK_QUEUE_HEARTBEAT_INTERVAL):
+            try:
+                heartbeat(self.execution)
+            except redis.RedisError as e:
+                logger.warning('Could not renew fair-share slot of execution %s: %s', self.execution.id, e)
+
+
+def reconcile(now=None):
+    """
+    Recupera huecos: libera los de ejecuciones ya terminadas o borradas,
+    devuelve a la cola las pendientes despachadas hace más de
+    TASK_QUEUE_DISPATCH_TIMEOUT y da por fallidas las que estaban en curso
+    cuando su worker dejó de latir.
+    Devuelve cuántos huecos se han liberado
+    """
+    from .models import TaskExecution
+
+    client = get_redis()
+    now = now or time.time()
+    expired_before = {
+        'pending': now - settings.TASK_QUEUE_DISPATCH_TIMEOUT,
+        'running': now - settings.TASK_QUEUE_CLAIM_TIMEOUT,
+    }
+    removed = 0
+    requeue = []
+    lost = []
+    for key in client.scan_iter(match=_key('running', '*')):
+        claims = {int(value): score for value, score in client.zrange(key, 0, -1, withscores=True)}
+        rows = {
+            execution.pk: execution
+            for execution in TaskExecution.objects.filter(pk__in=claims, status__in=('pending', 'running'))
+        }
+        free = [pk for pk in claims if pk not in rows]
+        for pk, score in claims.items():
+            if pk in rows and score < expired_before[rows[pk].status]:
+                free.append(pk)
+                (requeue if rows[pk].status == 'pending' else lost).append(rows[pk])
+        if free:
+            removed += client.zrem(key, *free)
+
+    if requeue:
+        submit(requeue)
+    for execution in lost:
+        fail_lost(execution)
+    resubmit_missing(now)
+    return removed
+
+
+def fail_lost(execution):
+    """
+    Da por fallida una ejecución cuyo worker dejó de renovar su hueco
+    """
+    from .signals import execution_finished
+
+    if execution.transition('failed', completed_at=timezone.now(), error_message=WORKER_LOST_MESSAGE):
+        execution_finished.send(sender=type(execution), execution=execution)
+
+
+def resubmit_missing(now=None, limit=1000):
+    """
+    Vuelve a encolar las ejecuciones pendientes que no están ni en su cola
+    ni en curso (por ejemplo si Redis falló al crearlas). Solo mira las
+    encoladas hace más de TASK_QUEUE_CLAIM_TIMEOUT, para no adelantarse al
+    envío que sigue al commit
+    """
+    from .models import TaskExecution
+
+    now = now or time.time()
+    queued_before = datetime.fromtimestamp(now - settings.TASK_QUEUE_CLAIM_TIMEOUT, dt_timezone.utc)
+    pending = list(
+        TaskExecution.objects.filter(status='pending', queued_at__lt=queued_before)
+        .order_by('queued_at')[:limit]
+    )
+    if not pending:
+        return 0
+    pipe = get_redis().pipeline(transaction=False)
+    for execution in pending:
+        pipe.lpos(_key('queue', execution.priority, owner_of(execution)), execution.id)
+        pipe.zscore(_key('running', owner_of(execution)), execution.id)
+    found = pipe.execute()
+    missing = [
+        execution for index, execution in enumerate(pending)
+        if found[2 * index] is None and found[2 * index + 1] is None
+    ]
+    if missing:
+        logger.warning('Resubmitting %d pending executions missing from the queues', len(missing))
+        submit(missing)
+    return len(missing)
\ No newline at end of file
@@ -0,0 +1,55 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import TaskExecution
+
+
+def parse_datetime_param(name, value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: 'Expected an ISO 8601 datetime'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class ExecutionFilterBackend(BaseFilterBackend):
+    """
+    Filtros del historial de ejecuciones: ?task=, ?sweep=, ?status=
+    (separados por comas), ?started_after= y ?started_before=. Solo se
+    aplican al listado.
+    """
+    statuses = {value for value, _ in TaskExecution.STATUS_CHOICES}
+
+    def filter_queryset(self, request, queryset, view):
+        if getattr(view, 'action', None) != 'list':
+            return queryset
+        params = request.query_params
+
+        task = params.get('task')
+        if task:
+            if not task.isdigit():
+                raise ValidationError({'task': 'Expected a task id'})
+            queryset = queryset.filter(task_version__task_id=int(task))
+
+        sweep = params.get('sweep')
+        if sweep:
+            if not sweep.isdigit():
+                raise ValidationError({'sweep': 'Expected a sweep id'})
+            queryset = queryset.filter(sweep_id=int(sweep))
+
+        status = params.get('status')
+        if status:
+            values = [value.strip() for value in status.split(',') if value.strip()]
+            unknown = set(values) - self.statuses
+            if unknown:
+                raise ValidationError({'status': f'Unknown status: {", ".join(sorted(unknown))}'})
+            queryset = queryset.filter(status__in=values)
+
+        if params.get('started_after'):
+            queryset = queryset.filter(started_at__gte=parse_datetime_param('started_after', params['started_after']))
+        if params.get('started_before'):
+            queryset = queryset.filter(started_at__lt=parse_datetime_param('started_before', params['started_before']))
+        return queryset
\ No newline at end of file
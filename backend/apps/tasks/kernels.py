@@ -0,0 +1,187 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PooledKernel:
+    """
+    Kernel Jupyter arrancado y listo, asociado a un entorno
+    """
+
+    def __init__(self, environment, km):
+        self.environment = environment
+        self.km = km
+        self.warm = False
+
+    def execute_silent(self, code, timeout=60):
+        """
+        Ejecuta código de preparación sin dejar rastro en el historial
+        """
+        kc = self.km.client()
+        kc.start_channels()
+        try:
+            kc.wait_for_ready(timeout=timeout)
+            kc.execute_interactive(code, silent=True, store_history=False, timeout=timeout)
+        finally:
+            kc.stop_channels()
+
+
+class KernelPool:
+    """
+    Pool de kernels Jupyter calientes por entorno, uno por proceso del worker.
+
+    Tras cada ejecución el kernel se reinicia en segundo plano, de modo que la
+    siguiente ejecución recibe un kernel limpio sin esperar el arranque. Entre
+    todos los entornos no se guardan más de `max_idle` kernels: al pasarse se
+    apaga uno del entorno usado hace más tiempo.
+    """
+
+    def __init__(self, size=None, preload=None, startup_timeout=60, max_idle=None):
+        self.size = size if size is not None else settings.TASK_KERNEL_POOL_SIZE
+        self.max_idle = max_idle if max_idle is not None else settings.TASK_KERNEL_POOL_MAX_IDLE
+        self.preload = preload if preload is not None else settings.TASK_EXECUTOR_PRELOAD
+        self.startup_timeout = startup_timeout
+        self._idle = OrderedDict()  # environment.key -> [PooledKernel], del menos al más reciente
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.restarts = 0
+
+    def _kernel_manager(self, environment):
+        from jupyter_client import KernelManager
+        from jupyter_client.kernelspec import KernelSpecManager
+
+        kwargs = {'kernel_name': environment.kernel_name}
+        if environment.kernel_dirs:
+            kwargs['kernel_spec_manager'] = KernelSpecManager(kernel_dirs=environment.kernel_dirs)
+        return KernelManager(**kwargs)
+
+    def _preload(self, kernel):
+        if self.preload:
+            code = '\n'.join(
+                f'try:\n    import {name}\nexcept Exception:\n    pass' for name in self.preload
+            )
+            kernel.execute_silent(code, timeout=self.startup_timeout)
+
+    def _start(self, environment):
+        km = self._kernel_manager(environment)
+        km.start_kernel()
+        kernel = PooledKernel(environment, km)
+        try:
+            self._preload(kernel)
+        except Exception:
+            km.shutdown_kernel(now=True)
+            raise
+        return kernel
+
+    def _put(self, kernel):
+        key = kernel.environment.key
+        evicted = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(idle) >= self.size:
+                return False
+            idle.append(kernel)
+            # Por encima del máximo global salen primero los entornos menos recientes
+            total = sum(len(items) for items in self._idle.values())
+            for other in list(self._idle):
+                items = self._idle[other]
+                while total > self.max_idle and items:
+                    evicted.append(items.pop(0))
+                    total -= 1
+                if not items:
+                    del self._idle[other]
+
+        kept = kernel not in evicted
+        for other in evicted:
+            if other is not kernel:
+                self.discard(other)
+        return kept
+
+    def acquire(self, environment, cwd=None):
+        with self._lock:
+            idle = self._idle.get(environment.key) or []
+            kernel = idle.pop() if idle else None
+            if environment.key in self._idle:
+                self._idle.move_to_end(environment.key)
+
+        if kernel is not None and kernel.km.is_alive():
+            self.hits += 1
+            kernel.warm = True
+        else:
+            self.misses += 1
+            kernel = self._start(environment)
+
+        if cwd:
+            try:
+                kernel.execute_silent(f'import os as _os\n_os.chdir({cwd!r})\ndel _os')
+            except Exception:
+                self.discard(kernel)
+                raise
+        return kernel
+
+    def release(self, kernel):
+        """
+        Devuelve el kernel; el reinicio ocurre en un hilo para no bloquear
+        """
+        thread = threading.Thread(target=self._recycle, args=(kernel,), daemon=True)
+        thread.start()
+        return thread
+
+    def discard(self, kernel):
+        if kernel.km.has_kernel:
+            kernel.km.shutdown_kernel(now=True)
+
+    def _recycle(self, kernel):
+        try:
+            kernel.km.restart_kernel(now=True)
+            self.restarts += 1
+            self._preload(kernel)
+        except Exception:
+            logger.exception('Could not recycle kernel for environment %s', kernel.environment.key)
+            self.discard(kernel)
+            return
+
+        if not self._put(kernel):
+            self.discard(kernel)
+
+    def fill(self, environment):
+        """
+        Arranca kernels hasta completar el tamaño del pool para el entorno
+        """
+        with self._lock:
+            missing = self.size - len(self._idle.get(environment.key) or [])
+        for _ in range(missing):
+            kernel = self._start(environment)
+            if not self._put(kernel):
+                self.discard(kernel)
+
+    def shutdown_all(self):
+        with self._lock:
+            kernels = [k for items in self._idle.values() for k in items]
+            self._idle.clear()
+        for kernel in kernels:
+            self.discard(kernel)
+
+    def stats(self):
+        with self._lock:
+            idle = {key: len(items) for key, items in self._idle.items()}
+        return {'hits': self.hits, 'misses': self.misses, 'restarts': self.restarts, 'idle': idle}
+
+
+_pool = None
+
+
+def get_kernel_pool():
+    """
+    Pool del proceso actual; cada proceso del worker tiene el suyo
+    """
+    global _pool
+    if _pool is None:
+        _pool = KernelPool()
+    return _pool
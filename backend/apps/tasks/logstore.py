@@ -0,0 +1,222 @@
+import bisect
+import gzip
+import os
+import re
+import shutil
+
+from django.conf import settings
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+
+class ExecutionLog:
+    """
+    Log de una ejecución en un archivo al que solo se añade al final.
+
+    El proceso de la ejecución escribe mientras corre y los lectores piden
+    bloques a partir de un offset en bytes, sin releer lo que ya tienen.
+    """
+
+    def __init__(self, execution_id, root=None):
+        self.path = os.path.join(root or settings.TASK_LOGS_ROOT, f'{execution_id}.log')
+
+    def create(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        open(self.path, 'wb').close()
+        return self.path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if data:
+            with open(self.path, 'ab') as f:
+                f.write(data)
+
+    def read(self, offset=0, limit=None):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(-1 if limit is None else limit)
+
+    def read_text(self):
+        return self.read().decode('utf-8', errors='replace')
+
+    def last_line(self, window=4096):
+        size = self.size()
+        data = self.read(max(size - window, 0))
+        lines = data.decode('utf-8', errors='replace').strip().splitlines()
+        return lines[-1] if lines else ''
+
+    def seal(self):
+        """
+        Comprime el log terminado en segmentos y devuelve los campos que se
+        guardan en la ejecución. El archivo plano sigue ahí hasta que la fila
+        apunta a los segmentos; entonces se borra con discard()
+        """
+        if not self.exists():
+            return {'log_file': '', 'log_size': 0, 'log_lines': 0}
+        name = os.path.splitext(os.path.basename(self.path))[0]
+        with open(self.path, 'rb') as f:
+            return write_segments(os.path.dirname(self.path), name, f)
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def write_segments(root, name, stream):
+    """
+    Escribe el contenido de `stream` en segmentos gzip de tamaño fijo (sin
+    comprimir) dentro de root/name. Cada segmento se llama con su offset
+    inicial, así una lectura por offset solo descomprime lo que necesita.
+    """
+    segment_size = settings.TASK_LOGS_SEGMENT_SIZE
+    final_path = os.path.join(root, name)
+    build_path = f'{final_path}.tmp'
+    shutil.rmtree(build_path, ignore_errors=True)
+    os.makedirs(build_path)
+
+    size = lines = 0
+    last = b''
+    while True:
+        data = stream.read(segment_size)
+        if not data:
+            break
+        segment_path = os.path.join(build_path, f'{size:012d}.gz')
+        with gzip.open(segment_path, 'wb', compresslevel=settings.TASK_LOGS_COMPRESS_LEVEL) as segment:
+            segment.write(data)
+        size += len(data)
+        lines += data.count(b'\n')
+        last = data[-1:]
+    if last and last != b'\n':
+        lines += 1
+
+    shutil.rmtree(final_path, ignore_errors=True)
+    os.rename(build_path, final_path)
+    return {'log_file': name, 'log_size': size, 'log_lines': lines}
+
+
+class SegmentedLog:
+    """
+    Log comprimido de una ejecución terminada
+    """
+
+    def __init__(self, log_file, size, root=None):
+        self.path = os.path.join(root or settings.TASK_LOGS_ROOT, log_file)
+        self.size = size
+        names = sorted(os.listdir(self.path)) if os.path.isdir(self.path) else []
+        self.starts = [int(name.split('.', 1)[0]) for name in names]
+        self.names = names
+
+    def read(self, offset=0, limit=None):
+        end = self.size if limit is None else min(offset + limit, self.size)
+        chunks = []
+        index = bisect.bisect_right(self.starts, offset) - 1
+        while offset < end and 0 <= index < len(self.names):
+            start = self.starts[index]
+            with gzip.open(os.path.join(self.path, self.names[index]), 'rb') as segment:
+                segment.seek(offset - start)
+                data = segment.read(end - offset)
+            if not data:
+                break
+            chunks.append(data)
+            offset += len(data)
+            index += 1
+        return b''.join(chunks)
+
+    def read_text(self):
+        return self.read().decode('utf-8', errors='replace')
+
+
+def delete_logs(execution, root=None):
+    root = root or settings.TASK_LOGS_ROOT
+    if execution.log_file:
+        shutil.rmtree(os.path.join(root, execution.log_file), ignore_errors=True)
+    try:
+        os.remove(ExecutionLog(execution.id, root=root).path)
+    except OSError:
+        pass
+
+
+def read_logs(execution):
+    """
+    Log completo de la ejecución, esté donde esté guardado
+    """
+    if execution.log_file:
+        return SegmentedLog(execution.log_file, execution.log_size).read_text()
+    log = ExecutionLog(execution.id)
+    if log.exists():
+        return log.read_text()
+    return execution.logs
+
+
+def _trim_chunk(data):
+    """
+    Recorta un bloque truncado por el límite para no cortar una línea (o, si
+    no hay saltos de línea, un carácter UTF-8) a la mitad
+    """
+    newline = data.rfind(b'\n')
+    if newline != -1:
+        return data[:newline + 1]
+
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue
+        needed = 1 if byte < 0x80 else 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+        return data if back >= needed else data[:-back] or data
+    return data
+
+
+def tail(execution, since=0, limit=None):
+    """
+    Devuelve el log de la ejecución a partir de `since` y el offset desde el
+    que pedir el siguiente bloque
+    """
+    limit = limit or settings.TASK_LOGS_PAGE_SIZE
+    log = ExecutionLog(execution.id)
+
+    if execution.log_file:
+        size = execution.log_size
+        data = SegmentedLog(execution.log_file, size).read(since, limit)
+    elif log.exists():
+        size = log.size()
+        data = log.read(since, limit) if since < size else b''
+    else:
+        # Ejecuciones anteriores al log en archivo
+        content = execution.logs.encode('utf-8')
+        size = len(content)
+        data = content[since:since + limit]
+
+    if since + len(data) < size:
+        data = _trim_chunk(data)
+
+    return {
+        'logs': data.decode('utf-8', errors='replace'),
+        'offset': since,
+        'next_offset': since + len(data),
+        'size': size,
+        'complete': execution.status not in ('pending', 'running'),
+    }
+
+
+def render_output(output):
+    """
+    Texto legible de una salida de celda de notebook
+    """
+    if output.output_type == 'stream':
+        return output.text
+    if output.output_type == 'error':
+        return ANSI_ESCAPE.sub('', '\n'.join(output.traceback)) + '\n'
+    text = output.get('data', {}).get('text/plain')
+    return f'{text}\n' if text else ''
\ No newline at end of file
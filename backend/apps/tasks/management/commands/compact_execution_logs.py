@@ -0,0 +1,45 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ... import read_cache
+from ...logstore import write_segments
+from ...models import TaskExecution
+
+
+class Command(BaseCommand):
+    help = 'Mueve los logs guardados en TaskExecution.logs a segmentos comprimidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        pending = TaskExecution.objects.exclude(logs='').filter(log_file='').order_by('id')
+        last_id = 0
+        moved = freed = 0
+
+        while True:
+            batch = list(pending.filter(id__gt=last_id).only('id', 'logs')[:batch_size])
+            if not batch:
+                break
+            for execution in batch:
+                last_id = execution.id
+                content = execution.logs.encode('utf-8')
+                freed += len(content)
+                moved += 1
+                if dry_run:
+                    continue
+                info = write_segments(settings.TASK_LOGS_ROOT, str(execution.id), BytesIO(content))
+                TaskExecution.objects.filter(id=execution.id, log_file='').update(logs='', **info)
+            if not dry_run:
+                # El estado en caché incluye el tamaño y las líneas del log
+                read_cache.invalidate('status', *(execution.id for execution in batch))
+
+        action = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} logs of {moved} executions ({freed} bytes) out of the table'
+        ))
+        if moved and not dry_run:
+            self.stdout.write('Run VACUUM on the executions table to reclaim the space.')
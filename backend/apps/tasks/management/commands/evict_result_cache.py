@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...result_cache import evict_expired
+
+
+class Command(BaseCommand):
+    help = 'Elimina los resultados caducados de la caché de ejecuciones'
+
+    def handle(self, *args, **options):
+        deleted = evict_expired()
+        self.stdout.write(self.style.SUCCESS(f'Evicted {deleted} cached results'))
\ No newline at end of file
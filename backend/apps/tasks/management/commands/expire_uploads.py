@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = 'Cancela las subidas por partes abandonadas y borra sus archivos temporales'
+
+    def handle(self, *args, **options):
+        expired = expire_uploads()
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} uploads'))
\ No newline at end of file
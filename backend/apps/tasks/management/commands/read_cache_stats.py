@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from ... import read_cache
+
+
+class Command(BaseCommand):
+    help = 'Muestra los aciertos y fallos de la caché de lectura por tipo de objeto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Pone los contadores a cero después de mostrarlos')
+        parser.add_argument('--clear', action='store_true', help='Vacía también la caché')
+
+    def handle(self, *args, **options):
+        for kind, counters in read_cache.stats().items():
+            ratio = counters['hit_ratio']
+            ratio = f'{ratio:.1%}' if ratio is not None else '-'
+            self.stdout.write(f"{kind:<8} hits={counters['hits']} misses={counters['misses']} hit_ratio={ratio}")
+
+        if options['reset']:
+            read_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
+        if options['clear']:
+            removed = sum(read_cache.clear(kind) for kind in read_cache.KINDS)
+            self.stdout.write(self.style.SUCCESS(f'Removed {removed} cached objects'))
\ No newline at end of file
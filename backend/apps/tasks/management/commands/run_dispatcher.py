@@ -0,0 +1,32 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...fairshare import dispatch, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        'Red de seguridad del reparto por usuario: recupera huecos de ejecuciones '
+        'que terminaron sin liberarlos o cuyo worker murió, vuelve a encolar las '
+        'pendientes perdidas y despacha lo que quepa'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Una sola pasada y salir')
+
+    def handle(self, *args, once, **options):
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+        while not stopping.is_set():
+            released = reconcile()
+            sent = dispatch()
+            if released or sent:
+                self.stdout.write(f'Released {released} stale slots, dispatched {sent} executions')
+            if once:
+                break
+            stopping.wait(settings.TASK_QUEUE_RECONCILE_INTERVAL)
\ No newline at end of file
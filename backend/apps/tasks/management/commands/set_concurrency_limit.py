@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ...fairshare import dispatch, set_owner_cap
+
+
+class Command(BaseCommand):
+    help = 'Fija cuántas ejecuciones simultáneas puede tener un usuario'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('limit', help='Número de ejecuciones o "default"')
+
+    def handle(self, *args, username, limit, **options):
+        try:
+            user = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {username} does not exist')
+
+        if limit == 'default':
+            set_owner_cap(user.pk, None)
+        elif limit.isdigit():
+            set_owner_cap(user.pk, int(limit))
+        else:
+            raise CommandError('limit must be a non-negative integer or "default"')
+
+        # Con un límite mayor puede haber trabajo listo para salir
+        dispatch()
+        self.stdout.write(self.style.SUCCESS(f'Concurrency limit of {username} set to {limit}'))
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from ... import read_cache
+from ...models import Task, TaskVersion
+
+
+class Command(BaseCommand):
+    help = 'Recalcula Task.active_version a partir del estado de las versiones'
+
+    def handle(self, *args, **options):
+        active = TaskVersion.objects.filter(task=OuterRef('pk'), status='active').order_by('-version_number')
+        updated = Task.objects.update(active_version=Subquery(active.values('pk')[:1]))
+        read_cache.clear('task')
+        self.stdout.write(self.style.SUCCESS(f'Synced active version of {updated} tasks'))
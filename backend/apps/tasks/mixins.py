@@ -0,0 +1,135 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import BaseSerializer
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Serializer que acepta `fields`, el subconjunto de campos a incluir.
+
+    Meta.list_fields define la representación compacta usada en los listados
+    y Meta.field_sources indica qué columnas necesitan los campos calculados
+    (una lista vacía si no necesitan ninguna de la fila).
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def _parse_list(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _resolve(model, path, only, related, traverse=False):
+    """
+    Añade a `only`/`related` lo necesario para leer `path`; devuelve False si
+    no es una ruta de columnas que se pueda restringir. Con `traverse` la
+    relación final también se une con select_related.
+    """
+    parts = path.split('__')
+    for index, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return False
+
+        prefix = '__'.join(parts[:index + 1])
+        last = index == len(parts) - 1
+        if field.is_relation:
+            if not field.concrete or not (field.many_to_one or field.one_to_one):
+                return False
+            only.add(prefix)
+            if not last or traverse:
+                related.add(prefix)
+                model = field.related_model
+        elif last:
+            only.add(prefix)
+        else:
+            return False
+    return True
+
+
+def _collect(model, serializer, prefix, only, related):
+    sources = getattr(serializer.Meta, 'field_sources', {})
+    for name, field in serializer.fields.items():
+        if name in sources:
+            paths = sources[name]
+        elif field.source == '*':
+            return False
+        else:
+            paths = [field.source.replace('.', '__')]
+
+        if isinstance(field, BaseSerializer):
+            # Serializer anidado: se une la relación y se recorren sus campos
+            if getattr(field, 'many', False) or len(paths) != 1:
+                return False
+            path = prefix + paths[0]
+            if not _resolve(model, path, only, related, traverse=True):
+                return False
+            if not _collect(model, field, f'{path}__', only, related):
+                return False
+            continue
+
+        for path in paths:
+            if not _resolve(model, prefix + path, only, related):
+                return False
+    return True
+
+
+def restrict_queryset(queryset, serializer):
+    """
+    Limita el queryset a las columnas y relaciones que usa el serializer. Si
+    algún campo lee algo que no se puede deducir, se deja como estaba.
+    """
+    only, related = set(), set()
+    if not _collect(queryset.model, serializer, '', only, related):
+        return queryset
+
+    if related:
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(only))
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields=a,b limita la respuesta a esos campos y ?expand=c añade al
+    listado campos que no forman parte de su representación compacta. En
+    ambos casos el queryset solo carga lo que se va a serializar.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        if self.action not in self.sparse_actions:
+            return None
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+
+        meta = self.get_serializer_class().Meta
+        requested = _parse_list(self.request.query_params.get('fields'))
+        expand = _parse_list(self.request.query_params.get('expand'))
+        unknown = set(requested + expand) - set(meta.fields)
+        if unknown:
+            raise ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown))}'})
+
+        fields = None
+        if requested:
+            fields = requested
+        elif self.action == 'list' and getattr(meta, 'list_fields', None) is not None:
+            fields = list(meta.list_fields) + [name for name in expand if name not in meta.list_fields]
+        self._sparse_fields = fields
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.sparse_actions:
+            queryset = restrict_queryset(queryset, self.get_serializer())
+        return queryset
\ No newline at end of file
@@ -1,9 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator, FileExtensionValidator
 from django.core.exceptions import ValidationError
 from django.conf import settings
-import hashlib
+from django.utils import timezone
+import os
+import uuid
+from .storage import task_file_storage
 
 User = get_user_model()
 
@@ -13,13 +17,38 @@ class Task(models.Model):
         ('paused', 'Paused'),
         ('archived', 'Archived'),
     ]
+    PRIORITY_CHOICES = [
+        ('high', 'High'),
+        ('normal', 'Normal'),
+        ('low', 'Low'),
+    ]
 
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tasks')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     is_public = models.BooleanField(default=False)
+    # Cola de ejecución (ver fairshare)
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='normal')
     tags = models.JSONField(default=dict, blank=True)
+    # Notebooks: reutiliza salidas y estado de las celdas que no cambiaron
+    incremental_execution = models.BooleanField(default=False)
+    # Tareas deterministas: reutiliza el resultado de una ejecución idéntica
+    cache_results = models.BooleanField(default=False)
+    cache_ttl = models.PositiveIntegerField(null=True, blank=True)  # Segundos; por defecto TASK_RESULT_CACHE_TTL
+    cache_inputs = models.JSONField(default=list, blank=True)  # Archivos que lee la tarea
+    # Puntero a la versión activa, mantenido por TaskVersion.save
+    active_version = models.ForeignKey(
+        'TaskVersion',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # Límites de cada ejecución; vacíos usan los valores por defecto y 0 es sin límite
+    timeout = models.PositiveIntegerField(null=True, blank=True)  # Tiempo real, segundos
+    cpu_limit = models.PositiveIntegerField(null=True, blank=True)  # Tiempo de CPU, segundos
+    memory_limit = models.PositiveBigIntegerField(null=True, blank=True)  # Bytes
     last_run = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -28,17 +57,104 @@ class Task(models.Model):
         ordering = ['-updated_at']
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
+        indexes = [
+            # Listado por cursor sobre (updated_at, id): tareas propias y públicas
+            models.Index(fields=['owner', '-updated_at', '-id'], name='task_owner_updated_idx'),
+            models.Index(
+                fields=['-updated_at', '-id'],
+                name='task_public_updated_idx',
+                condition=models.Q(is_public=True)
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
     def get_active_version(self):
-        return self.versions.filter(status='active').first()
+        return self.active_version
+
+    def execution_limits(self):
+        """
+        Límites efectivos: 'wall' y 'cpu' en segundos, 'memory' en bytes
+        """
+        limits = {
+            'wall': settings.TASK_DEFAULT_TIMEOUT if self.timeout is None else self.timeout,
+            'cpu': settings.TASK_DEFAULT_CPU_LIMIT if self.cpu_limit is None else self.cpu_limit,
+            'memory': settings.TASK_DEFAULT_MEMORY_LIMIT if self.memory_limit is None else self.memory_limit,
+        }
+        # 0 es sin límite; un negativo llegaría a setrlimit como RLIM_INFINITY
+        return {name: value for name, value in limits.items() if value and value > 0}
 
     def clean(self):
         if not self.name:
             raise ValidationError('Task name is required')
 
+class FileBlob(models.Model):
+    """
+    Blob compartido por todas las versiones con el mismo contenido. Se
+    identifica por su nombre en el storage, que incluye el checksum y la
+    extensión: los mismos bytes subidos como .py y como .ipynb son dos
+    archivos distintos
+    """
+    file = models.CharField(max_length=255, primary_key=True)  # Nombre dentro del storage
+    checksum = models.CharField(max_length=64, db_index=True)  # SHA-256
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'File Blob'
+        verbose_name_plural = 'File Blobs'
+
+    def __str__(self):
+        return f"{self.file} ({self.ref_count} refs)"
+
+    @classmethod
+    def acquire(cls, name, checksum, size):
+        """
+        Registra una nueva referencia al blob, con la fila bloqueada para que
+        no la borre una liberación concurrente. Devuelve False si el archivo ya
+        no está (se borró después de que el storage lo diera por reutilizable)
+        y hay que volver a escribirlo
+        """
+        with transaction.atomic():
+            blob = None
+            while blob is None:
+                cls.objects.get_or_create(file=name, defaults={'checksum': checksum, 'size': size})
+                # Si purge() la acaba de borrar se vuelve a crear
+                blob = cls.objects.select_for_update().filter(pk=name).first()
+            blob.ref_count += 1
+            blob.save(update_fields=['ref_count'])
+            return task_file_storage.exists(blob.file)
+
+    @classmethod
+    def release(cls, name):
+        """
+        Libera una referencia; el archivo se borra al confirmar si para
+        entonces nadie ha vuelto a usarlo
+        """
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=name).first()
+            if blob is None:
+                return
+            blob.ref_count = max(blob.ref_count - 1, 0)
+            blob.save(update_fields=['ref_count'])
+            if not blob.ref_count:
+                transaction.on_commit(lambda: cls.purge(name))
+
+    @classmethod
+    def purge(cls, name):
+        """
+        Borra el blob si sigue sin referencias; la fila queda bloqueada hasta
+        borrar el archivo, así que un acquire() concurrente espera y lo ve
+        """
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=name, ref_count=0).first()
+            if blob is None:
+                return
+            task_file_storage.delete(blob.file)
+            blob.delete()
+
 class TaskVersion(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -50,6 +166,7 @@ class TaskVersion(models.Model):
     version_number = models.IntegerField()
     file = models.FileField(
         upload_to='task_files/',
+        storage=task_file_storage,
         validators=[FileExtensionValidator(allowed_extensions=['py', 'ipynb'])]
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
@@ -75,19 +192,46 @@ class TaskVersion(models.Model):
             last_version = self.task.versions.order_by('-version_number').first()
             self.version_number = (last_version.version_number + 1) if last_version else 1
 
-        if self.file:
-            # Calcular checksum y tamaño
-            self.file.seek(0)
-            content = self.file.read()
-            self.checksum = hashlib.sha256(content).hexdigest()
-            self.file_size = self.file.size
-            self.file.seek(0)
+        # Solo los archivos recién subidos se hashean y almacenan; al guardar
+        # de nuevo una versión existente no se vuelve a leer el archivo
+        new_upload = bool(self.file) and not self.file._committed
+        previous_name = None
 
-        if self.status == 'active':
-            # Desactivar otras versiones activas
-            self.task.versions.filter(status='active').update(status='archived')
+        if new_upload:
+            if self.pk:
+                previous_name = TaskVersion.objects.filter(pk=self.pk).values_list('file', flat=True).first()
+            self.metadata.setdefault('original_name', os.path.basename(self.file.name))
+            upload_name, content = self.file.name, self.file.file
+            # El storage calcula el checksum por bloques mientras escribe el blob
+            self.file.save(upload_name, content, save=False)
+            self.checksum = self.file.storage.checksum_from_name(self.file.name)
+            self.file_size = content.size
+
+        with transaction.atomic():
+            if self.status == 'active':
+                # Desactivar otras versiones activas
+                self.task.versions.filter(status='active').update(status='archived')
 
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+            self._sync_active_pointer()
+
+            if new_upload:
+                if not FileBlob.acquire(self.file.name, self.checksum, self.file_size):
+                    # El storage reutilizó un blob que se estaba borrando; con la
+                    # referencia ya registrada se puede escribir de nuevo
+                    self.file.save(upload_name, content, save=False)
+                if previous_name and previous_name != self.file.name:
+                    FileBlob.release(previous_name)
+
+    def _sync_active_pointer(self):
+        """
+        Mantiene Task.active_version apuntando a la versión activa
+        """
+        if self.status == 'active':
+            Task.objects.filter(pk=self.task_id).update(active_version=self)
+            self.task.active_version = self
+        elif Task.objects.filter(pk=self.task_id, active_version=self).update(active_version=None):
+            self.task.active_version = None
 
     def clean(self):
         if not self.file:
@@ -100,6 +244,83 @@ class TaskVersion(models.Model):
         if self.file.size > 10 * 1024 * 1024:  # 10MB en bytes
             raise ValidationError('File size cannot exceed 10MB')
 
+class TaskUpload(models.Model):
+    """
+    Sesión de subida por partes; la versión se crea solo al finalizar
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='uploads')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='task_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField(null=True, blank=True)  # Tamaño total declarado
+    offset = models.BigIntegerField(default=0)  # Bytes recibidos
+    change_note = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    version = models.ForeignKey(TaskVersion, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Task Upload'
+        verbose_name_plural = 'Task Uploads'
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset} bytes)"
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.TASK_UPLOADS_ROOT, f'{self.id}.part')
+
+class ParameterSweep(models.Model):
+    """
+    Barrido de parámetros: una ejecución por punto de la rejilla, con
+    contadores de progreso que se actualizan al terminar cada una
+    """
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='sweeps')
+    task_version = models.ForeignKey(TaskVersion, on_delete=models.CASCADE, related_name='sweeps')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='parameter_sweeps')
+    grid = models.JSONField(default=dict)  # {nombre: [valores]}
+    parameters = models.JSONField(default=dict, blank=True)  # Fijos en todos los puntos
+    total = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Parameter Sweep'
+        verbose_name_plural = 'Parameter Sweeps'
+
+    def __str__(self):
+        return f"{self.task.name} sweep ({self.completed + self.failed}/{self.total})"
+
+    @property
+    def status(self):
+        if self.finished_at is None:
+            return 'running'
+        return 'failed' if self.failed else 'completed'
+
+    @classmethod
+    def record(cls, sweep_id, succeeded, count=1):
+        """
+        Suma ejecuciones terminadas al barrido y lo cierra con la última
+        """
+        field = 'completed' if succeeded else 'failed'
+        cls.objects.filter(pk=sweep_id).update(**{field: F(field) + count})
+        cls.objects.filter(
+            pk=sweep_id,
+            finished_at__isnull=True,
+            total__lte=F('completed') + F('failed')
+        ).update(finished_at=timezone.now())
+
 class TaskExecution(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -109,10 +330,19 @@ class TaskExecution(models.Model):
         ('cancelled', 'Cancelled'),
         ('timeout', 'Timeout'),
     ]
+    # Estados a los que se puede pasar desde cada uno; los terminados no cambian
+    TRANSITIONS = {
+        'pending': ('running', 'failed', 'cancelled'),
+        'running': ('completed', 'failed', 'timeout', 'cancelled'),
+    }
 
     task_version = models.ForeignKey(TaskVersion, on_delete=models.CASCADE, related_name='executions')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    logs = models.TextField(blank=True)
+    logs = models.TextField(blank=True)  # Solo ejecuciones antiguas; ver log_file
+    # Log comprimido en segmentos bajo TASK_LOGS_ROOT (ver logstore)
+    log_file = models.CharField(max_length=255, blank=True)
+    log_size = models.BigIntegerField(default=0)
+    log_lines = models.PositiveIntegerField(default=0)
     error_message = models.TextField(blank=True)
     metrics = models.JSONField(default=dict, blank=True)
     started_at = models.DateTimeField(null=True, blank=True)
@@ -124,16 +354,92 @@ class TaskExecution(models.Model):
         related_name='triggered_executions'
     )
     celery_task_id = models.CharField(max_length=255, blank=True)
+    priority = models.CharField(max_length=10, choices=Task.PRIORITY_CHOICES, default='normal')
+    queued_at = models.DateTimeField(null=True, blank=True)  # Entrada en la cola de reparto
     resources = models.JSONField(default=dict, blank=True)  # CPU, memoria, etc.
+    parameters = models.JSONField(default=dict, blank=True)
+    sweep = models.ForeignKey(
+        ParameterSweep,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='executions'
+    )
+    # Clave de la caché de resultados y, si fue un acierto, la ejecución original
+    cache_key = models.CharField(max_length=64, blank=True)
+    cached_from = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cache_hits'
+    )
 
     class Meta:
         ordering = ['-started_at']
         verbose_name = 'Task Execution'
         verbose_name_plural = 'Task Executions'
+        indexes = [
+            # Historial por tarea/versión y por estado en una ventana de tiempo.
+            # En DESC los NULL (sin empezar) van primero, igual que en la
+            # paginación por cursor, así el índice sirve también para ordenar
+            models.Index(fields=['task_version', '-started_at', '-id'], name='execution_version_started_idx'),
+            models.Index(fields=['status', '-started_at', '-id'], name='execution_status_started_idx'),
+        ]
 
     def __str__(self):
         return f"{self.task_version} - {self.started_at}"
 
     def clean(self):
         if self.completed_at and self.started_at and self.completed_at < self.started_at:
-            raise ValidationError('Completion time cannot be before start time')
\ No newline at end of file
+            raise ValidationError('Completion time cannot be before start time')
+
+    def result_source(self):
+        """
+        Ejecución de la que salen el log y las métricas: la original si es un
+        resultado reutilizado de la misma tarea, si no la propia
+        """
+        source = self.cached_from
+        if source is not None and source.task_version.task_id == self.task_version.task_id:
+            return source
+        return self
+
+    def transition(self, status, **fields):
+        """
+        Pasa la ejecución a `status` con un solo UPDATE de ese estado y de
+        `fields`, condicionado a que siga en el estado que tiene en memoria.
+        Devuelve False, sin tocar la instancia, si otro proceso la ha cambiado
+        antes (p. ej. la ha cancelado)
+        """
+        if status not in self.TRANSITIONS.get(self.status, ()):
+            raise ValueError(f'Invalid execution transition: {self.status} -> {status}')
+        updated = TaskExecution.objects.filter(pk=self.pk, status=self.status).update(status=status, **fields)
+        if not updated:
+            return False
+        self.status = status
+        for field, value in fields.items():
+            setattr(self, field, value)
+        return True
+
+class ResultCacheEntry(models.Model):
+    """
+    Resultado reutilizable de una ejecución completada, indexado por la
+    clave de sus entradas (código, dependencias, parámetros y archivos)
+    """
+    key = models.CharField(max_length=64, primary_key=True)  # SHA-256
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='cached_results')
+    execution = models.ForeignKey(TaskExecution, on_delete=models.CASCADE, related_name='+')
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Result Cache Entry'
+        verbose_name_plural = 'Result Cache Entries'
+        indexes = [
+            models.Index(fields=['task', '-last_used_at'], name='result_cache_task_used_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task.name} - {self.key[:12]}"
\ No newline at end of file
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import time
+
+import nbformat
+from django.conf import settings
+
+from .result_cache import input_fingerprint
+
+# Código ejecutado en el kernel para guardar/restaurar el estado de la sesión.
+# Si dill no está disponible o el estado no se puede serializar, simplemente
+# no hay checkpoint y la siguiente ejecución empieza desde más atrás.
+DUMP_STATE = """
+try:
+    import dill as _taskflow_dill
+    _taskflow_dill.dump_session({path!r})
+except Exception:
+    pass
+_taskflow_dill = None
+del _taskflow_dill
+"""
+
+LOAD_STATE = """
+import dill as _taskflow_dill
+_taskflow_dill.load_session({path!r})
+del _taskflow_dill
+"""
+
+
+def notebook_seed(environment_key, parameters=None, inputs=()):
+    """
+    Semilla de la cadena de hashes: entorno, parámetros y huella de los
+    archivos de entrada. Si cambia cualquiera, no se reutiliza ninguna celda
+    """
+    payload = {
+        'environment': environment_key,
+        'parameters': parameters or {},
+        'inputs': {path: input_fingerprint(path) for path in inputs},
+    }
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class CellCache:
+    """
+    Cache de salidas y checkpoints de estado por celda de un notebook.
+
+    Cada celda de código se identifica por una cadena de hashes: el hash de su
+    código más el hash de todas las celdas anteriores y de la semilla (entorno,
+    parámetros, entradas). Si cambia una celda, cambian los hashes de esa
+    celda y de todas las siguientes, pero el prefijo sin cambios se puede
+    reutilizar.
+
+    Cada ejecución apunta su cadena en chains/<versión>-<semilla>.json y
+    prune() solo borra lo que no está en ninguna de las últimas
+    TASK_NOTEBOOK_CACHE_CHAINS cadenas, así que dos versiones (o dos juegos
+    de parámetros) que se ejecutan a la vez no se borran el cache entre sí.
+    """
+
+    def __init__(self, task_id, version_id, root=None):
+        self.root = os.path.join(root or settings.TASK_NOTEBOOK_CACHE_ROOT, str(task_id))
+        self.version_id = version_id
+
+    def chain(self, cells, seed):
+        hashes = []
+        previous = hashlib.sha256(seed.encode('utf-8')).hexdigest()
+        for cell in cells:
+            if cell.cell_type != 'code':
+                hashes.append(None)
+                continue
+            previous = hashlib.sha256(f'{previous}\0{cell.source}'.encode('utf-8')).hexdigest()
+            hashes.append(previous)
+        return hashes
+
+    def _path(self, cell_hash, suffix):
+        return os.path.join(self.root, f'{cell_hash}.{suffix}')
+
+    def outputs(self, cell_hash):
+        try:
+            with open(self._path(cell_hash, 'json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def state_path(self, cell_hash):
+        return self._path(cell_hash, 'pkl')
+
+    def has_state(self, cell_hash):
+        return os.path.exists(self.state_path(cell_hash))
+
+    def save_outputs(self, cell_hash, cell):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(cell_hash, 'json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'outputs': cell.outputs, 'execution_count': cell.execution_count}, f)
+        os.replace(tmp_path, self._path(cell_hash, 'json'))
+
+    def resume_point(self, hashes):
+        """
+        Índice de la primera celda a ejecutar y hash del checkpoint desde el
+        que restaurar el estado (None si hay que empezar desde cero)
+        """
+        start, state = 0, None
+        for index, cell_hash in enumerate(hashes):
+            if cell_hash is None:
+                continue
+            if self.outputs(cell_hash) is None:
+                break
+            if self.has_state(cell_hash):
+                start, state = index + 1, cell_hash
+        return start, state
+
+    def track(self, seed, hashes):
+        """
+        Apunta la cadena de esta ejecución antes de ejecutarla, para que un
+        prune() concurrente no borre lo que va escribiendo
+        """
+        chains = os.path.join(self.root, 'chains')
+        os.makedirs(chains, exist_ok=True)
+        name = f"{self.version_id}-{hashlib.sha256(seed.encode('utf-8')).hexdigest()[:16]}"
+        tmp_path = os.path.join(chains, f'{name}.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(list(filter(None, hashes)), f)
+        os.replace(tmp_path, os.path.join(chains, f'{name}.json'))
+
+    def prune(self):
+        """
+        Olvida las cadenas más antiguas y elimina las entradas que ya no
+        forman parte de ninguna de las que quedan
+        """
+        chains = os.path.join(self.root, 'chains')
+        if not os.path.isdir(chains):
+            return
+        paths = [os.path.join(chains, name) for name in os.listdir(chains) if name.endswith('.json')]
+        paths.sort(key=_mtime, reverse=True)
+        keep = set()
+        for index, path in enumerate(paths):
+            if index >= settings.TASK_NOTEBOOK_CACHE_CHAINS:
+                _remove(path)
+                continue
+            try:
+                with open(path) as f:
+                    keep.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isfile(path) and name.split('.', 1)[0] not in keep:
+                _remove(path)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def run_silent(client, code):
+    """
+    Ejecuta código auxiliar en el kernel sin tocar las celdas del notebook;
+    devuelve True si terminó sin error
+    """
+    msg_id = client.kc.execute(code, silent=True, store_history=False)
+    reply = client.wait_for_reply(msg_id)
+    return reply is not None and reply['content']['status'] == 'ok'
+
+
+def run_incremental(client, cache, seed, on_reused=None):
+    """
+    Ejecuta el notebook reutilizando las salidas y el estado del kernel del
+    prefijo de celdas que no cambió; devuelve métricas del cache.
+    `on_reused` se llama con cada celda cuyas salidas salen del cache.
+    """
+    nb = client.nb
+    hashes = cache.chain(nb.cells, seed)
+    cache.track(seed, hashes)
+    start, state = cache.resume_point(hashes)
+    min_seconds = settings.TASK_NOTEBOOK_CHECKPOINT_MIN_SECONDS
+    reused = 0
+
+    with client.setup_kernel():
+        if state is not None and not run_silent(client, LOAD_STATE.format(path=cache.state_path(state))):
+            # Checkpoint ilegible: se ejecuta el notebook completo
+            os.remove(cache.state_path(state))
+            start, state = 0, None
+
+        for index, cell in enumerate(nb.cells):
+            cell_hash = hashes[index]
+            if cell_hash is None:
+                continue
+
+            if index < start:
+                cached = cache.outputs(cell_hash)
+                cell.outputs = [nbformat.from_dict(output) for output in cached['outputs']]
+                cell.execution_count = cached['execution_count']
+                reused += 1
+                if on_reused is not None:
+                    on_reused(cell)
+                continue
+
+            started = time.monotonic()
+            client.execute_cell(cell, index)
+            cache.save_outputs(cell_hash, cell)
+
+            # Solo las celdas costosas merecen un checkpoint del estado
+            if time.monotonic() - started >= min_seconds:
+                run_silent(client, DUMP_STATE.format(path=cache.state_path(cell_hash)))
+
+    cache.prune()
+    return {'cells_reused': reused, 'resumed_from_cell': start if state else 0}
@@ -0,0 +1,249 @@
+import base64
+import json
+import operator
+from collections import OrderedDict
+from functools import reduce
+
+from django.db import connections
+from django.db.models import F, Field, Func, Q, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from django.conf import settings
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RowValue(Func):
+    """
+    Tupla SQL, (a, b, c), para comparar filas enteras: (a, b) < (x, y)
+    """
+    function = ''
+    output_field = Field()
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor sobre una clave de orden única (p. ej. updated_at,
+    id). Cada página filtra por la última fila de la anterior en lugar de usar
+    OFFSET, así que todas las páginas cuestan lo mismo. El total solo se
+    calcula si se pide con ?count=exact o ?count=approx.
+
+    `ordering` debe terminar en un campo único para que el orden sea total.
+    Los campos de `nullable` solo pueden ir en primer lugar.
+
+    Si get_branches() parte el queryset en ramas disjuntas (p. ej. las filas
+    propias y las públicas de otros), cada rama se ordena y limita por su
+    cuenta, con su propio índice, y se unen con UNION ALL, en lugar de un OR
+    que obliga a recorrer ambas condiciones juntas.
+    """
+    ordering = ('-id',)
+    nullable = ()
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def encode_cursor(self, row, reverse):
+        values = [getattr(row, name) for name, _ in self._fields()]
+        payload = {'v': [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]}
+        if reverse:
+            payload['r'] = 1
+        data = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, data)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self._fields(), payload['v'], strict=True)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    def keyset_filter(self, values, reverse, model):
+        """
+        Filas estrictamente después (o antes, si `reverse`) de `values` en el
+        orden de paginación. Los NULL de los campos en `nullable` van primero.
+        Si todos los campos van en el mismo sentido es una sola comparación de
+        tuplas, que el índice compuesto resuelve con un único rango
+        """
+        fields = self._fields()
+        directions = {descending for _, descending in fields}
+        if None in values or len(directions) > 1:
+            return self.expanded_keyset_filter(values, reverse)
+
+        lookup = LessThan if directions.pop() != reverse else GreaterThan
+        condition = Q(lookup(
+            RowValue(*(F(name) for name, _ in fields)),
+            RowValue(*(Value(value, output_field=model._meta.get_field(name)) for (name, _), value in zip(fields, values))),
+        ))
+        leading = fields[0][0]
+        if reverse and leading in self.nullable:
+            # Los NULL van antes que cualquier valor
+            condition |= Q(**{f'{leading}__isnull': True})
+        return condition
+
+    def expanded_keyset_filter(self, values, reverse):
+        """
+        La misma condición campo a campo: (a < x) OR (a = x AND b < y)...,
+        para cursores con NULL o sentidos mezclados
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(self._fields(), values):
+            if value is None:
+                # Tras un NULL quedan el resto de NULL y todo lo no nulo
+                if not reverse:
+                    condition |= equal & Q(**{f'{name}__isnull': False})
+                equal &= Q(**{f'{name}__isnull': True})
+                continue
+
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{name}__{lookup}': value})
+            if reverse and name in self.nullable:
+                step |= Q(**{f'{name}__isnull': True})
+            condition |= equal & step
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_branches(self, request):
+        """
+        Condiciones disjuntas que cubren el queryset, o None para no partirlo
+        """
+        return None
+
+    def fetch_page(self, queryset, request, reverse, limit):
+        """
+        Las `limit` primeras filas del queryset ya filtrado por el cursor, en
+        una sola consulta
+        """
+        ordering = self.get_ordering(reverse)
+        branches = self.get_branches(request)
+        if branches:
+            parts = [queryset.filter(branch).order_by(*ordering).values('pk')[:limit] for branch in branches]
+            if connections[queryset.db].features.supports_slicing_ordering_in_compound:
+                candidates = Q(pk__in=parts[0].union(*parts[1:], all=True))
+            else:
+                # SQLite no admite ORDER BY ni LIMIT en las partes de un UNION,
+                # pero sí en las subconsultas de un IN
+                candidates = reduce(operator.or_, (Q(pk__in=part) for part in parts))
+            queryset = queryset.filter(candidates)
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def get_ordering(self, reverse):
+        ordering = []
+        for name, descending in self._fields():
+            expression = F(name).desc if descending != reverse else F(name).asc
+            if name in self.nullable:
+                ordering.append(expression(nulls_last=True) if reverse else expression(nulls_first=True))
+            else:
+                ordering.append(expression())
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+
+        values, reverse = self.decode_cursor(request, queryset.model)
+        names, defer = queryset.query.deferred_loading
+        if names and not defer:
+            # El cursor se construye con los campos de orden: no pueden quedar diferidos
+            queryset = queryset.only(*names, *(name for name, _ in self._fields()))
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values, reverse, queryset.model))
+
+        rows = self.fetch_page(queryset, request, reverse, self.page_size + 1)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # En sentido inverso, "hay más" se refiere a las páginas anteriores
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = values is not None if not reverse else has_more
+        self.rows = rows
+        return rows
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get('count')
+        if not mode:
+            return None
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        raise ValidationError({'count': 'Must be "exact" or "approx"'})
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+
+def estimate_count(queryset):
+    """
+    Número de filas estimado por el planificador de PostgreSQL; en otras
+    bases de datos se cuenta de forma exacta
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class TaskCursorPagination(KeysetPagination):
+    ordering = ('-updated_at', '-id')
+
+    def get_branches(self, request):
+        # Propias (task_owner_updated_idx) y públicas de otros (task_public_updated_idx)
+        user = request.user
+        return [Q(owner=user), Q(is_public=True) & ~Q(owner=user)]
+
+
+class ExecutionCursorPagination(KeysetPagination):
+    ordering = ('-started_at', '-id')
+    nullable = ('started_at',)
\ No newline at end of file
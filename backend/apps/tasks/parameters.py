@@ -0,0 +1,79 @@
+import itertools
+import json
+import keyword
+
+import nbformat
+
+PARAMETERS_TAG = 'parameters'
+INJECTED_TAG = 'injected-parameters'
+PARAMETERS_ENV = 'TASKFLOW_PARAMETERS'
+
+
+def check_parameters(parameters):
+    """
+    Los parámetros son un objeto JSON cuyas claves son identificadores de
+    Python válidos, porque en los notebooks se inyectan como variables
+    """
+    if not isinstance(parameters, dict):
+        raise ValueError('Parameters must be an object')
+    invalid = [
+        name for name in parameters
+        if not isinstance(name, str) or not name.isidentifier() or keyword.iskeyword(name)
+    ]
+    if invalid:
+        raise ValueError(f'Invalid parameter names: {", ".join(sorted(map(str, invalid)))}')
+    return parameters
+
+
+def expand_grid(grid, base=None):
+    """
+    Producto cartesiano de `grid` ({nombre: [valores]}), cada punto sobre
+    los parámetros fijos de `base`
+    """
+    names = sorted(grid)
+    return [
+        {**(base or {}), **dict(zip(names, values))}
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+def grid_size(grid):
+    size = 1
+    for values in grid.values():
+        size *= len(values)
+    return size
+
+
+def script_arguments(parameters):
+    """
+    argv y entorno con los que un script .py recibe los parámetros: cada
+    uno como --nombre valor (JSON si no es texto) y todos juntos en
+    TASKFLOW_PARAMETERS
+    """
+    argv = []
+    for name, value in parameters.items():
+        argv += [f'--{name}', value if isinstance(value, str) else json.dumps(value)]
+    return argv, {PARAMETERS_ENV: json.dumps(parameters)}
+
+
+def inject_parameters(nb, parameters):
+    """
+    Como papermill: añade una celda con los parámetros justo después de la
+    celda etiquetada `parameters` (o al principio si no hay ninguna), de
+    modo que sus valores sustituyen a los que trae el notebook
+    """
+    if not parameters:
+        return nb
+
+    source = '# Parameters\n' + ''.join(f'{name} = {value!r}\n' for name, value in parameters.items())
+    cell = nbformat.v4.new_code_cell(source, metadata={'tags': [INJECTED_TAG]})
+
+    cells = [c for c in nb.cells if INJECTED_TAG not in c.get('metadata', {}).get('tags', [])]
+    position = 0
+    for index, existing in enumerate(cells):
+        if PARAMETERS_TAG in existing.get('metadata', {}).get('tags', []):
+            position = index + 1
+            break
+    cells.insert(position, cell)
+    nb.cells = cells
+    return nb
\ No newline at end of file
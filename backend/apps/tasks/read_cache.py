@@ -0,0 +1,131 @@
+"""
+Caché de lectura en Redis de las respuestas más pedidas: el detalle de una
+tarea, el de una versión y el estado de una ejecución terminada.
+
+Cada objeto es un hash con una entrada por variante de la respuesta (host y
+query string, porque file_url es absoluta y ?fields= cambia los campos) y
+cada entrada guarda, junto a los datos serializados, lo necesario para
+comprobar el acceso sin ir a la base de datos. Los cambios la invalidan por
+objeto al confirmarse la transacción (ver signals.py y los update() en
+bloque); el TTL acota lo que pueda quedar obsoleto si una lectura rellena
+la caché justo antes de la invalidación.
+
+Claves (bajo TASK_READ_CACHE_PREFIX):
+    <tipo>:<id>  hash variante -> entrada JSON (tipos: task, version, status)
+    stats        hash <tipo>:hit / <tipo>:miss
+"""
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('task', 'version', 'status')
+
+# KEYS: objeto, contadores. ARGV: variante, tipo. Lee y cuenta en una sola
+# ida y vuelta
+GET_SCRIPT = """
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if value then
+    redis.call('HINCRBY', KEYS[2], ARGV[2] .. ':hit', 1)
+else
+    redis.call('HINCRBY', KEYS[2], ARGV[2] .. ':miss', 1)
+end
+return value
+"""
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.TASK_READ_CACHE_REDIS_URL, decode_responses=True)
+    return _client
+
+
+def _key(*parts):
+    return ':'.join([settings.TASK_READ_CACHE_PREFIX, *map(str, parts)])
+
+
+def request_variant(request):
+    return f"{request.get_host()}?{request.META.get('QUERY_STRING', '')}"
+
+
+def get(kind, pk, variant=''):
+    """
+    Entrada guardada o None; si Redis no responde cuenta como fallo
+    """
+    if not settings.TASK_READ_CACHE_TTL:
+        return None
+    try:
+        client = get_redis()
+        value = client.register_script(GET_SCRIPT)(keys=[_key(kind, pk), _key('stats')], args=[variant, kind])
+    except redis.RedisError as e:
+        logger.warning('Read cache unavailable: %s', e)
+        return None
+    return json.loads(value) if value else None
+
+
+def put(kind, pk, variant, entry):
+    if not settings.TASK_READ_CACHE_TTL:
+        return
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(_key(kind, pk), variant, json.dumps(entry, cls=JSONEncoder))
+        pipe.expire(_key(kind, pk), settings.TASK_READ_CACHE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning('Read cache unavailable: %s', e)
+
+
+def invalidate(kind, *pks):
+    """
+    Descarta los objetos cuando se confirme la transacción en curso (o ya,
+    si no hay ninguna), para que nadie vuelva a guardar la versión anterior
+    entre medias
+    """
+    keys = [_key(kind, pk) for pk in pks]
+    if not keys:
+        return
+
+    def delete():
+        try:
+            get_redis().delete(*keys)
+        except redis.RedisError as e:
+            logger.warning('Could not invalidate %d cached %s entries: %s', len(keys), kind, e)
+
+    transaction.on_commit(delete)
+
+
+def clear(kind):
+    """
+    Descarta todos los objetos de un tipo
+    """
+    client = get_redis()
+    removed = 0
+    for key in client.scan_iter(match=_key(kind, '*')):
+        removed += client.delete(key)
+    return removed
+
+
+def stats():
+    counters = get_redis().hgetall(_key('stats'))
+    result = {}
+    for kind in KINDS:
+        hits = int(counters.get(f'{kind}:hit', 0))
+        misses = int(counters.get(f'{kind}:miss', 0))
+        result[kind] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else None,
+        }
+    return result
+
+
+def reset_stats():
+    get_redis().delete(_key('stats'))
\ No newline at end of file
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ResultCacheEntry, TaskVersion
+
+
+def resolve_input(path):
+    """
+    Ruta real de un archivo de entrada relativo a TASK_INPUTS_ROOT, o None si
+    sale de ella (rutas absolutas, '..' o enlaces simbólicos hacia fuera)
+    """
+    root = os.path.realpath(settings.TASK_INPUTS_ROOT)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.isabs(path) or os.path.commonpath([root, full]) != root:
+        return None
+    return full
+
+
+def input_fingerprint(path):
+    """
+    Huella barata de un archivo de entrada (tamaño y fecha de modificación)
+    """
+    full = resolve_input(path)
+    if full is None:
+        return None
+    try:
+        stat = os.stat(full)
+    except OSError:
+        return None
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def result_cache_key(task_id, checksum, requirements, inputs, parameters=None):
+    """
+    La tarea forma parte de la clave: dos usuarios con el mismo código y los
+    mismos parámetros no comparten resultados
+    """
+    payload = {
+        'task': task_id,
+        'checksum': checksum,
+        'requirements': hashlib.sha256(requirements.encode('utf-8')).hexdigest(),
+        'parameters': parameters or {},
+        'inputs': {path: input_fingerprint(path) for path in inputs},
+    }
+    data = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def cache_keys(items):
+    """
+    Clave de caché de cada par (versión, parámetros), o '' si su tarea no
+    reutiliza resultados; una sola consulta para todo el lote
+    """
+    ids = {version.pk for version, _ in items}
+    if not ids:
+        return []
+    rows = TaskVersion.objects.filter(pk__in=ids, task__cache_results=True).values_list(
+        'pk', 'task_id', 'checksum', 'requirements', 'task__cache_inputs'
+    )
+    sources = {
+        pk: (task_id, checksum, requirements, inputs or [])
+        for pk, task_id, checksum, requirements, inputs in rows
+    }
+    return [
+        result_cache_key(*sources[version.pk], parameters) if version.pk in sources else ''
+        for version, parameters in items
+    ]
+
+
+def lookup(keys, now=None):
+    """
+    Entradas vigentes para `keys` (clave -> id de la tarea que la pide),
+    solo si son de esa misma tarea; cuenta cada acierto
+    """
+    keys = {key: task_id for key, task_id in keys.items() if key}
+    if not keys:
+        return {}
+    now = now or timezone.now()
+    entries = {
+        entry.key: entry
+        for entry in ResultCacheEntry.objects.filter(key__in=keys, expires_at__gt=now)
+        if entry.task_id == keys[entry.key]
+    }
+    if entries:
+        ResultCacheEntry.objects.filter(key__in=entries).update(hits=F('hits') + 1, last_used_at=now)
+    return entries
+
+
+def store_result(execution):
+    """
+    Guarda una ejecución completada como resultado de su clave y aplica la
+    expulsión de la tarea: caducadas y, por encima del máximo, las menos usadas
+    """
+    task = execution.task_version.task
+    now = timezone.now()
+    ttl = task.cache_ttl or settings.TASK_RESULT_CACHE_TTL
+    ResultCacheEntry.objects.update_or_create(
+        key=execution.cache_key,
+        task=task,
+        defaults={
+            'execution': execution,
+            'hits': 0,
+            'last_used_at': now,
+            'expires_at': now + timedelta(seconds=ttl),
+        }
+    )
+
+    entries = ResultCacheEntry.objects.filter(task=task)
+    entries.filter(expires_at__lte=now).delete()
+    surplus = list(
+        entries.order_by('-last_used_at').values_list('pk', flat=True)[settings.TASK_RESULT_CACHE_MAX_ENTRIES:]
+    )
+    if surplus:
+        ResultCacheEntry.objects.filter(pk__in=surplus).delete()
+
+
+def invalidate(task):
+    """
+    Descarta todos los resultados guardados de la tarea
+    """
+    deleted, _ = ResultCacheEntry.objects.filter(task=task).delete()
+    return deleted
+
+
+def evict_expired(now=None):
+    deleted, _ = ResultCacheEntry.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
\ No newline at end of file
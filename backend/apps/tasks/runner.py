@@ -0,0 +1,172 @@
+"""
+Intérprete precalentado para ejecutar scripts de usuario.
+
+Se lanza con el python del entorno de la tarea (no importa Django). Al
+arrancar importa las librerías de TASKFLOW_PRELOAD y luego atiende trabajos
+por stdin, uno por línea JSON. Cada trabajo se ejecuta en un proceso hijo
+creado con fork(), de modo que hereda los imports ya cargados pero no deja
+globals ni memoria en el intérprete. Los eventos se responden por stdout,
+también una línea JSON por evento.
+
+Los límites del trabajo se aplican al hijo: CPU y memoria con rlimits y el
+tiempo real desde el runner, que mata el grupo de procesos al vencer.
+"""
+import importlib
+import json
+import math
+import os
+import resource
+import runpy
+import signal
+import sys
+import traceback
+
+RUNNER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def preload(modules):
+    for name in filter(None, (m.strip() for m in modules.split(','))):
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def apply_limits(limits):
+    """
+    CPU en segundos (SIGXCPU al agotarse, SIGKILL un segundo después) y
+    memoria en bytes. En Linux RLIMIT_DATA cuenta el heap y los mmap
+    privados, no las librerías ya cargadas, así que se ajusta mejor al
+    consumo real que RLIMIT_AS
+    """
+    cpu = limits.get('cpu')
+    if cpu:
+        # El hijo recién creado empieza con su tiempo de CPU a cero
+        seconds = max(math.ceil(cpu), 1)
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+
+    memory = limits.get('memory')
+    if memory:
+        kind = resource.RLIMIT_DATA if sys.platform.startswith('linux') else resource.RLIMIT_AS
+        resource.setrlimit(kind, (memory, memory))
+
+
+def run_child(job, control_fd, ready_fd):
+    """
+    Código del proceso hijo: nunca retorna
+    """
+    code = 1
+    try:
+        os.close(control_fd)
+        # Grupo de procesos propio para poder terminar la ejecución completa;
+        # al cerrar ready_fd el runner sabe que ya se puede matar el grupo
+        os.setsid()
+        os.close(ready_fd)
+
+        log_fd = os.open(job['log_path'], os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        null_fd = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(null_fd, 0)
+        os.dup2(log_fd, 1)
+        os.dup2(log_fd, 2)
+        sys.stdout.reconfigure(line_buffering=True)
+        sys.stderr.reconfigure(line_buffering=True)
+
+        apply_limits(job.get('limits') or {})
+        os.chdir(job['cwd'])
+        os.environ.update(job.get('env') or {})
+        sys.argv = [job['path']] + list(job.get('argv') or [])
+        sys.path.insert(0, os.path.dirname(os.path.abspath(job['path'])))
+
+        try:
+            runpy.run_path(job['path'], run_name='__main__')
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def main():
+    # Python pone el directorio de este archivo en sys.path: sin quitarlo, el
+    # código del usuario podría importar los módulos de la aplicación
+    sys.path[:] = [entry for entry in sys.path if os.path.abspath(entry or os.curdir) != RUNNER_DIR]
+
+    # stdout queda reservado para el protocolo; cualquier print durante el
+    # preload va a stderr
+    control_fd = os.dup(1)
+    os.dup2(2, 1)
+    control = os.fdopen(control_fd, 'w', buffering=1)
+
+    def send(**event):
+        control.write(json.dumps(event) + '\n')
+
+    preload(os.environ.get('TASKFLOW_PRELOAD', ''))
+    send(event='ready', pid=os.getpid())
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            run_child(job, control_fd, ready_write)
+
+        # Hasta que el hijo tenga su grupo, killpg() daría ESRCH y una
+        # cancelación o un límite de tiempo muy corto no lo matarían
+        os.close(ready_write)
+        os.read(ready_read, 1)
+        os.close(ready_read)
+        send(event='started', pid=pid)
+        timed_out = []
+        wall = (job.get('limits') or {}).get('wall')
+        if wall:
+            def expire(signum, frame):
+                timed_out.append(True)
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+
+            signal.signal(signal.SIGALRM, expire)
+            signal.setitimer(signal.ITIMER_REAL, wall)
+
+        _, status, usage = os.wait4(pid, 0)
+        if wall:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        send(
+            event='finished',
+            pid=pid,
+            returncode=os.waitstatus_to_exitcode(status),
+            timed_out=bool(timed_out),
+            max_rss=usage.ru_maxrss * 1024,
+            cpu_time=usage.ru_utime + usage.ru_stime,
+            runner_rss=current_rss(),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import base64
+import math
+import sys
+import threading
+import time
+from array import array
+
+import psutil
+from django.conf import settings
+
+# t: segundos desde el inicio; cpu: % de un núcleo (puede superar 100)
+METRICS = ('t', 'cpu', 'rss', 'read_bytes', 'write_bytes', 'threads')
+# Al reducir puntos, la memoria conserva el pico y el tiempo el inicio del tramo
+REDUCERS = {'t': min, 'rss': max}
+# Los contadores de bytes pasan de 2**24 enseguida: en float32 perderían
+# precisión, en float64 son exactos hasta 2**53
+DTYPE, TYPECODE = 'float64-le', 'd'
+
+
+class ResourceSampler:
+    """
+    Muestrea CPU, memoria, IO e hilos del árbol de procesos de una ejecución
+    en un hilo aparte, guardando cada métrica en un array de float64.
+
+    Si se llega a `max_samples` se descarta una muestra de cada dos y se
+    duplica el intervalo, así la serie ocupa lo mismo sea cual sea la
+    duración del trabajo. Al terminar, la serie que se guarda en la fila se
+    reduce a TASK_RESOURCE_STORED_POINTS puntos. `on_sample` recibe cada
+    muestra al tomarla.
+    """
+
+    def __init__(self, pid, interval=None, max_samples=None, on_sample=None):
+        self.pid = pid
+        self.on_sample = on_sample
+        self.interval = interval or settings.TASK_RESOURCE_SAMPLE_INTERVAL
+        self.max_samples = max_samples or settings.TASK_RESOURCE_MAX_SAMPLES
+        self.series = {name: array(TYPECODE) for name in METRICS}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._started = None
+        self._last = None  # (instante, cpu acumulada)
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Detiene el muestreo y devuelve la serie reducida y codificada
+        """
+        self._stop.set()
+        self._thread.join()
+        points = settings.TASK_RESOURCE_STORED_POINTS
+        interval = self.interval * max(math.ceil(len(self.series['t']) / points), 1)
+        return encode_series(downsample(self.series, points), interval)
+
+    def _run(self):
+        self._sample()
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _tree(self):
+        try:
+            root = psutil.Process(self.pid)
+            return [root] + root.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def _sample(self):
+        cpu = rss = read_bytes = write_bytes = threads = 0
+        processes = self._tree()
+        if not processes:
+            return
+
+        for process in processes:
+            try:
+                with process.oneshot():
+                    times = process.cpu_times()
+                    cpu += times.user + times.system
+                    rss += process.memory_info().rss
+                    threads += process.num_threads()
+                    try:
+                        io = process.io_counters()
+                        read_bytes += io.read_bytes
+                        write_bytes += io.write_bytes
+                    except (AttributeError, psutil.AccessDenied):
+                        pass
+            except psutil.Error:
+                continue
+
+        now = time.monotonic()
+        percent = 0.0
+        if self._last is not None and now > self._last[0]:
+            # Si un hijo terminó entre muestras su CPU desaparece del total
+            percent = max(cpu - self._last[1], 0.0) / (now - self._last[0]) * 100
+        self._last = (now, cpu)
+
+        values = {
+            't': now - self._started,
+            'cpu': percent,
+            'rss': rss,
+            'read_bytes': read_bytes,
+            'write_bytes': write_bytes,
+            'threads': threads,
+        }
+        for name in METRICS:
+            self.series[name].append(values[name])
+        if self.on_sample is not None:
+            self.on_sample(values)
+
+        if len(self.series['t']) >= self.max_samples:
+            for name in METRICS:
+                self.series[name] = self.series[name][::2]
+            self.interval *= 2
+
+
+def encode_series(series, interval):
+    encoded = {}
+    for name, values in series.items():
+        values = array(TYPECODE, values)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        encoded[name] = base64.b64encode(values.tobytes()).decode('ascii')
+    return {
+        'interval': interval,
+        'count': len(series['t']),
+        'dtype': DTYPE,
+        'series': encoded,
+    }
+
+
+def decode_series(data):
+    if data['dtype'] != DTYPE:
+        raise ValueError(f"Unsupported series dtype {data['dtype']!r}")
+    series = {}
+    for name, encoded in data['series'].items():
+        values = array(TYPECODE)
+        values.frombytes(base64.b64decode(encoded))
+        if sys.byteorder != 'little':
+            values.byteswap()
+        series[name] = values.tolist()
+    return series
+
+
+def downsample(series, points):
+    """
+    Reduce la serie a como mucho `points` puntos agrupando muestras
+    consecutivas (media, salvo lo indicado en REDUCERS)
+    """
+    if points <= 0:
+        raise ValueError('points must be positive')
+    count = len(series.get('t', []))
+    if count <= points:
+        return series
+
+    size = math.ceil(count / points)
+    reduced = {}
+    for name, values in series.items():
+        reducer = REDUCERS.get(name)
+        buckets = [values[start:start + size] for start in range(0, count, size)]
+        reduced[name] = [
+            reducer(bucket) if reducer else sum(bucket) / len(bucket)
+            for bucket in buckets
+        ]
+    return reduced
\ No newline at end of file
@@ -1,7 +1,20 @@
+import re
 from rest_framework import serializers
-from .models import Task, TaskVersion, TaskExecution
+from django.conf import settings
+from django.db.models import Q
+from .dispatch import start_sweep
+from .mixins import SparseFieldsSerializerMixin
+from .models import ParameterSweep, Task, TaskVersion, TaskExecution, TaskUpload
+from .parameters import check_parameters, grid_size
+from .result_cache import resolve_input
 
-class TaskVersionSerializer(serializers.ModelSerializer):
+def validate_parameters(value):
+    try:
+        return check_parameters(value)
+    except ValueError as e:
+        raise serializers.ValidationError(str(e))
+
+class TaskVersionSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
     
     class Meta:
@@ -12,30 +25,106 @@ class TaskVersionSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['version_number']
+        field_sources = {'file_url': ['file']}
 
     def get_file_url(self, obj):
         if obj.file:
             return self.context['request'].build_absolute_uri(obj.file.url)
         return None
 
-class TaskSerializer(serializers.ModelSerializer):
-    active_version = TaskVersionSerializer(source='get_active_version', read_only=True)
+class TaskUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaskUpload
+        fields = [
+            'id', 'task', 'filename', 'size', 'offset', 'change_note',
+            'status', 'version', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['offset', 'status', 'version', 'created_at', 'updated_at']
+
+    def validate_task(self, value):
+        if value.owner != self.context['request'].user:
+            raise serializers.ValidationError('Task not found or access denied')
+        return value
+
+    def validate_filename(self, value):
+        if not value.endswith(('.py', '.ipynb')):
+            raise serializers.ValidationError('Invalid file type. Only .py and .ipynb files are allowed')
+        return value
+
+    def validate_size(self, value):
+        if value is not None and value > settings.TASK_CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError('File size exceeds the upload limit')
+        return value
+
+    def create(self, validated_data):
+        validated_data['owner'] = self.context['request'].user
+        return super().create(validated_data)
+
+class TaskSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    active_version = TaskVersionSerializer(read_only=True)
     owner = serializers.ReadOnlyField(source='owner.username')
 
     class Meta:
         model = Task
         fields = [
             'id', 'name', 'description', 'owner', 'status',
-            'is_public', 'tags', 'last_run', 'created_at',
-            'updated_at', 'active_version'
+            'is_public', 'priority', 'tags', 'incremental_execution', 'cache_results',
+            'cache_ttl', 'cache_inputs', 'timeout', 'cpu_limit', 'memory_limit',
+            'last_run', 'created_at', 'updated_at', 'active_version'
         ]
         read_only_fields = ['created_at', 'updated_at', 'last_run', 'owner']
+        # Solo el staff los cambia; para el resto son de solo lectura
+        staff_fields = ['priority']
+        # Límites que el usuario ajusta entre 1 y el máximo del ajuste; 0 (sin
+        # límite) o más del máximo solo el staff
+        limit_maximums = {
+            'timeout': 'TASK_MAX_TIMEOUT',
+            'cpu_limit': 'TASK_MAX_CPU_LIMIT',
+            'memory_limit': 'TASK_MAX_MEMORY_LIMIT',
+        }
+
+    def is_staff(self):
+        request = self.context.get('request')
+        return request is not None and request.user.is_staff
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_staff():
+            for name in self.Meta.staff_fields:
+                fields[name].read_only = True
+        return fields
+
+    def validate_limit(self, name, value):
+        if value is None:
+            return value
+        if value < 0:
+            raise serializers.ValidationError('Must be greater than or equal to 0')
+        maximum = getattr(settings, self.Meta.limit_maximums[name])
+        if not self.is_staff() and not 1 <= value <= maximum:
+            raise serializers.ValidationError(f'Must be between 1 and {maximum}')
+        return value
+
+    def validate_timeout(self, value):
+        return self.validate_limit('timeout', value)
+
+    def validate_cpu_limit(self, value):
+        return self.validate_limit('cpu_limit', value)
+
+    def validate_memory_limit(self, value):
+        return self.validate_limit('memory_limit', value)
+
+    def validate_cache_inputs(self, value):
+        if not isinstance(value, list) or not all(isinstance(path, str) for path in value):
+            raise serializers.ValidationError('Must be a list of file paths')
+        if any(resolve_input(path) is None for path in value):
+            raise serializers.ValidationError('Paths must be relative to the inputs directory')
+        return value
 
     def create(self, validated_data):
         validated_data['owner'] = self.context['request'].user
         return super().create(validated_data)
 
-class TaskExecutionSerializer(serializers.ModelSerializer):
+class TaskExecutionSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     task_name = serializers.CharField(source='task_version.task.name', read_only=True)
     version_number = serializers.IntegerField(source='task_version.version_number', read_only=True)
     triggered_by_username = serializers.CharField(source='triggered_by.username', read_only=True)
@@ -44,15 +133,121 @@ class TaskExecutionSerializer(serializers.ModelSerializer):
         model = TaskExecution
         fields = [
             'id', 'task_version', 'task_name', 'version_number',
-            'status', 'logs', 'error_message', 'metrics',
+            'status', 'logs', 'log_size', 'log_lines', 'error_message', 'metrics',
             'started_at', 'completed_at', 'triggered_by',
-            'triggered_by_username'
+            'triggered_by_username', 'parameters', 'sweep', 'cached_from',
+            'priority', 'queued_at'
         ]
         read_only_fields = [
-            'logs', 'error_message', 'metrics', 'started_at',
-            'completed_at', 'triggered_by', 'triggered_by_username'
+            'logs', 'log_size', 'log_lines', 'error_message', 'metrics', 'started_at',
+            'completed_at', 'triggered_by', 'triggered_by_username', 'parameters',
+            'sweep', 'cached_from', 'priority', 'queued_at'
+        ]
+        # Sin logs, error ni métricas: se piden con ?expand= o en el detalle
+        list_fields = [
+            'id', 'task_version', 'task_name', 'version_number', 'status',
+            'log_size', 'log_lines', 'started_at', 'completed_at',
+            'triggered_by', 'triggered_by_username', 'sweep', 'cached_from'
         ]
 
     def create(self, validated_data):
         validated_data['triggered_by'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data) 
+
+class BulkExecuteSerializer(serializers.Serializer):
+    """
+    Tareas a ejecutar en bloque: una lista de ids o las que tengan todas
+    las etiquetas indicadas
+    """
+    tasks = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    tags = serializers.DictField(required=False, allow_empty=False)
+    parameters = serializers.JSONField(required=False, default=dict, validators=[validate_parameters])
+
+    def validate_tasks(self, value):
+        if len(value) > settings.TASK_BULK_EXECUTE_MAX:
+            raise serializers.ValidationError(f'At most {settings.TASK_BULK_EXECUTE_MAX} tasks per request')
+        return value
+
+    def validate_tags(self, value):
+        invalid = [key for key in value if not re.fullmatch(r'[A-Za-z0-9-]+(_[A-Za-z0-9-]+)*', key)]
+        if invalid:
+            raise serializers.ValidationError(f'Invalid tag names: {", ".join(sorted(invalid))}')
+        return value
+
+    def validate(self, attrs):
+        if ('tasks' in attrs) == ('tags' in attrs):
+            raise serializers.ValidationError('Provide either tasks or tags')
+        return attrs
+
+    def task_filter(self):
+        if 'tasks' in self.validated_data:
+            return Q(pk__in=self.validated_data['tasks'])
+        return Q(**{f'tags__{key}': value for key, value in self.validated_data['tags'].items()})
+
+class BulkCancelSerializer(serializers.Serializer):
+    """
+    Ejecuciones a cancelar en bloque: una lista de ids o todas las de una
+    tarea o de un barrido
+    """
+    executions = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    task = serializers.IntegerField(required=False)
+    sweep = serializers.IntegerField(required=False)
+
+    def validate_executions(self, value):
+        if len(value) > settings.TASK_BULK_EXECUTE_MAX:
+            raise serializers.ValidationError(f'At most {settings.TASK_BULK_EXECUTE_MAX} executions per request')
+        return value
+
+    def validate(self, attrs):
+        if len(attrs) != 1:
+            raise serializers.ValidationError('Provide one of executions, task or sweep')
+        return attrs
+
+    def execution_filter(self):
+        if 'executions' in self.validated_data:
+            return Q(pk__in=self.validated_data['executions'])
+        if 'task' in self.validated_data:
+            return Q(task_version__task_id=self.validated_data['task'])
+        return Q(sweep_id=self.validated_data['sweep'])
+
+class ExecuteSerializer(serializers.Serializer):
+    parameters = serializers.JSONField(required=False, default=dict, validators=[validate_parameters])
+
+class ParameterSweepSerializer(serializers.ModelSerializer):
+    status = serializers.ReadOnlyField()
+
+    class Meta:
+        model = ParameterSweep
+        fields = [
+            'id', 'task', 'task_version', 'grid', 'parameters', 'status',
+            'total', 'completed', 'failed', 'created_at', 'finished_at'
+        ]
+        read_only_fields = ['task_version', 'total', 'completed', 'failed', 'created_at', 'finished_at']
+
+    def validate_task(self, value):
+        if value.owner != self.context['request'].user:
+            raise serializers.ValidationError('Task not found or access denied')
+        if value.active_version_id is None:
+            raise serializers.ValidationError('No active version found for this task')
+        return value
+
+    def validate_parameters(self, value):
+        return validate_parameters(value)
+
+    def validate_grid(self, value):
+        if not isinstance(value, dict) or not value:
+            raise serializers.ValidationError('Grid must be a non-empty object')
+        validate_parameters(value)
+        if not all(isinstance(values, list) and values for values in value.values()):
+            raise serializers.ValidationError('Every grid entry must be a non-empty list of values')
+        if grid_size(value) > settings.TASK_SWEEP_MAX_POINTS:
+            raise serializers.ValidationError(f'At most {settings.TASK_SWEEP_MAX_POINTS} points per sweep')
+        return value
+
+    def create(self, validated_data):
+        return start_sweep(
+            validated_data['task'],
+            self.context['request'].user,
+            validated_data['grid'],
+            validated_data.get('parameters') or {},
+        )
\ No newline at end of file
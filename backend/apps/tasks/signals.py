@@ -1,7 +1,47 @@
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
-from django.utils import timezone
-from .models import TaskVersion, TaskExecution
+from collections import Counter
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from . import events, read_cache
+from .logstore import delete_logs
+from .models import FileBlob, ParameterSweep, Task, TaskVersion, TaskExecution
+
+# Se envía cuando una ejecución termina (completada, fallida, etc.), con la
+# ejecución ya guardada: execution_finished.send(sender=TaskExecution, execution=...)
+execution_finished = Signal()
+
+# Se envía al cancelar en bloque ejecuciones que no llegaron a empezar, en
+# vez de un execution_finished por cada una: executions_cancelled.send(
+# sender=TaskExecution, executions=[...])
+executions_cancelled = Signal()
+
+@receiver(execution_finished)
+def update_sweep_progress(sender, execution, **kwargs):
+    """
+    Cuenta la ejecución terminada en el progreso de su barrido
+    """
+    if execution.sweep_id:
+        ParameterSweep.record(execution.sweep_id, succeeded=execution.status == 'completed')
+
+@receiver(execution_finished)
+def publish_final_status(sender, execution, **kwargs):
+    """
+    Avisa a los clientes suscritos de cómo ha terminado la ejecución
+    """
+    transaction.on_commit(lambda: events.publish_status(execution))
+
+@receiver(executions_cancelled)
+def publish_cancelled_status(sender, executions, **kwargs):
+    transaction.on_commit(lambda: events.publish_status(*executions))
+
+@receiver(executions_cancelled)
+def update_sweep_progress_cancelled(sender, executions, **kwargs):
+    """
+    Cuenta como fallidas las ejecuciones canceladas de cada barrido
+    """
+    counts = Counter(execution.sweep_id for execution in executions if execution.sweep_id)
+    for sweep_id, count in counts.items():
+        ParameterSweep.record(sweep_id, succeeded=False, count=count)
 
 @receiver(post_save, sender=TaskVersion)
 def update_task_last_version(sender, instance, created, **kwargs):
@@ -9,24 +49,46 @@ def update_task_last_version(sender, instance, created, **kwargs):
     Actualiza el campo last_version en Task cuando se crea una nueva versión
     """
     if created and instance.status == 'active':
-        instance.task.last_run = None
-        instance.task.save()
+        Task.objects.filter(pk=instance.task_id).update(last_run=None)
+
+@receiver(post_delete, sender=TaskVersion)
+def release_task_version_blob(sender, instance, **kwargs):
+    """
+    Libera la referencia al blob compartido cuando se elimina una versión
+    """
+    if instance.file:
+        FileBlob.release(instance.file.name)
+
+@receiver(post_delete, sender=TaskExecution)
+def delete_execution_logs(sender, instance, **kwargs):
+    """
+    Borra los archivos de log de la ejecución eliminada
+    """
+    transaction.on_commit(lambda: delete_logs(instance))
+
+@receiver([post_save, post_delete], sender=Task)
+def invalidate_cached_task(sender, instance, **kwargs):
+    """
+    Saca la tarea de la caché de lectura cuando cambia o se borra
+    """
+    read_cache.invalidate('task', instance.pk)
 
-@receiver(pre_save, sender=TaskExecution)
-def update_task_last_run(sender, instance, **kwargs):
+@receiver([post_save, post_delete], sender=TaskVersion)
+def invalidate_cached_version(sender, instance, **kwargs):
     """
-    Actualiza el campo last_run en Task cuando se completa una ejecución
+    Saca la versión y su tarea (que la incluye como versión activa) de la
+    caché de lectura; al activarla, también las versiones que se archivaron
     """
-    if instance.status == 'completed' and instance.completed_at:
-        instance.task_version.task.last_run = timezone.now()
-        instance.task_version.task.save()
+    versions = [instance.pk]
+    if kwargs['signal'] is post_save and instance.status == 'active':
+        versions += TaskVersion.objects.filter(task_id=instance.task_id).exclude(pk=instance.pk).values_list('pk', flat=True)
+    read_cache.invalidate('version', *versions)
+    read_cache.invalidate('task', instance.task_id)
 
-@receiver(post_save, sender=TaskExecution)
-def notify_execution_results(sender, instance, created, **kwargs):
+@receiver([post_save, post_delete], sender=TaskExecution)
+def invalidate_cached_status(sender, instance, **kwargs):
     """
-    Notifica los resultados de la ejecución
+    Solo se guarda en caché el estado de las ejecuciones terminadas
     """
-    if not created and instance.status in ['completed', 'failed']:
-        # Aquí iría la lógica de notificación
-        # Por ejemplo, enviar un email, una notificación push, etc.
-        pass 
\ No newline at end of file
+    if instance.status in events.FINISHED_STATUSES:
+        read_cache.invalidate('status', instance.pk)
\ No newline at end of file
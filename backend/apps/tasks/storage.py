@@ -0,0 +1,102 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage direccionado por contenido: cada archivo se guarda una sola vez,
+    en una ruta derivada de su SHA-256.
+
+    El contenido se hashea por bloques mientras se escribe a un archivo
+    temporal, de modo que nunca se mantiene el archivo completo en memoria.
+    """
+    chunk_size = 64 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo lo decide _save a partir del contenido
+        return name
+
+    def blob_name(self, directory, checksum, extension):
+        return '/'.join(filter(None, [directory, checksum[:2], f'{checksum}{extension}']))
+
+    def checksum_from_name(self, name):
+        return os.path.splitext(os.path.basename(name))[0]
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name).strip('/')
+        extension = os.path.splitext(name)[1].lower()
+
+        if hasattr(content, 'temporary_file_path'):
+            return self._save_temporary(
+                directory, extension, content.temporary_file_path(), getattr(content, 'checksum', None)
+            )
+
+        tmp_dir = self.path(directory) if directory else self.location
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+        try:
+            hasher = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(self.chunk_size):
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+
+            final_name = self.blob_name(directory, hasher.hexdigest(), extension)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                # Mismo contenido ya almacenado: se reutiliza el blob existente
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return final_name
+
+    def _save_temporary(self, directory, extension, path, checksum=None):
+        """
+        El contenido ya está en disco: se hashea por bloques (salvo que ya
+        venga calculado) y se mueve, evitando una segunda copia
+        """
+        if checksum is None:
+            hasher = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    hasher.update(chunk)
+            checksum = hasher.hexdigest()
+
+        final_name = self.blob_name(directory, checksum, extension)
+        final_path = self.path(final_name)
+        try:
+            if os.path.exists(final_path):
+                # Mismo contenido ya almacenado: el temporal sobra
+                os.remove(path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                # Otra subida del mismo contenido puede llegar antes; como el
+                # contenido es idéntico se sobrescribe sin más
+                file_move_safe(path, final_path, allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return final_name
+
+
+task_file_storage = ContentAddressedStorage()
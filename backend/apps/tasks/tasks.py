@@ -1,12 +1,65 @@
 import os
 import sys
-import json
+import math
+import shutil
+import signal
+import logging
+import threading
 import psutil
 import nbformat
 from celery import shared_task
+from nbclient import NotebookClient
+from celery.signals import worker_process_init, worker_process_shutdown
 from django.utils import timezone
 from django.conf import settings
+from . import events, fairshare
+from .cancellation import CANCELLED_MESSAGE, CancelWatcher, confirm
+from .dispatch import touch_last_run
+from .environments import Environment, EnvironmentManager
+from .executors import get_interpreter_pool
+from .kernels import get_kernel_pool
+from .logstore import ExecutionLog, render_output
+from .notebook_cache import CellCache, notebook_seed, run_incremental
+from .parameters import inject_parameters, script_arguments
+from .result_cache import store_result
+from .sampling import ResourceSampler
 from .models import TaskExecution
+from .signals import execution_finished
+
+logger = logging.getLogger(__name__)
+
+class ExecutionError(Exception):
+    pass
+
+class ExecutionTimeout(ExecutionError):
+    """
+    La ejecución agotó su límite de tiempo real o de CPU
+    """
+
+@worker_process_init.connect
+def prewarm_interpreters(**kwargs):
+    """
+    Cada proceso del worker calienta un intérprete y un kernel del entorno
+    del sistema en un hilo aparte: Celery mata al hijo que tarda más de unos
+    segundos en inicializarse, e importar numpy o arrancar un kernel tarda más
+    """
+    threading.Thread(target=prewarm, daemon=True).start()
+
+def prewarm():
+    try:
+        get_interpreter_pool().prewarm(sys.executable)
+    except Exception:
+        logger.exception('Could not prewarm an interpreter')
+    if settings.TASK_KERNEL_POOL_PREWARM:
+        try:
+            get_kernel_pool().fill(Environment('system', sys.executable))
+        except Exception:
+            logger.exception('Could not prewarm a kernel')
+
+@worker_process_shutdown.connect
+def close_interpreters(**kwargs):
+    get_interpreter_pool().close_all()
+    get_kernel_pool().shutdown_all()
 
 @shared_task(bind=True)
 def execute_task(self, execution_id):
@@ -15,118 +68,332 @@ def execute_task(self, execution_id):
     """
     execution = TaskExecution.objects.get(id=execution_id)
     version = execution.task_version
+    watcher = CancelWatcher(execution.id)
+    heartbeat = None
 
     try:
-        # Actualizar estado a running
-        execution.status = 'running'
-        execution.started_at = timezone.now()
-        execution.save()
+        # Actualizar estado a running, solo si nadie la ha cancelado antes
+        started_at = timezone.now()
+        metrics = execution.metrics
+        if execution.queued_at:
+            metrics = {**metrics, 'queue_wait': (started_at - execution.queued_at).total_seconds()}
+        if execution.status != 'pending' or not execution.transition(
+            'running', started_at=started_at, metrics=metrics
+        ):
+            return None
+        if execution.queued_at:
+            heartbeat = fairshare.Heartbeat(execution).start()
+        events.publish_status(execution)
 
         # Preparar entorno de ejecución
-        working_dir = os.path.join(settings.MEDIA_ROOT, 'executions', str(execution.id))
+        working_dir = os.path.join(settings.TASK_EXECUTIONS_ROOT, str(execution.id))
         os.makedirs(working_dir, exist_ok=True)
 
         # Copiar archivo al directorio de trabajo
-        file_path = os.path.join(working_dir, os.path.basename(version.file.name))
-        with open(file_path, 'wb') as f:
-            f.write(version.file.read())
+        file_name = os.path.basename(version.metadata.get('original_name') or version.file.name)
+        file_path = os.path.join(working_dir, file_name)
+        with version.file.open('rb') as source, open(file_path, 'wb') as f:
+            shutil.copyfileobj(source, f)
 
-        # Instalar dependencias si existen
-        if version.requirements:
-            os.system(f'pip install -r {version.requirements}')
+        limits = version.task.execution_limits()
 
-        # Ejecutar el archivo según su tipo
-        if file_path.endswith('.py'):
-            result = execute_python_file(file_path, execution)
-        elif file_path.endswith('.ipynb'):
-            result = execute_notebook(file_path, execution)
+        # Entorno aislado con las dependencias, cacheado por hash de requirements
+        with EnvironmentManager().environment(version.requirements) as environment, watcher:
+            # Ejecutar el archivo según su tipo
+            if file_path.endswith('.py'):
+                result = execute_python_file(file_path, execution, environment, limits, watcher)
+            elif file_path.endswith('.ipynb'):
+                result = execute_notebook(file_path, execution, environment, limits, watcher)
 
         # Actualizar estado final
-        execution.status = 'completed'
-        execution.completed_at = timezone.now()
-        execution.save()
+        if finish(execution, 'completed'):
+            if execution.cache_key:
+                store_result(execution)
+            touch_last_run([version.task_id])
 
         return result
 
     except Exception as e:
-        execution.status = 'failed'
-        execution.error_message = str(e)
-        execution.completed_at = timezone.now()
-        execution.save()
+        if watcher.cancelled:
+            finish(execution, 'cancelled', CANCELLED_MESSAGE)
+        else:
+            finish(execution, 'timeout' if isinstance(e, ExecutionTimeout) else 'failed', str(e))
         raise
 
-def execute_python_file(file_path, execution):
+    finally:
+        # Si no llegó a empezar (duplicada o cancelada) el hueco no es suyo
+        if heartbeat is not None:
+            heartbeat.stop()
+            # Libera el hueco del usuario en el reparto y despacha lo siguiente
+            duration = None
+            if execution.started_at and execution.completed_at:
+                duration = (execution.completed_at - execution.started_at).total_seconds()
+            fairshare.release(execution, duration=duration)
+        if watcher.cancelled and execution.status == 'cancelled':
+            confirm(execution.id)
+
+def finish(execution, status, error_message=''):
+    """
+    Transición final de una ejecución en curso: un solo UPDATE con el estado
+    y lo acumulado en memoria mientras se ejecutaba (métricas, recursos y el
+    log sellado), sin reescribir el resto de la fila. Si la ejecución ya
+    está en un estado desde el que no se llega a `status` (p. ej. falló algo
+    después de completarla) no hace nada
+    """
+    if status not in TaskExecution.TRANSITIONS.get(execution.status, ()):
+        return False
+    sealed = seal_logs(execution)
+    finished = execution.transition(
+        status,
+        completed_at=timezone.now(),
+        error_message=error_message,
+        metrics=execution.metrics,
+        resources=execution.resources,
+        **sealed
+    )
+    if finished:
+        # La fila ya apunta a los segmentos: el log plano sobra
+        if sealed.get('log_file'):
+            ExecutionLog(execution.id).discard()
+        execution_finished.send(sender=TaskExecution, execution=execution)
+    return finished
+
+def seal_logs(execution):
+    """
+    Pasa el log de la ejecución terminada a segmentos comprimidos; en la fila
+    solo quedan el puntero, el tamaño y el número de líneas. Si no se puede
+    sellar, la ejecución termina igual y el log se sigue leyendo del archivo
+    plano
+    """
+    try:
+        return ExecutionLog(execution.id).seal()
+    except Exception:
+        logger.exception('Could not seal the logs of execution %s', execution.id)
+        return {}
+
+def kill_process_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+def execute_python_file(file_path, execution, environment, limits=None, watcher=None):
     """
-    Ejecuta un archivo Python y captura su salida
+    Ejecuta un archivo Python en un proceso aislado, creado a partir de un
+    intérprete precalentado del entorno, y captura su salida. El runner
+    aplica los límites al proceso y lo mata al agotar el tiempo real; al
+    cancelarla se mata solo su grupo de procesos y el intérprete sigue vivo.
     """
-    # Redirigir stdout y stderr
-    from io import StringIO
-    import contextlib
+    limits = limits or {}
+    working_dir = os.path.dirname(file_path)
+    # El hijo escribe stdout/stderr directamente en el log, línea a línea,
+    # y el endpoint de logs lo lee mientras la ejecución sigue en curso
+    log = ExecutionLog(execution.id)
+    log_path = log.create()
+
+    samplers = []
+    publisher = events.ExecutionPublisher(execution)
+
+    def on_start(pid):
+        samplers.append(ResourceSampler(pid, on_sample=publisher).start())
+        if watcher is not None:
+            watcher.attach(lambda: kill_process_group(pid))
+
+    try:
+        with get_interpreter_pool().lease(environment.python) as interpreter:
+            argv, env = script_arguments(execution.parameters)
+            result = interpreter.run(
+                file_path, working_dir, log_path, argv=argv, env=env, limits=limits,
+                on_start=on_start
+            )
+            warm = interpreter.warm
+    finally:
+        if watcher is not None:
+            watcher.detach()
+        for sampler in samplers:
+            execution.resources = sampler.stop()
+        publisher.publish()
+
+    execution.metrics = {
+        **execution.metrics,
+        'max_rss': result['max_rss'],
+        'cpu_time': result['cpu_time'],
+        'returncode': result['returncode'],
+        'warm_start': warm,
+        'limits': limits,
+    }
+
+    if result.get('timed_out'):
+        raise ExecutionTimeout(f"Wall-clock limit of {limits['wall']}s exceeded")
+    # SIGXCPU solo lo envía el kernel al agotar RLIMIT_CPU; SIGKILL llega en el
+    # límite duro si el proceso ignoró el primero
+    cpu_killed = result['returncode'] == -signal.SIGXCPU or (
+        result['returncode'] == -signal.SIGKILL and result['cpu_time'] >= limits.get('cpu', 0)
+    )
+    if limits.get('cpu') and cpu_killed:
+        raise ExecutionTimeout(f"CPU time limit of {limits['cpu']}s exceeded")
+    if result['returncode'] != 0:
+        raise ExecutionError(log.last_line() or f"Process exited with code {result['returncode']}")
 
-    output = StringIO()
-    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+    return {
+        'success': True,
+        'log_size': log.size()
+    }
+
+class LoggingNotebookClient(NotebookClient):
+    """
+    NotebookClient que copia al log de la ejecución cada salida de las celdas
+    en cuanto el kernel la emite
+    """
+
+    def __init__(self, nb, execution_log=None, **kwargs):
+        super().__init__(nb, **kwargs)
+        self.execution_log = execution_log
+
+    def output(self, outs, msg, display_id, cell_index):
+        out = super().output(outs, msg, display_id, cell_index)
+        if out is not None and self.execution_log is not None:
+            self.execution_log.append(render_output(out))
+        return out
+
+    def log_outputs(self, cell):
+        if self.execution_log is not None:
+            self.execution_log.append(''.join(render_output(out) for out in cell.outputs))
+
+def limit_kernel(pid, limits):
+    """
+    Aplica los límites de CPU y memoria al proceso del kernel (y a lo que
+    lance). El kernel se reinicia al devolverlo al pool, así que no pasan
+    a la siguiente ejecución
+    """
+    if not hasattr(psutil.Process, 'rlimit'):
+        return
+    try:
+        process = psutil.Process(pid)
+        if limits.get('cpu'):
+            # El kernel ya gastó CPU al arrancar y precargar librerías
+            used = sum(process.cpu_times()[:2])
+            seconds = math.ceil(used + limits['cpu'])
+            process.rlimit(psutil.RLIMIT_CPU, (seconds, seconds + 1))
+        if limits.get('memory'):
+            process.rlimit(psutil.RLIMIT_DATA, (limits['memory'], limits['memory']))
+    except (psutil.Error, OSError, ValueError):
+        pass
+
+class NotebookWatchdog:
+    """
+    Para el notebook en curso: stop() interrumpe el kernel y, si la celda no
+    se detiene en `grace` segundos, lo mata. Con `seconds` lo hace solo al
+    vencer el límite de tiempo real; nbclient no puede aplicar su propio
+    timeout con un KernelManager síncrono porque espera las salidas
+    bloqueando su bucle de eventos.
+    """
+
+    def __init__(self, km, seconds=None, grace=5):
+        self.km = km
+        self.grace = grace
+        self.expired = False
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._cancelled = False
+        self._timers = []
+        if seconds:
+            self._schedule(seconds, self._expire)
+
+    def _schedule(self, seconds, function):
+        timer = threading.Timer(seconds, function)
+        timer.daemon = True
+        timer.start()
+        self._timers.append(timer)
+
+    def stop(self):
+        with self._lock:
+            if self._stopped or self._cancelled:
+                return
+            self._stopped = True
+            self._schedule(self.grace, self._kill)
         try:
-            # Monitorear recursos
-            process = psutil.Process(os.getpid())
-            initial_memory = process.memory_info().rss
-
-            # Ejecutar archivo
-            with open(file_path) as f:
-                exec(f.read())
-
-            # Calcular uso de recursos
-            final_memory = process.memory_info().rss
-            memory_used = final_memory - initial_memory
-            cpu_percent = process.cpu_percent()
-
-            execution.metrics = {
-                'memory_used': memory_used,
-                'cpu_percent': cpu_percent
-            }
-            execution.logs = output.getvalue()
-            execution.save()
-
-            return {
-                'success': True,
-                'output': output.getvalue()
-            }
-
-        except Exception as e:
-            execution.error_message = str(e)
-            execution.logs = output.getvalue()
-            execution.save()
-            raise
-
-def execute_notebook(file_path, execution):
+            self.km.interrupt_kernel()
+        except Exception:
+            pass
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            for timer in self._timers:
+                timer.cancel()
+
+    def _expire(self):
+        self.expired = True
+        self.stop()
+
+    def _kill(self):
+        try:
+            self.km.signal_kernel(signal.SIGKILL)
+        except Exception:
+            pass
+
+def execute_notebook(file_path, execution, environment, limits=None, watcher=None):
     """
     Ejecuta un notebook Jupyter
     """
+    limits = limits or {}
+    kernel_pool = get_kernel_pool()
+    kernel = None
+    client = None
+    sampler = None
+    watchdog = None
+    publisher = events.ExecutionPublisher(execution)
     try:
-        import nbformat
-        from nbconvert.preprocessors import ExecutePreprocessor
-
         with open(file_path) as f:
             nb = nbformat.read(f, as_version=4)
+        inject_parameters(nb, execution.parameters)
+
+        # Kernel caliente del entorno, ya situado en el directorio de trabajo
+        kernel = kernel_pool.acquire(environment, cwd=os.path.dirname(file_path))
+        watchdog = NotebookWatchdog(kernel.km, limits.get('wall'))
+        if watcher is not None:
+            watcher.attach(watchdog.stop)
+        pid = getattr(kernel.km.provisioner, 'pid', None)
+        if pid:
+            limit_kernel(pid, limits)
+            sampler = ResourceSampler(pid, on_sample=publisher).start()
+        execution.metrics = {
+            **execution.metrics,
+            'kernel_pool': {'warm_start': kernel.warm, **kernel_pool.stats()},
+            'limits': limits,
+        }
 
-        # Configurar el ejecutor
-        ep = ExecutePreprocessor(timeout=600, kernel_name='python3')
+        # Configurar el ejecutor; las salidas se añaden al log según llegan
+        log = ExecutionLog(execution.id)
+        log.create()
+        client = LoggingNotebookClient(
+            nb,
+            km=kernel.km,
+            timeout=None,
+            kernel_name=environment.kernel_name,
+            resources={'metadata': {'path': os.path.dirname(file_path)}},
+            execution_log=log,
+        )
 
         # Ejecutar el notebook
-        ep.preprocess(nb, {'metadata': {'path': os.path.dirname(file_path)}})
+        task = execution.task_version.task
+        if task.incremental_execution:
+            seed = notebook_seed(environment.key, execution.parameters, task.cache_inputs)
+            cache_metrics = run_incremental(
+                client, CellCache(task.id, execution.task_version_id), seed=seed, on_reused=client.log_outputs
+            )
+            execution.metrics = {**execution.metrics, 'incremental': cache_metrics}
+        else:
+            client.execute()
 
         # Guardar resultados
         output_path = file_path.replace('.ipynb', '_output.ipynb')
         with open(output_path, 'w', encoding='utf-8') as f:
             nbformat.write(nb, f)
 
-        # Extraer resultados
-        outputs = []
-        for cell in nb.cells:
-            if cell.cell_type == 'code' and hasattr(cell, 'outputs'):
-                outputs.extend(cell.outputs)
-
-        execution.logs = json.dumps(outputs)
-        execution.save()
+        # Las salidas completas (imágenes incluidas) quedan en el notebook de
+        # salida; el log solo guarda su texto
 
         return {
             'success': True,
@@ -134,6 +401,20 @@ def execute_notebook(file_path, execution):
         }
 
     except Exception as e:
-        execution.error_message = str(e)
-        execution.save()
-        raise 
\ No newline at end of file
+        if watchdog is not None and watchdog.expired:
+            raise ExecutionTimeout(f"Wall-clock limit of {limits['wall']}s exceeded") from e
+        raise
+
+    finally:
+        if watcher is not None:
+            watcher.detach()
+        if watchdog is not None:
+            watchdog.cancel()
+        if sampler is not None:
+            execution.resources = sampler.stop()
+        publisher.publish()
+        if client is not None and client.kc is not None:
+            client.kc.stop_channels()
+        if kernel is not None:
+            # Se reinicia en segundo plano y vuelve al pool
+            kernel_pool.release(kernel)
\ No newline at end of file
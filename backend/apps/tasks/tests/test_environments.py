@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from ..environments import EnvironmentBuildError, EnvironmentManager, normalize_requirements
+
+class NormalizeRequirementsTests(SimpleTestCase):
+    def test_skips_stdlib_and_maps_aliases(self):
+        self.assertEqual(
+            normalize_requirements('os\nsklearn\npandas\n\njson\npandas # repetido'),
+            ['pandas', 'scikit-learn']
+        )
+
+class EnvironmentManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def test_no_requirements_uses_worker_interpreter(self):
+        manager = EnvironmentManager(root=self.root, max_bytes=0)
+        with manager.environment('os\nsys') as environment:
+            self.assertIsNone(environment.path)
+            self.assertEqual(environment.kernel_name, 'python3')
+
+    @patch.object(EnvironmentManager, '_pip_install', return_value=True)
+    def test_environment_is_built_once(self, mock_install):
+        manager = EnvironmentManager(root=self.root, max_bytes=10 ** 12)
+        with manager.environment('pandas') as first:
+            self.assertTrue(os.path.exists(first.python))
+        with manager.environment('pandas') as second:
+            self.assertEqual(first.key, second.key)
+        mock_install.assert_called_once()
+
+    @patch.object(EnvironmentManager, '_pip_install', return_value=True)
+    def test_evicts_least_recently_used(self, mock_install):
+        manager = EnvironmentManager(root=self.root, max_bytes=10 ** 12)
+        with manager.environment('pandas') as old:
+            pass
+        with manager.environment('numpy') as recent:
+            manager.max_bytes = 1
+            manager.evict()
+            # El entorno en uso no se puede expulsar
+            self.assertTrue(os.path.exists(recent.python))
+        self.assertFalse(os.path.exists(old.path))
+
+
+    @patch.object(EnvironmentManager, '_pip_install', side_effect=lambda python, packages: 'nonexistent' not in packages)
+    def test_failed_install_does_not_leave_an_environment(self, mock_install):
+        manager = EnvironmentManager(root=self.root, max_bytes=10 ** 12)
+        with self.assertRaisesMessage(EnvironmentBuildError, 'Could not install nonexistent'):
+            with manager.environment('pandas\nnonexistent'):
+                pass
+        self.assertEqual(manager.cached_environments(), [])
+        self.assertEqual([name for name in os.listdir(self.root) if not name.endswith('.lock')], [])
\ No newline at end of file
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+import redis
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from ..models import Task, TaskVersion, TaskExecution
+from ..logstore import ExecutionLog
+from .. import events
+
+User = get_user_model()
+
+class PublishTests(TestCase):
+    def setUp(self):
+        logs_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, logs_root, ignore_errors=True)
+        override = override_settings(TASK_LOGS_ROOT=logs_root, TASK_EVENTS_PREFIX='test:events')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        patcher = patch('apps.tasks.events.get_redis')
+        self.pipe = patcher.start().return_value.pipeline.return_value
+        self.addCleanup(patcher.stop)
+
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.task = Task.objects.create(name='Test Task', owner=user)
+        version = TaskVersion.objects.create(task=self.task, file='test.py')
+        self.execution = TaskExecution.objects.create(task_version=version, status='running')
+
+    def published(self, event_type):
+        messages = [json.loads(call.args[1]) for call in self.pipe.publish.call_args_list[::2]]
+        return [message['data'] for message in messages if message['type'] == event_type]
+
+    def test_status_goes_to_execution_and_task_channels(self):
+        events.publish_status(self.execution)
+        channels = [call.args[0] for call in self.pipe.publish.call_args_list]
+        self.assertEqual(channels, [
+            f'test:events:execution:{self.execution.id}',
+            f'test:events:task:{self.task.id}',
+        ])
+        self.assertEqual(self.published('status')[0]['status'], 'running')
+
+    def test_publisher_sends_new_log_text_with_offsets(self):
+        log = ExecutionLog(self.execution.id)
+        log.create()
+        publisher = events.ExecutionPublisher(self.execution)
+
+        log.append('one\n')
+        publisher({'t': 0.0, 'rss': 1024})
+        publisher.publish()
+        log.append('two\n')
+        publisher.publish()
+
+        self.assertEqual(
+            [(chunk['offset'], chunk['next_offset'], chunk['text']) for chunk in self.published('log')],
+            [(0, 4, 'one\n'), (4, 8, 'two\n')]
+        )
+        self.assertEqual(self.published('resources'), [{'t': 0.0, 'rss': 1024}])
+        self.pipe.set.assert_called_once_with(
+            f'test:events:last:{self.execution.id}', json.dumps({'t': 0.0, 'rss': 1024}), ex=events.LAST_SAMPLE_TTL
+        )
+
+    def test_redis_errors_do_not_reach_the_execution(self):
+        self.pipe.execute.side_effect = redis.ConnectionError('down')
+        events.publish_status(self.execution)
+
+class FakeHub:
+    def __init__(self, messages=()):
+        self.queue = asyncio.Queue()
+        for message in messages:
+            self.queue.put_nowait(message)
+        self.channels = None
+        self.unsubscribed = False
+
+    async def subscribe(self, channels):
+        self.channels = channels
+        return self.queue
+
+    async def unsubscribe(self, channels, queue):
+        self.unsubscribed = True
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = str(AccessToken.for_user(self.user))
+        self.task = Task.objects.create(name='Test Task', owner=self.user)
+        self.version = TaskVersion.objects.create(task=self.task, file='test.py')
+
+    async def read_events(self, response):
+        chunks = [chunk async for chunk in response.streaming_content]
+        return [json.loads(chunk.decode().split('data: ', 1)[1]) for chunk in chunks]
+
+    async def test_stream_requires_token(self):
+        execution = await TaskExecution.objects.acreate(task_version=self.version)
+        response = await self.async_client.get(f'/api/events/executions/{execution.id}/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_jwt_in_the_query_string_is_not_accepted(self):
+        execution = await TaskExecution.objects.acreate(task_version=self.version)
+        response = await self.async_client.get(f'/api/events/executions/{execution.id}/', {'token': self.token})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_finished_execution_stream_ends_with_its_status(self):
+        execution = await TaskExecution.objects.acreate(task_version=self.version, status='completed')
+        hub = FakeHub()
+        with patch('apps.tasks.events.get_hub', return_value=hub):
+            response = await self.async_client.get(
+                f'/api/events/executions/{execution.id}/', headers={'Authorization': f'Bearer {self.token}'}
+            )
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            received = await self.read_events(response)
+        self.assertEqual([event['data']['status'] for event in received], ['completed'])
+        self.assertTrue(hub.unsubscribed)
+
+    async def test_running_execution_stream_relays_published_events(self):
+        execution = await TaskExecution.objects.acreate(task_version=self.version, status='running')
+        execution = await TaskExecution.objects.select_related('task_version').aget(pk=execution.pk)
+        hub = FakeHub([
+            events.encode_event(execution, 'log', {'offset': 0, 'next_offset': 3, 'text': 'hi\n'}),
+            events.encode_event(execution, 'status', {'status': 'completed'}),
+        ])
+        with patch('apps.tasks.events.get_hub', return_value=hub):
+            response = await self.async_client.get(
+                f'/api/events/executions/{execution.id}/', headers={'Authorization': f'Bearer {self.token}'}
+            )
+            received = await self.read_events(response)
+        self.assertEqual(hub.channels, [events.execution_channel(execution.id)])
+        self.assertEqual([event['type'] for event in received], ['status', 'log', 'status'])
+        self.assertEqual(received[1]['data']['text'], 'hi\n')
+
+    async def test_task_stream_of_another_owner_is_not_found(self):
+        other = await User.objects.acreate(username='other')
+        task = await Task.objects.acreate(name='Other', owner=other)
+        response = await self.async_client.get(
+            f'/api/events/tasks/{task.id}/', headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+class StreamTicketTests(TestCase):
+    def setUp(self):
+        try:
+            events.get_redis().ping()
+        except redis.RedisError:
+            self.skipTest('Redis is not available')
+        override = override_settings(TASK_EVENTS_PREFIX=f'test:events:{self.id()}')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.task = Task.objects.create(name='Test Task', owner=self.user)
+        version = TaskVersion.objects.create(task=self.task, file='test.py')
+        self.execution = TaskExecution.objects.create(task_version=version, status='completed')
+
+    def test_ticket_is_issued_for_own_executions(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post(f'/api/executions/{self.execution.id}/stream_ticket/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['url'], f"/api/events/executions/{self.execution.id}/?ticket={response.data['ticket']}")
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        client.force_authenticate(user=other)
+        self.assertEqual(client.post(f'/api/executions/{self.execution.id}/stream_ticket/').status_code, 404)
+        self.assertEqual(client.post(f'/api/tasks/{self.task.id}/stream_ticket/').status_code, 404)
+
+    async def test_ticket_opens_one_stream_of_its_channel(self):
+        ticket = await sync_to_async(events.issue_ticket)(self.user, events.execution_channel(self.execution.id))
+        url = f'/api/events/executions/{self.execution.id}/'
+
+        other_task = await self.async_client.get(f'/api/events/tasks/{self.task.id}/', {'ticket': ticket})
+        self.assertEqual(other_task.status_code, 401)
+
+        ticket = await sync_to_async(events.issue_ticket)(self.user, events.execution_channel(self.execution.id))
+        with patch('apps.tasks.events.get_hub', return_value=FakeHub()):
+            response = await self.async_client.get(url, {'ticket': ticket})
+            self.assertEqual(response.status_code, 200)
+            [chunk async for chunk in response.streaming_content]
+        self.assertEqual((await self.async_client.get(url, {'ticket': ticket})).status_code, 401)
\ No newline at end of file
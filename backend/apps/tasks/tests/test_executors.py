@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import signal
+import shutil
+import tempfile
+from unittest import skipUnless
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from ..executors import InterpreterPool
+
+class InterpreterPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.pool = InterpreterPool(preload=['json'], max_idle=2, max_runs=2, max_rss=10 ** 12)
+        self.addCleanup(self.pool.close_all)
+
+    def run_script(self, source, limits=None):
+        path = os.path.join(self.dir, 'job.py')
+        log_path = os.path.join(self.dir, 'output.log')
+        with open(path, 'w') as f:
+            f.write(source)
+        open(log_path, 'w').close()
+        result = self.pool.run(sys.executable, path, self.dir, log_path, limits=limits)
+        with open(log_path) as f:
+            return result, f.read()
+
+    def test_runs_are_isolated(self):
+        result, _ = self.run_script("import json\njson.leaked = True\n")
+        self.assertEqual(result['returncode'], 0)
+        result, output = self.run_script("import json\nprint(hasattr(json, 'leaked'))\n")
+        self.assertEqual(output.strip(), 'False')
+        self.assertEqual(self.pool.hits, 1)
+        self.assertEqual(self.pool.misses, 1)
+
+    def test_runner_directory_is_not_importable(self):
+        # runner.py vive junto a los módulos de la aplicación (tasks, models...)
+        result, output = self.run_script(
+            "import sys\nprint(any(entry.endswith('apps/tasks') for entry in sys.path))\nimport parameters\n"
+        )
+        self.assertEqual(output.splitlines()[0], 'False')
+        self.assertIn("No module named 'parameters'", output)
+
+    def test_worker_environment_is_not_inherited(self):
+        with patch.dict(os.environ, {'SECRET_KEY': 'worker-secret', 'TASKFLOW_MODE': 'test'}):
+            pool = InterpreterPool(preload=[])
+            self.addCleanup(pool.close_all)
+            path = os.path.join(self.dir, 'job.py')
+            log_path = os.path.join(self.dir, 'output.log')
+            with open(path, 'w') as f:
+                f.write("import os\nprint(os.environ.get('SECRET_KEY'), os.environ.get('TASKFLOW_MODE'))\n")
+            open(log_path, 'w').close()
+            pool.run(sys.executable, path, self.dir, log_path)
+        with open(log_path) as f:
+            self.assertEqual(f.read().strip(), 'None test')
+
+    def test_child_has_its_own_group_when_started(self):
+        groups = []
+        path = os.path.join(self.dir, 'job.py')
+        log_path = os.path.join(self.dir, 'output.log')
+        with open(path, 'w') as f:
+            f.write("import time\ntime.sleep(30)\n")
+        open(log_path, 'w').close()
+
+        def on_start(pid):
+            groups.append(os.getpgid(pid))
+            os.killpg(pid, signal.SIGKILL)
+
+        result = self.pool.run(sys.executable, path, self.dir, log_path, on_start=on_start)
+        self.assertEqual(result['returncode'], -signal.SIGKILL)
+        self.assertEqual(groups, [result['pid']])
+
+    def test_exit_code_and_traceback_are_captured(self):
+        result, output = self.run_script("raise RuntimeError('boom')\n")
+        self.assertEqual(result['returncode'], 1)
+        self.assertIn('RuntimeError: boom', output)
+
+    def test_interpreter_recycled_after_max_runs(self):
+        self.run_script("pass\n")
+        self.run_script("pass\n")
+        self.assertEqual(self.pool.stats()['idle'].get(sys.executable, 0), 0)
+        self.run_script("pass\n")
+        self.assertEqual(self.pool.misses, 2)
+
+    def test_wall_clock_limit_kills_process_group(self):
+        started = time.monotonic()
+        result, _ = self.run_script(
+            "import subprocess, sys, time\n"
+            "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+            "time.sleep(30)\n",
+            limits={'wall': 0.5}
+        )
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertTrue(result['timed_out'])
+        self.assertEqual(result['returncode'], -signal.SIGKILL)
+        # El intérprete sigue sirviendo trabajos
+        result, _ = self.run_script("pass\n")
+        self.assertEqual((result['returncode'], result['timed_out']), (0, False))
+
+    def test_cpu_limit(self):
+        result, _ = self.run_script("while True:\n    pass\n", limits={'cpu': 1})
+        self.assertIn(result['returncode'], (-signal.SIGXCPU, -signal.SIGKILL))
+        # getrusage redondea al tick del planificador
+        self.assertGreaterEqual(result['cpu_time'], 0.9)
+
+    @skipUnless(sys.platform.startswith('linux'), 'RLIMIT_DATA solo se respeta en Linux')
+    def test_memory_limit(self):
+        result, output = self.run_script(
+            "data = bytearray(512 * 1024 * 1024)\n", limits={'memory': 256 * 1024 * 1024}
+        )
+        self.assertEqual(result['returncode'], 1)
+        self.assertIn('MemoryError', output)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import time
+import uuid
+from unittest.mock import patch
+import redis
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from ..models import Task, TaskVersion, TaskExecution
+from .. import fairshare
+
+User = get_user_model()
+
+class FairShareTests(TestCase):
+    def setUp(self):
+        try:
+            fairshare.get_redis().ping()
+        except redis.RedisError:
+            self.skipTest('Redis is not available')
+        prefix = f'test:fair:{uuid.uuid4().hex}'
+        override = override_settings(TASK_QUEUE_PREFIX=prefix, TASK_OWNER_MAX_CONCURRENCY=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(lambda: [fairshare.get_redis().delete(key) for key in fairshare.get_redis().scan_iter(f'{prefix}:*')])
+
+        patcher = patch('apps.tasks.tasks.execute_task.apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+
+    def submit(self, user, count, priority='normal'):
+        task = Task.objects.create(name=f'{user.username} task', owner=user, priority=priority)
+        version = TaskVersion.objects.create(task=task, file='test.py', status='active')
+        executions = [
+            TaskExecution.objects.create(
+                task_version=version, triggered_by=user, priority=priority,
+                queued_at=timezone.now(), celery_task_id=str(uuid.uuid4())
+            )
+            for _ in range(count)
+        ]
+        fairshare.submit(executions)
+        return executions
+
+    def dispatched(self):
+        return [call.args[0][0] for call in self.apply_async.call_args_list]
+
+    def test_round_robin_within_owner_limits(self):
+        alice = self.submit(self.alice, 5)
+        bob = self.submit(self.bob, 2)
+
+        self.assertEqual(fairshare.dispatch(), 4)
+        self.assertEqual(self.dispatched(), [alice[0].id, bob[0].id, alice[1].id, bob[1].id])
+        self.assertEqual(self.apply_async.call_args.kwargs['queue'], 'executions.normal')
+
+        # Al terminar una de alice sale la siguiente de su cola
+        fairshare.release(alice[0], duration=10)
+        self.assertEqual(self.dispatched()[-1], alice[2].id)
+
+        status = fairshare.queue_status(alice[4])
+        self.assertEqual((status['position'], status['running'], status['concurrency_limit']), (1, 2, 2))
+        self.assertEqual(status['estimated_wait'], 10)
+
+    def test_higher_priority_goes_first(self):
+        low = self.submit(self.alice, 1, priority='low')
+        high = self.submit(self.bob, 1, priority='high')
+        fairshare.dispatch()
+        self.assertEqual(self.dispatched(), [high[0].id, low[0].id])
+        self.assertEqual(self.apply_async.call_args_list[0].kwargs['queue'], 'executions.high')
+
+    def test_owner_specific_limit(self):
+        fairshare.set_owner_cap(self.alice.pk, 1)
+        self.submit(self.alice, 3)
+        self.assertEqual(fairshare.dispatch(), 1)
+
+    def test_cancelled_and_stale_executions_free_their_slot(self):
+        first, second, third = self.submit(self.alice, 3)
+        TaskExecution.objects.filter(pk=first.pk).update(status='cancelled')
+        self.assertEqual(fairshare.dispatch(), 2)
+        self.assertEqual(self.dispatched(), [second.id, third.id])
+
+        TaskExecution.objects.filter(pk=second.pk).update(status='failed')
+        self.assertEqual(fairshare.reconcile(), 1)
+
+    def test_expired_claims_are_requeued_or_failed(self):
+        first, second = self.submit(self.alice, 2)
+        fairshare.dispatch()
+        # first se perdió antes de empezar; el worker de second murió a mitad
+        TaskExecution.objects.filter(pk=second.pk).update(status='running', started_at=timezone.now())
+        fairshare.heartbeat(second)
+
+        later = time.time() + settings.TASK_QUEUE_CLAIM_TIMEOUT + 1
+        self.assertEqual(fairshare.reconcile(now=later), 1)
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.error_message), ('failed', fairshare.WORKER_LOST_MESSAGE))
+
+        later = time.time() + settings.TASK_QUEUE_DISPATCH_TIMEOUT + 1
+        self.assertEqual(fairshare.reconcile(now=later), 1)
+        self.assertEqual(fairshare.dispatch(), 1)
+        self.assertEqual(self.dispatched()[-1], first.id)
+
+    def test_dispatched_pending_execution_waiting_in_celery_is_not_requeued(self):
+        execution, = self.submit(self.alice, 1)
+        fairshare.dispatch()
+        later = time.time() + settings.TASK_QUEUE_CLAIM_TIMEOUT + 1
+        self.assertEqual(fairshare.reconcile(now=later), 0)
+        self.assertEqual(fairshare.dispatch(), 0)
+        self.assertEqual(self.dispatched(), [execution.id])
+
+    def test_heartbeat_keeps_the_claim(self):
+        execution, = self.submit(self.alice, 1)
+        fairshare.dispatch()
+        TaskExecution.objects.filter(pk=execution.pk).update(status='running')
+        with patch('apps.tasks.fairshare.time.time', return_value=time.time() + settings.TASK_QUEUE_CLAIM_TIMEOUT):
+            fairshare.heartbeat(execution)
+        self.assertEqual(fairshare.reconcile(now=time.time() + settings.TASK_QUEUE_CLAIM_TIMEOUT + 1), 0)
+
+    def test_pending_executions_missing_from_redis_are_resubmitted(self):
+        queued, = self.submit(self.alice, 1)
+        version = queued.task_version
+        lost = TaskExecution.objects.create(
+            task_version=version, triggered_by=self.alice, queued_at=timezone.now(), celery_task_id=str(uuid.uuid4())
+        )
+        # Recién creadas no se tocan: el envío tras el commit aún puede llegar
+        self.assertEqual(fairshare.resubmit_missing(), 0)
+
+        later = time.time() + settings.TASK_QUEUE_CLAIM_TIMEOUT + 1
+        self.assertEqual(fairshare.resubmit_missing(now=later), 1)
+        self.assertEqual(fairshare.resubmit_missing(now=later), 0)
+        fairshare.dispatch()
+        self.assertEqual(self.dispatched(), [queued.id, lost.id])
+
+    def test_withdraw_removes_queued_and_frees_dispatched(self):
+        executions = self.submit(self.alice, 5)
+        fairshare.dispatch()
+        # Dos despachadas (ocupan hueco) y tres en cola
+        self.assertEqual(fairshare.withdraw([executions[0], executions[2], executions[3]]), 2)
+        self.assertEqual(fairshare.get_redis().zcard(fairshare._key('running', self.alice.pk)), 1)
+        self.assertEqual(fairshare.queue_status(executions[4])['position'], 0)
+
+        fairshare.withdraw([executions[4]])
+        self.assertEqual(fairshare.get_redis().llen(fairshare._key('ring', 'normal')), 0)
\ No newline at end of file
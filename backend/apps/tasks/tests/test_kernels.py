@@ -0,0 +1,50 @@
+import sys
+import tempfile
+from unittest.mock import Mock
+import nbformat
+from django.test import SimpleTestCase
+from nbconvert.preprocessors import ExecutePreprocessor
+from ..environments import Environment
+from ..kernels import KernelPool, PooledKernel
+
+class KernelPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = KernelPool(size=1, preload=[])
+        self.addCleanup(self.pool.shutdown_all)
+        self.environment = Environment('system', sys.executable)
+
+    def run_notebook(self, source):
+        nb = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell(source)])
+        kernel = self.pool.acquire(self.environment, cwd=tempfile.gettempdir())
+        warm = kernel.warm
+        ep = ExecutePreprocessor(timeout=60, kernel_name=self.environment.kernel_name)
+        try:
+            ep.preprocess(nb, {}, km=kernel.km)
+        finally:
+            ep.kc.stop_channels()
+            self.pool.release(kernel).join()
+        return warm, nb.cells[0].outputs
+
+    def test_kernel_is_reused_and_restarted(self):
+        first, _ = self.run_notebook('leftover = 1')
+        second, outputs = self.run_notebook("print('leftover' in globals())")
+        self.assertFalse(first)
+        self.assertTrue(second)
+        self.assertEqual(outputs[0]['text'].strip(), 'False')
+        self.assertEqual(self.pool.hits, 1)
+        self.assertEqual(self.pool.misses, 1)
+        self.assertEqual(self.pool.restarts, 2)
+
+
+    def test_idle_kernels_are_capped_across_environments(self):
+        pool = KernelPool(size=2, preload=[], max_idle=3)
+        environments = [Environment(f'env{index}', sys.executable) for index in range(3)]
+        kernels = [PooledKernel(environment, Mock()) for environment in environments for _ in range(2)]
+        for kernel in kernels[:4]:
+            self.assertTrue(pool._put(kernel))
+        # Al pasarse del máximo sale primero el entorno usado hace más tiempo
+        self.assertEqual(pool.stats()['idle'], {'env0': 1, 'env1': 2})
+        kernels[0].km.shutdown_kernel.assert_called_once_with(now=True)
+        for kernel in kernels[4:]:
+            self.assertTrue(pool._put(kernel))
+        self.assertEqual(pool.stats()['idle'], {'env1': 1, 'env2': 2})
\ No newline at end of file
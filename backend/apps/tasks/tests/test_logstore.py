@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from ..logstore import ExecutionLog, SegmentedLog, _trim_chunk, read_logs, tail
+from ..models import Task, TaskVersion, TaskExecution
+
+class FakeExecution:
+    def __init__(self, id, status='running', logs=''):
+        self.id = id
+        self.status = status
+        self.logs = logs
+        self.log_file = ''
+        self.log_size = 0
+
+class TailTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(TASK_LOGS_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_reads_only_new_bytes(self):
+        execution = FakeExecution(1)
+        log = ExecutionLog(execution.id)
+        log.create()
+        log.append('first\n')
+
+        page = tail(execution)
+        self.assertEqual(page['logs'], 'first\n')
+        self.assertFalse(page['complete'])
+
+        log.append('second\n')
+        page = tail(execution, since=page['next_offset'])
+        self.assertEqual(page['logs'], 'second\n')
+        self.assertEqual(page['next_offset'], page['size'])
+
+    def test_limit_cuts_at_line_boundary(self):
+        execution = FakeExecution(2)
+        log = ExecutionLog(execution.id)
+        log.create()
+        log.append('aaa\nbbb\nccc\n')
+
+        page = tail(execution, limit=6)
+        self.assertEqual(page['logs'], 'aaa\n')
+        self.assertEqual(page['next_offset'], 4)
+
+    def test_does_not_split_utf8_characters(self):
+        self.assertEqual(_trim_chunk('añ'.encode('utf-8')[:2]), b'a')
+        self.assertEqual(_trim_chunk('añ'.encode('utf-8')), 'añ'.encode('utf-8'))
+
+    def test_falls_back_to_logs_field(self):
+        execution = FakeExecution(3, status='completed', logs='legacy output')
+        page = tail(execution, since=7)
+        self.assertEqual(page['logs'], 'output')
+        self.assertTrue(page['complete'])
+
+
+    @override_settings(TASK_LOGS_SEGMENT_SIZE=8)
+    def test_sealed_log_is_read_across_segments(self):
+        execution = FakeExecution(4)
+        log = ExecutionLog(execution.id)
+        log.create()
+        log.append('line one\nline two\nlast')
+
+        info = log.seal()
+        self.assertEqual(info, {'log_file': '4', 'log_size': 22, 'log_lines': 3})
+        self.assertTrue(log.exists())
+        log.discard()
+        self.assertFalse(log.exists())
+        self.assertEqual(len(os.listdir(os.path.join(self.root, '4'))), 3)
+
+        execution.status = 'completed'
+        execution.log_file, execution.log_size = info['log_file'], info['log_size']
+        self.assertEqual(SegmentedLog('4', 22).read(5, 10), b'one\nline t')
+        page = tail(execution, since=9, limit=100)
+        self.assertEqual(page['logs'], 'line two\nlast')
+        self.assertEqual(page['next_offset'], 22)
+        self.assertEqual(read_logs(execution), 'line one\nline two\nlast')
+
+class CompactExecutionLogsTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(TASK_LOGS_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        task = Task.objects.create(name='Test Task', owner=user)
+        version = TaskVersion.objects.create(task=task, file=SimpleUploadedFile('job.py', b"print('hi')"))
+        self.execution = TaskExecution.objects.create(
+            task_version=version,
+            status='completed',
+            logs='legacy\noutput\n'
+        )
+
+    def test_moves_logs_out_of_the_row(self):
+        call_command('compact_execution_logs', stdout=open(os.devnull, 'w'))
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.logs, '')
+        self.assertEqual(self.execution.log_size, 14)
+        self.assertEqual(self.execution.log_lines, 2)
+        self.assertEqual(read_logs(self.execution), 'legacy\noutput\n')
@@ -1,7 +1,12 @@
-from django.test import TestCase
+import hashlib
+import os
+import tempfile
+from unittest.mock import patch
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from ..models import Task, TaskVersion, TaskExecution
+from django.core.files.uploadedfile import SimpleUploadedFile
+from ..models import FileBlob, Task, TaskVersion, TaskExecution
 
 User = get_user_model()
 
@@ -26,6 +31,11 @@ class TaskModelTests(TestCase):
     def test_task_str(self):
         self.assertEqual(str(self.task), 'Test Task')
 
+    @override_settings(TASK_DEFAULT_TIMEOUT=3600, TASK_DEFAULT_CPU_LIMIT=0, TASK_DEFAULT_MEMORY_LIMIT=0)
+    def test_execution_limits_ignore_unlimited_and_negative_values(self):
+        task = Task(name='Limits', owner=self.user, cpu_limit=10, memory_limit=-1)
+        self.assertEqual(task.execution_limits(), {'wall': 3600, 'cpu': 10})
+
     def test_task_get_active_version(self):
         self.assertIsNone(self.task.get_active_version())
 
@@ -67,6 +77,135 @@ class TaskVersionModelTests(TestCase):
         self.assertEqual(version1.status, 'archived')
         self.assertEqual(version2.status, 'active')
 
+    def test_active_version_pointer_follows_status(self):
+        version = TaskVersion.objects.create(
+            task=self.task,
+            file='test1.py',
+            status='active'
+        )
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.active_version, version)
+
+        version.status = 'archived'
+        version.save()
+        self.task.refresh_from_db()
+        self.assertIsNone(self.task.get_active_version())
+
+    def test_identical_files_share_blob(self):
+        content = b"print('dedup')"
+        version1 = TaskVersion.objects.create(
+            task=self.task,
+            file=SimpleUploadedFile('first.py', content)
+        )
+        version2 = TaskVersion.objects.create(
+            task=self.task,
+            file=SimpleUploadedFile('second.py', content)
+        )
+        self.assertEqual(version1.file.name, version2.file.name)
+        self.assertEqual(version1.checksum, version2.checksum)
+        self.assertEqual(version2.metadata['original_name'], 'second.py')
+        self.assertEqual(FileBlob.objects.get(pk=version1.file.name).ref_count, 2)
+
+    def test_blob_deleted_with_last_reference(self):
+        storage = TaskVersion._meta.get_field('file').storage
+        version1 = TaskVersion.objects.create(
+            task=self.task,
+            file=SimpleUploadedFile('first.py', b"print('refcount')")
+        )
+        version2 = TaskVersion.objects.create(
+            task=self.task,
+            file=SimpleUploadedFile('second.py', b"print('refcount')")
+        )
+        name = version1.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            version1.delete()
+        self.assertTrue(storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            version2.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(FileBlob.objects.exists())
+
+    def test_blob_reused_before_the_delete_commits_is_kept(self):
+        storage = TaskVersion._meta.get_field('file').storage
+        version1 = TaskVersion.objects.create(
+            task=self.task,
+            file=SimpleUploadedFile('first.py', b"print('race')")
+        )
+        name = version1.file.name
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            version1.delete()
+        TaskVersion.objects.create(task=self.task, file=SimpleUploadedFile('second.py', b"print('race')"))
+        # El borrado pendiente se ejecuta tras la nueva referencia
+        for callback in callbacks:
+            callback()
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+
+    def test_blob_deleted_between_save_and_acquire_is_written_again(self):
+        storage = TaskVersion._meta.get_field('file').storage
+        save = storage._save
+        calls = []
+
+        def save_then_purge(name, content):
+            saved = save(name, content)
+            if not calls:
+                # Una liberación concurrente lo borra antes de registrar la referencia
+                storage.delete(saved)
+            calls.append(saved)
+            return saved
+
+        with patch.object(storage, '_save', side_effect=save_then_purge):
+            version = TaskVersion.objects.create(task=self.task, file=SimpleUploadedFile('first.py', b"print('gone')"))
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(storage.exists(version.file.name))
+        with storage.open(version.file.name) as f:
+            self.assertEqual(f.read(), b"print('gone')")
+
+    def test_same_bytes_with_other_extension_get_their_own_blob(self):
+        storage = TaskVersion._meta.get_field('file').storage
+        script = TaskVersion.objects.create(task=self.task, file=SimpleUploadedFile('job.py', b'{}'))
+        notebook = TaskVersion.objects.create(task=self.task, file=SimpleUploadedFile('job.ipynb', b'{}'))
+        self.assertNotEqual(script.file.name, notebook.file.name)
+        self.assertEqual(FileBlob.objects.filter(checksum=script.checksum).count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            script.delete()
+            notebook.delete()
+        self.assertFalse(storage.exists(script.file.name))
+        self.assertFalse(storage.exists(notebook.file.name))
+        self.assertFalse(FileBlob.objects.exists())
+
+    def test_temporary_upload_never_leaks(self):
+        storage = TaskVersion._meta.get_field('file').storage
+        checksum = hashlib.sha256(b"print('tmp')").hexdigest()
+
+        def temporary():
+            fd, path = tempfile.mkstemp()
+            with os.fdopen(fd, 'wb') as f:
+                f.write(b"print('tmp')")
+            return path
+
+        first = temporary()
+        name = storage._save_temporary('task_files', '.py', first, checksum)
+        self.addCleanup(storage.delete, name)
+        self.assertFalse(os.path.exists(first))
+
+        # Ya almacenado: el temporal se borra
+        second = temporary()
+        self.assertEqual(storage._save_temporary('task_files', '.py', second, checksum), name)
+        self.assertFalse(os.path.exists(second))
+
+        # Otra subida lo escribe entre la comprobación y el movimiento
+        third = temporary()
+        with patch('apps.tasks.storage.os.path.exists', return_value=False):
+            self.assertEqual(storage._save_temporary('task_files', '.py', third, checksum), name)
+        self.assertFalse(os.path.exists(third))
+        with storage.open(name) as f:
+            self.assertEqual(f.read(), b"print('tmp')")
+
 class TaskExecutionModelTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -95,4 +234,22 @@ class TaskExecutionModelTests(TestCase):
             task_version=self.version,
             triggered_by=self.user
         )
-        self.assertIn(str(self.version), str(execution)) 
\ No newline at end of file
+        self.assertIn(str(self.version), str(execution)) 
+
+    def test_transition_updates_only_from_the_expected_status(self):
+        execution = TaskExecution.objects.create(task_version=self.version)
+        stale = TaskExecution.objects.get(pk=execution.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(execution.transition('running', error_message='started'))
+        self.assertEqual(execution.status, 'running')
+
+        # La copia cargada antes sigue creyendo que está pendiente
+        self.assertFalse(stale.transition('cancelled'))
+        self.assertEqual(stale.status, 'pending')
+        execution.refresh_from_db()
+        self.assertEqual((execution.status, execution.error_message), ('running', 'started'))
+
+    def test_finished_execution_cannot_transition(self):
+        execution = TaskExecution.objects.create(task_version=self.version, status='completed')
+        with self.assertRaises(ValueError):
+            execution.transition('running')
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import sys
+import shutil
+import tempfile
+import nbformat
+from nbclient import NotebookClient
+from django.test import SimpleTestCase, override_settings
+from ..environments import Environment
+from ..kernels import KernelPool
+from ..notebook_cache import CellCache, notebook_seed, run_incremental
+
+def notebook(*sources):
+    return nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell(source) for source in sources])
+
+class CellCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.cache = CellCache(1, 1, root=self.root)
+
+    def test_chain_changes_from_first_edited_cell(self):
+        first = self.cache.chain(notebook('a = 1', 'b = 2', 'c = 3').cells, 'seed')
+        second = self.cache.chain(notebook('a = 1', 'b = 20', 'c = 3').cells, 'seed')
+        self.assertEqual(first[0], second[0])
+        self.assertNotEqual(first[1], second[1])
+        self.assertNotEqual(first[2], second[2])
+        self.assertNotEqual(first[0], self.cache.chain(notebook('a = 1').cells, 'other')[0])
+
+    def test_resume_point_needs_outputs_and_state(self):
+        nb = notebook('a = 1', 'b = 2')
+        hashes = self.cache.chain(nb.cells, 'seed')
+        self.assertEqual(self.cache.resume_point(hashes), (0, None))
+        self.cache.save_outputs(hashes[0], nb.cells[0])
+        self.assertEqual(self.cache.resume_point(hashes), (0, None))
+        open(self.cache.state_path(hashes[0]), 'wb').close()
+        self.assertEqual(self.cache.resume_point(hashes), (1, hashes[0]))
+
+    def test_seed_covers_parameters_and_inputs(self):
+        with override_settings(TASK_INPUTS_ROOT=self.root):
+            with open(os.path.join(self.root, 'data.csv'), 'w') as f:
+                f.write('a')
+            seed = notebook_seed('env', {'n': 1}, ['data.csv'])
+            self.assertNotEqual(seed, notebook_seed('env', {'n': 2}, ['data.csv']))
+            with open(os.path.join(self.root, 'data.csv'), 'w') as f:
+                f.write('ab')
+            self.assertNotEqual(seed, notebook_seed('env', {'n': 1}, ['data.csv']))
+
+    def save_chain(self, cache, seed, *sources):
+        nb = notebook(*sources)
+        hashes = cache.chain(nb.cells, seed)
+        cache.track(seed, hashes)
+        for cell_hash, cell in zip(hashes, nb.cells):
+            cache.save_outputs(cell_hash, cell)
+        cache.prune()
+        return hashes
+
+    def test_prune_keeps_chains_of_other_versions(self):
+        first = self.save_chain(self.cache, 'seed', 'a = 1')
+        second = self.save_chain(CellCache(1, 2, root=self.root), 'seed', 'a = 2')
+        self.assertIsNotNone(self.cache.outputs(first[0]))
+        self.assertIsNotNone(self.cache.outputs(second[0]))
+
+        # La misma versión y semilla sustituye su propia cadena
+        self.save_chain(self.cache, 'seed', 'a = 3')
+        self.assertIsNone(self.cache.outputs(first[0]))
+        self.assertIsNotNone(self.cache.outputs(second[0]))
+
+    @override_settings(TASK_NOTEBOOK_CACHE_CHAINS=1)
+    def test_prune_forgets_old_chains(self):
+        first = self.save_chain(self.cache, 'seed', 'a = 1')
+        chains = os.path.join(self.root, '1', 'chains')
+        for name in os.listdir(chains):
+            os.utime(os.path.join(chains, name), (0, 0))
+        self.save_chain(self.cache, 'other', 'a = 1')
+        self.assertIsNone(self.cache.outputs(first[0]))
+
+@override_settings(TASK_NOTEBOOK_CHECKPOINT_MIN_SECONDS=0)
+class RunIncrementalTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.pool = KernelPool(size=1, preload=[])
+        self.addCleanup(self.pool.shutdown_all)
+        self.environment = Environment('system', sys.executable)
+
+    def run_notebook(self, nb):
+        kernel = self.pool.acquire(self.environment)
+        client = NotebookClient(nb, km=kernel.km, timeout=60, kernel_name='python3')
+        try:
+            return run_incremental(client, CellCache(1, 1, root=self.root), 'seed')
+        finally:
+            client.kc.stop_channels()
+            self.pool.release(kernel).join()
+
+    def test_resumes_from_unchanged_prefix(self):
+        self.run_notebook(notebook('loaded = [1, 2, 3]', 'print(len(loaded))'))
+        nb = notebook('loaded = [1, 2, 3]', 'print(sum(loaded))')
+        metrics = self.run_notebook(nb)
+        self.assertEqual(metrics, {'cells_reused': 1, 'resumed_from_cell': 1})
+        self.assertEqual(nb.cells[1].outputs[0]['text'].strip(), '6')
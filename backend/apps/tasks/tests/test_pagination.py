@@ -0,0 +1,134 @@
+from datetime import timedelta
+from urllib.parse import quote
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import Task, TaskVersion, TaskExecution
+
+User = get_user_model()
+
+class TaskCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        other = User.objects.create_user(username='other', password='testpass123')
+
+        tasks = [Task.objects.create(name=f'Task {index}', owner=self.user) for index in range(4)]
+        tasks.append(Task.objects.create(name='Public', owner=other, is_public=True))
+        Task.objects.create(name='Private', owner=other)
+
+        # Empates en updated_at: el id desempata
+        now = timezone.now()
+        Task.objects.filter(pk__in=[tasks[1].pk, tasks[2].pk]).update(updated_at=now)
+        self.expected = list(
+            Task.objects.filter(pk__in=[task.pk for task in tasks])
+            .order_by('-updated_at', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(row['id'] for row in response.data['results'])
+            pages.append(response.data)
+            url = response.data['next']
+        return ids, pages
+
+    def test_pages_cover_every_visible_task_once(self):
+        ids, pages = self.walk('/api/tasks/?page_size=2&fields=id')
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+    def test_previous_link_returns_the_same_page(self):
+        first = self.client.get('/api/tasks/?page_size=2').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [row['id'] for row in back['results']],
+            [row['id'] for row in first['results']]
+        )
+
+    def test_count_is_opt_in(self):
+        response = self.client.get('/api/tasks/?count=exact')
+        self.assertEqual(response.data['count'], 5)
+        response = self.client.get('/api/tasks/?count=approx')
+        self.assertEqual(response.data['count'], 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/tasks/?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ExecutionHistoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(name='Test Task', owner=self.user)
+        other_task = Task.objects.create(name='Other Task', owner=self.user)
+        version = TaskVersion.objects.create(task=self.task, file='test.py')
+        other_version = TaskVersion.objects.create(task=other_task, file='other.py')
+
+        self.now = timezone.now()
+        self.failed = TaskExecution.objects.create(
+            task_version=version, status='failed', started_at=self.now - timedelta(minutes=10)
+        )
+        self.old_failed = TaskExecution.objects.create(
+            task_version=version, status='failed', started_at=self.now - timedelta(days=2)
+        )
+        self.completed = TaskExecution.objects.create(
+            task_version=other_version, status='completed', started_at=self.now - timedelta(minutes=5)
+        )
+        self.pending = [
+            TaskExecution.objects.create(task_version=version, status='pending') for _ in range(2)
+        ]
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.data['results']]
+
+    def test_filters(self):
+        after = (self.now - timedelta(hours=1)).isoformat()
+        self.assertEqual(
+            self.ids(f'/api/executions/?status=failed&started_after={quote(after)}'),
+            [self.failed.id]
+        )
+        self.assertEqual(self.ids(f'/api/executions/?task={self.task.id}&status=failed,completed'),
+                         [self.failed.id, self.old_failed.id])
+        before = (self.now - timedelta(days=1)).isoformat()
+        self.assertEqual(self.ids(f'/api/executions/?started_before={quote(before)}'), [self.old_failed.id])
+
+        response = self.client.get('/api/executions/?status=exploded')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/executions/?started_after=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_walks_past_null_started_at(self):
+        # Las pendientes (started_at NULL) primero, como en el índice DESC
+        expected = sorted((execution.id for execution in self.pending), reverse=True) + [
+            self.completed.id, self.failed.id, self.old_failed.id
+        ]
+        ids, url = [], '/api/executions/?page_size=2&fields=id'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            ids.extend(row['id'] for row in response.data['results'])
+            pages.append(response.data)
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+
+        back = self.client.get(pages[-1]['previous']).data
+        self.assertEqual([row['id'] for row in back['results']], expected[2:4])
@@ -0,0 +1,41 @@
+import nbformat
+from django.test import SimpleTestCase
+from ..parameters import INJECTED_TAG, check_parameters, expand_grid, inject_parameters, script_arguments
+
+class ParametersTests(SimpleTestCase):
+    def test_check_parameters_requires_identifiers(self):
+        self.assertEqual(check_parameters({'alpha': 1}), {'alpha': 1})
+        for invalid in ({'class': 1}, {'a-b': 1}, [1]):
+            with self.assertRaises(ValueError):
+                check_parameters(invalid)
+
+    def test_expand_grid(self):
+        points = expand_grid({'b': [1, 2], 'a': ['x']}, base={'seed': 0})
+        self.assertEqual(points, [
+            {'seed': 0, 'a': 'x', 'b': 1},
+            {'seed': 0, 'a': 'x', 'b': 2},
+        ])
+
+    def test_script_arguments(self):
+        argv, env = script_arguments({'name': 'run', 'sizes': [1, 2]})
+        self.assertEqual(argv, ['--name', 'run', '--sizes', '[1, 2]'])
+        self.assertEqual(env, {'TASKFLOW_PARAMETERS': '{"name": "run", "sizes": [1, 2]}'})
+
+    def test_inject_after_parameters_cell(self):
+        nb = nbformat.v4.new_notebook(cells=[
+            nbformat.v4.new_code_cell('import math'),
+            nbformat.v4.new_code_cell('alpha = 1', metadata={'tags': ['parameters']}),
+            nbformat.v4.new_code_cell('print(alpha)'),
+        ])
+        inject_parameters(nb, {'alpha': 0.5, 'flag': True, 'label': None})
+        inject_parameters(nb, {'alpha': 2})
+
+        self.assertEqual(len(nb.cells), 4)
+        injected = nb.cells[2]
+        self.assertEqual(injected.metadata['tags'], [INJECTED_TAG])
+        self.assertEqual(injected.source, '# Parameters\nalpha = 2\n')
+
+    def test_inject_without_parameters_cell_goes_first(self):
+        nb = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell('print(alpha)')])
+        inject_parameters(nb, {'alpha': 'a'})
+        self.assertEqual(nb.cells[0].source, "# Parameters\nalpha = 'a'\n")
\ No newline at end of file
@@ -0,0 +1,113 @@
+import uuid
+from unittest.mock import patch
+import redis
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from ..models import Task, TaskVersion, TaskExecution
+from .. import read_cache
+
+User = get_user_model()
+
+class ReadCacheViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(name='Test Task', owner=self.user)
+        self.version = TaskVersion.objects.create(task=self.task, file='test.py')
+
+        get_patcher = patch('apps.tasks.read_cache.get', return_value=None)
+        self.cache_get = get_patcher.start()
+        self.addCleanup(get_patcher.stop)
+        put_patcher = patch('apps.tasks.read_cache.put')
+        self.cache_put = put_patcher.start()
+        self.addCleanup(put_patcher.stop)
+
+    def test_task_hit_does_not_query_the_database(self):
+        self.cache_get.return_value = {'owner': self.user.pk, 'public': False, 'data': {'name': 'Cached'}}
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/tasks/{self.task.id}/')
+        self.assertEqual(response.data, {'name': 'Cached'})
+
+    def test_task_miss_fills_the_cache(self):
+        response = self.client.get(f'/api/tasks/{self.task.id}/?fields=id,name')
+        self.assertEqual(response.status_code, 200)
+        kind, pk, variant, entry = self.cache_put.call_args.args
+        self.assertEqual((kind, pk, variant), ('task', self.task.id, 'testserver?fields=id,name'))
+        self.assertEqual(entry['data'], {'id': self.task.id, 'name': 'Test Task'})
+
+    def test_private_task_of_another_owner_is_not_served_from_cache(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        task = Task.objects.create(name='Other', owner=other)
+        self.cache_get.return_value = {'owner': other.pk, 'public': False, 'data': {'name': 'Other'}}
+        response = self.client.get(f'/api/tasks/{task.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_version_miss_fills_the_cache(self):
+        self.client.get(f'/api/versions/{self.version.id}/')
+        kind, pk, _, entry = self.cache_put.call_args.args
+        self.assertEqual((kind, pk, entry['owner']), ('version', self.version.id, self.user.pk))
+
+    def test_only_finished_status_is_cached(self):
+        execution = TaskExecution.objects.create(task_version=self.version, status='running')
+        with patch('apps.tasks.events.latest_sample', return_value=None):
+            self.client.get(f'/api/executions/{execution.id}/status/')
+        self.cache_put.assert_not_called()
+
+        TaskExecution.objects.filter(pk=execution.pk).update(status='completed')
+        self.client.get(f'/api/executions/{execution.id}/status/')
+        self.assertEqual(self.cache_put.call_args.args[:2], ('status', execution.id))
+
+    def test_changes_invalidate_after_commit(self):
+        with patch('apps.tasks.read_cache.get_redis') as get_redis:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.task.name = 'Renamed'
+                self.task.save()
+                get_redis.return_value.delete.assert_not_called()
+        get_redis.return_value.delete.assert_called_once_with(read_cache._key('task', self.task.id))
+
+    def test_activating_a_version_invalidates_the_archived_ones(self):
+        newer = TaskVersion.objects.create(task=self.task, file='newer.py', status='archived')
+        with patch('apps.tasks.read_cache.get_redis') as get_redis:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/api/versions/{newer.id}/activate/')
+        deleted = {key for call in get_redis.return_value.delete.call_args_list for key in call.args}
+        self.assertIn(read_cache._key('version', self.version.id), deleted)
+        self.assertIn(read_cache._key('task', self.task.id), deleted)
+
+class ReadCacheRedisTests(TestCase):
+    def setUp(self):
+        try:
+            read_cache.get_redis().ping()
+        except redis.RedisError:
+            self.skipTest('Redis is not available')
+        prefix = f'test:read:{uuid.uuid4().hex}'
+        override = override_settings(TASK_READ_CACHE_PREFIX=prefix)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(lambda: [read_cache.get_redis().delete(key) for key in read_cache.get_redis().scan_iter(f'{prefix}:*')])
+
+    def test_variants_hits_and_misses(self):
+        read_cache.put('task', 1, 'a', {'data': 1})
+        self.assertEqual(read_cache.get('task', 1, 'a'), {'data': 1})
+        self.assertIsNone(read_cache.get('task', 1, 'b'))
+        self.assertEqual(read_cache.stats()['task'], {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+        read_cache.reset_stats()
+        self.assertEqual(read_cache.stats()['task']['hits'], 0)
+
+    def test_invalidate_drops_every_variant(self):
+        read_cache.put('task', 1, 'a', {'data': 1})
+        read_cache.put('task', 1, 'b', {'data': 2})
+        read_cache.put('task', 2, 'a', {'data': 3})
+        with self.captureOnCommitCallbacks(execute=True):
+            read_cache.invalidate('task', 1)
+        self.assertIsNone(read_cache.get('task', 1, 'a'))
+        self.assertIsNone(read_cache.get('task', 1, 'b'))
+        self.assertEqual(read_cache.get('task', 2, 'a'), {'data': 3})
+
+    @override_settings(TASK_READ_CACHE_TTL=0)
+    def test_zero_ttl_disables_the_cache(self):
+        read_cache.put('task', 1, 'a', {'data': 1})
+        self.assertIsNone(read_cache.get('task', 1, 'a'))
\ No newline at end of file
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from ..models import ResultCacheEntry, Task, TaskVersion, TaskExecution
+from ..result_cache import cache_keys, evict_expired, input_fingerprint, lookup, result_cache_key, store_result
+
+User = get_user_model()
+
+class ResultCacheKeyTests(TestCase):
+    def test_key_depends_on_every_input(self):
+        base = result_cache_key(1, 'abc', 'numpy', [])
+        self.assertEqual(base, result_cache_key(1, 'abc', 'numpy', []))
+        self.assertNotEqual(base, result_cache_key(2, 'abc', 'numpy', []))
+        self.assertNotEqual(base, result_cache_key(1, 'abd', 'numpy', []))
+        self.assertNotEqual(base, result_cache_key(1, 'abc', 'pandas', []))
+        self.assertNotEqual(base, result_cache_key(1, 'abc', 'numpy', [], {'n': 1}))
+
+    def test_input_files_are_fingerprinted(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        with open(os.path.join(root, 'data.csv'), 'w') as f:
+            f.write('a')
+        with override_settings(TASK_INPUTS_ROOT=root):
+            before = result_cache_key(1, 'abc', '', ['data.csv'])
+            with open(os.path.join(root, 'data.csv'), 'a') as f:
+                f.write('b')
+            self.assertNotEqual(before, result_cache_key(1, 'abc', '', ['data.csv']))
+
+    def test_paths_outside_the_inputs_root_are_ignored(self):
+        with override_settings(TASK_INPUTS_ROOT=tempfile.gettempdir()):
+            self.assertIsNone(input_fingerprint('/etc/passwd'))
+            self.assertIsNone(input_fingerprint('../etc/passwd'))
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.task = Task.objects.create(name='Pure', owner=self.user, cache_results=True, cache_ttl=60)
+        self.version = TaskVersion.objects.create(task=self.task, file='test.py', status='active')
+
+    def completed(self, key):
+        return TaskExecution.objects.create(task_version=self.version, status='completed', cache_key=key)
+
+    def test_only_caching_tasks_get_keys(self):
+        other = TaskVersion.objects.create(
+            task=Task.objects.create(name='Impure', owner=self.user), file='test.py'
+        )
+        keys = cache_keys([(self.version, {}), (other, {}), (self.version, {'n': 1})])
+        self.assertEqual(len(set(keys)), 3)
+        self.assertEqual(keys[1], '')
+
+    def test_store_and_lookup_respects_ttl(self):
+        key, = cache_keys([(self.version, {})])
+        store_result(self.completed(key))
+        entry = lookup({key: self.task.id})[key]
+        self.assertEqual(ResultCacheEntry.objects.get().hits, 1)
+
+        later = entry.expires_at + timedelta(seconds=1)
+        self.assertEqual(lookup({key: self.task.id}, now=later), {})
+        self.assertEqual(evict_expired(now=later), 1)
+
+    def test_results_are_not_shared_between_tasks(self):
+        other_user = User.objects.create_user(username='other', password='testpass123')
+        other_task = Task.objects.create(name='Pure', owner=other_user, cache_results=True)
+        other_version = TaskVersion.objects.create(task=other_task, file='test.py', status='active')
+        key, = cache_keys([(self.version, {})])
+        other_key, = cache_keys([(other_version, {})])
+        self.assertNotEqual(key, other_key)
+
+        store_result(self.completed(key))
+        self.assertEqual(lookup({key: other_task.id}), {})
+
+    @override_settings(TASK_RESULT_CACHE_MAX_ENTRIES=2)
+    def test_store_evicts_least_recently_used(self):
+        for index in range(3):
+            store_result(self.completed(f'{index:064d}'))
+            ResultCacheEntry.objects.filter(pk=f'{index:064d}').update(
+                last_used_at=timezone.now() - timedelta(minutes=10 - index)
+            )
+        store_result(self.completed(f'{3:064d}'))
+        self.assertEqual(
+            sorted(ResultCacheEntry.objects.values_list('pk', flat=True)),
+            [f'{2:064d}', f'{3:064d}']
+        )
\ No newline at end of file
@@ -0,0 +1,62 @@
+import subprocess
+import sys
+from django.test import SimpleTestCase, override_settings
+from ..sampling import ResourceSampler, decode_series, downsample, encode_series
+
+class ResourceSamplerTests(SimpleTestCase):
+    def spawn(self, code):
+        process = subprocess.Popen([sys.executable, '-c', code])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        return process
+
+    def test_samples_process_tree(self):
+        process = self.spawn(
+            'import subprocess, sys, time\n'
+            'child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(2)"])\n'
+            'end = time.time() + 0.6\n'
+            'while time.time() < end: pass\n'
+            'child.kill()'
+        )
+        sampler = ResourceSampler(process.pid, interval=0.05, max_samples=1000).start()
+        process.wait()
+        data = sampler.stop()
+
+        series = decode_series(data)
+        self.assertEqual(data['count'], len(series['t']))
+        self.assertGreater(data['count'], 3)
+        self.assertGreater(max(series['rss']), 0)
+        self.assertGreater(max(series['cpu']), 10)
+        self.assertGreaterEqual(max(series['threads']), 2)
+
+    def test_halves_resolution_when_full(self):
+        process = self.spawn('import time; time.sleep(0.5)')
+        sampler = ResourceSampler(process.pid, interval=0.02, max_samples=8).start()
+        process.wait()
+        data = sampler.stop()
+        self.assertLess(data['count'], 8)
+        self.assertGreater(data['interval'], 0.02)
+
+    @override_settings(TASK_RESOURCE_STORED_POINTS=4)
+    def test_stored_series_is_reduced(self):
+        process = self.spawn('import time; time.sleep(0.5)')
+        sampler = ResourceSampler(process.pid, interval=0.02, max_samples=1000).start()
+        process.wait()
+        sampled = len(sampler.series['t'])
+        data = sampler.stop()
+        self.assertGreater(sampled, 8)
+        self.assertLessEqual(data['count'], 4)
+        self.assertGreater(data['interval'], 0.02)
+        self.assertEqual(data['count'], len(decode_series(data)['t']))
+
+    def test_byte_counters_keep_precision(self):
+        total = 2 ** 40 + 1
+        series = decode_series(encode_series({'t': [0], 'read_bytes': [total]}, 1.0))
+        self.assertEqual(series['read_bytes'], [total])
+
+    def test_downsample_keeps_peak_memory(self):
+        series = {'t': [0, 1, 2, 3], 'cpu': [10, 30, 50, 70], 'rss': [1, 9, 2, 3]}
+        self.assertEqual(downsample(series, 2), {'t': [0, 2], 'cpu': [20, 60], 'rss': [9, 3]})
+        self.assertIs(downsample(series, 10), series)
+        with self.assertRaises(ValueError):
+            downsample(series, 0)
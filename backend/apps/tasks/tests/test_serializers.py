@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIRequestFactory
 from ..models import Task, TaskVersion, TaskExecution
@@ -27,13 +27,41 @@ class TaskSerializerTests(TestCase):
         self.assertCountEqual(
             data.keys(),
             ['id', 'name', 'description', 'owner', 'status', 'is_public',
-             'tags', 'last_run', 'created_at', 'updated_at', 'active_version']
+             'priority', 'tags', 'incremental_execution', 'cache_results', 'cache_ttl',
+             'cache_inputs', 'timeout', 'cpu_limit', 'memory_limit',
+             'last_run', 'created_at', 'updated_at',
+             'active_version']
         )
 
     def test_owner_field_content(self):
         serializer = TaskSerializer(instance=self.task, context={'request': self.request})
         self.assertEqual(serializer.data['owner'], self.user.username)
 
+    @override_settings(TASK_MAX_TIMEOUT=600, TASK_MAX_CPU_LIMIT=300, TASK_MAX_MEMORY_LIMIT=1024)
+    def test_execution_limits_are_bounded(self):
+        for field, maximum in (('timeout', 600), ('cpu_limit', 300), ('memory_limit', 1024)):
+            for value in (0, -1, maximum + 1):
+                serializer = TaskSerializer(
+                    self.task, data={field: value}, partial=True, context={'request': self.request}
+                )
+                self.assertFalse(serializer.is_valid(), (field, value))
+                self.assertIn(field, serializer.errors)
+            serializer = TaskSerializer(
+                self.task, data={field: maximum}, partial=True, context={'request': self.request}
+            )
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    @override_settings(TASK_MAX_TIMEOUT=600)
+    def test_staff_can_lift_execution_limits(self):
+        self.user.is_staff = True
+        for value in (0, 601):
+            serializer = TaskSerializer(
+                self.task, data={'timeout': value}, partial=True, context={'request': self.request}
+            )
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer = TaskSerializer(self.task, data={'timeout': -1}, partial=True, context={'request': self.request})
+        self.assertFalse(serializer.is_valid())
+
 class TaskVersionSerializerTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -96,8 +124,10 @@ class TaskExecutionSerializerTests(TestCase):
         self.assertCountEqual(
             data.keys(),
             ['id', 'task_version', 'task_name', 'version_number', 'status',
-             'logs', 'error_message', 'metrics', 'started_at', 'completed_at',
-             'triggered_by', 'triggered_by_username']
+             'logs', 'log_size', 'log_lines', 'error_message', 'metrics',
+             'started_at', 'completed_at',
+             'triggered_by', 'triggered_by_username', 'parameters', 'sweep',
+             'cached_from', 'priority', 'queued_at']
         )
 
     def test_read_only_fields(self):
@@ -0,0 +1,182 @@
+import shutil
+import signal
+import tempfile
+import time
+from unittest.mock import patch
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from ..models import ResultCacheEntry, Task, TaskVersion, TaskExecution
+from ..logstore import ExecutionLog, read_logs
+from ..tasks import execute_task
+
+User = get_user_model()
+
+class ExecuteTaskTests(TestCase):
+    def setUp(self):
+        logs_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, logs_root, ignore_errors=True)
+        override = override_settings(TASK_LOGS_ROOT=logs_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.task = Task.objects.create(
+            name='Test Task',
+            owner=self.user
+        )
+
+    def create_execution(self, source):
+        version = TaskVersion.objects.create(
+            task=self.task,
+            file=SimpleUploadedFile('job.py', source),
+            requirements='os'
+        )
+        return TaskExecution.objects.create(
+            task_version=version,
+            triggered_by=self.user
+        )
+
+    def test_python_file_runs_in_subprocess(self):
+        execution = self.create_execution(b"import os, time\nprint('pid', os.getpid())\ntime.sleep(0.2)")
+        execute_task(execution.id)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'completed')
+        self.assertEqual(execution.logs, '')
+        self.assertIn('pid', read_logs(execution))
+        self.assertEqual(execution.log_lines, 1)
+        self.assertFalse(ExecutionLog(execution.id).exists())
+        self.assertEqual(execution.metrics['returncode'], 0)
+        self.assertGreater(execution.resources['count'], 0)
+
+    def test_run_updates_only_the_changed_columns(self):
+        execution = self.create_execution(b"print('ok')")
+        with CaptureQueriesContext(connection) as queries:
+            execute_task(execution.id)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        execution_updates = [sql for sql in updates if 'tasks_taskexecution' in sql]
+        # pending -> running y running -> completed, sin reescribir logs
+        self.assertEqual(len(execution_updates), 2)
+        self.assertFalse(any('"logs"' in sql for sql in execution_updates))
+        self.assertEqual(len([sql for sql in updates if 'UPDATE "tasks_task" ' in sql]), 1)
+
+    @override_settings(TASK_LAST_RUN_RESOLUTION=60)
+    def test_last_run_is_coalesced(self):
+        first = self.create_execution(b"print('one')")
+        second = self.create_execution(b"print('two')")
+        execute_task(first.id)
+        self.task.refresh_from_db()
+        last_run = self.task.last_run
+        self.assertIsNotNone(last_run)
+        execute_task(second.id)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.last_run, last_run)
+
+    def test_failing_file_marks_execution_failed(self):
+        execution = self.create_execution(b"raise ValueError('boom')")
+        with self.assertRaises(Exception):
+            execute_task(execution.id)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'failed')
+        self.assertIn('ValueError: boom', execution.error_message)
+
+    def test_failure_to_seal_logs_still_finishes_execution(self):
+        execution = self.create_execution(b"raise ValueError('boom')")
+        with patch('apps.tasks.tasks.ExecutionLog.seal', side_effect=OSError('disk full')):
+            with self.assertRaises(Exception):
+                execute_task(execution.id)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'failed')
+        self.assertIn('ValueError: boom', execution.error_message)
+        self.assertEqual(execution.log_file, '')
+        self.assertTrue(ExecutionLog(execution.id).exists())
+
+    def test_failure_before_running_marks_execution_failed(self):
+        execution = self.create_execution(b"print('ok')")
+        with patch('apps.tasks.tasks.timezone.now', side_effect=[RuntimeError('clock'), timezone.now()]):
+            with self.assertRaises(RuntimeError):
+                execute_task(execution.id)
+        execution.refresh_from_db()
+        self.assertEqual((execution.status, execution.error_message), ('failed', 'clock'))
+
+    def test_failure_after_completion_keeps_status(self):
+        execution = self.create_execution(b"print('ok')")
+        with patch('apps.tasks.tasks.touch_last_run', side_effect=RuntimeError('db')):
+            with self.assertRaises(RuntimeError):
+                execute_task(execution.id)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'completed')
+
+    def test_completed_execution_is_stored_in_result_cache(self):
+        execution = self.create_execution(b"print('pure')")
+        execution.cache_key = 'a' * 64
+        execution.save()
+        execute_task(execution.id)
+        entry = ResultCacheEntry.objects.get()
+        self.assertEqual((entry.key, entry.execution_id), ('a' * 64, execution.id))
+
+    def test_parameters_reach_python_file(self):
+        execution = self.create_execution(
+            b"import os, sys\nprint(sys.argv[1:], os.environ['TASKFLOW_PARAMETERS'])"
+        )
+        execution.parameters = {'alpha': 0.5, 'name': 'run'}
+        execution.save()
+        execute_task(execution.id)
+        execution.refresh_from_db()
+        self.assertIn(
+            "['--alpha', '0.5', '--name', 'run'] {\"alpha\": 0.5, \"name\": \"run\"}",
+            read_logs(execution)
+        )
+
+    def test_wall_clock_limit_marks_execution_timeout(self):
+        self.task.timeout = 1
+        self.task.save()
+        execution = self.create_execution(b"import time\ntime.sleep(30)")
+        with self.assertRaises(Exception):
+            execute_task(execution.id)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'timeout')
+        self.assertIn('Wall-clock limit of 1s exceeded', execution.error_message)
+        self.assertEqual(execution.metrics['limits'], {'wall': 1})
+
+    def test_cancelled_execution_is_not_started(self):
+        execution = self.create_execution(b"print('never')")
+        TaskExecution.objects.filter(pk=execution.pk).update(status='cancelled')
+        self.assertIsNone(execute_task(execution.id))
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'cancelled')
+        self.assertIsNone(execution.started_at)
+
+    @patch('apps.tasks.cancellation.fairshare.get_redis')
+    def test_cancel_order_kills_only_the_run(self, mock_get_redis):
+        execution = self.create_execution(b"import time\ntime.sleep(30)")
+        cancel_key = f':cancel:{execution.id}'
+
+        def blpop(key, timeout):
+            # La orden de cancelar la primera ejecución llega al segundo
+            time.sleep(timeout)
+            return (key, '1') if key.endswith(cancel_key) else None
+
+        mock_get_redis.return_value.blpop.side_effect = blpop
+        started = time.monotonic()
+        with self.assertRaises(Exception):
+            execute_task(execution.id)
+        self.assertLess(time.monotonic() - started, 10)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'cancelled')
+        self.assertEqual(execution.metrics['returncode'], -signal.SIGKILL)
+        mock_get_redis.return_value.pipeline.return_value.rpush.assert_called_once_with(
+            f'taskflow:fair:cancelled:{execution.id}', 1
+        )
+
+        # El intérprete precalentado sigue vivo para la siguiente
+        following = self.create_execution(b"print('next')")
+        execute_task(following.id)
+        following.refresh_from_db()
+        self.assertEqual(following.status, 'completed')
+        self.assertTrue(following.metrics['warm_start'])
\ No newline at end of file
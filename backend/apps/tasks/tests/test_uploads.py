@@ -0,0 +1,82 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from ..models import Task, TaskUpload, TaskVersion
+from ..uploads import append_chunk, detect_requirements, expire_uploads, finalize_upload
+
+class DetectRequirementsTests(SimpleTestCase):
+    def detect(self, source):
+        return detect_requirements(BytesIO(source.encode('utf-8'))).split('\n')
+
+    def test_detects_top_level_modules(self):
+        source = (
+            "import os, numpy as np\n"
+            "from pandas.io import sql\n"
+            "import pandas\n"
+            "def run():\n"
+            "    import requests; x = 1\n"
+        )
+        self.assertEqual(self.detect(source), ['os', 'numpy', 'pandas', 'requests'])
+
+    def test_ignores_relative_imports_and_strings(self):
+        source = (
+            "from . import helpers\n"
+            "text = 'import fake'\n"
+            "from .utils import thing\n"
+            "import json\n"
+        )
+        self.assertEqual(self.detect(source), ['json'])
+
+    def test_invalid_source_returns_partial_result(self):
+        self.assertEqual(self.detect("import yaml\ndef broken(:\n"), ['yaml'])
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(TASK_UPLOADS_ROOT=root)
+        override.enable()
+        self.addCleanup(override.disable)
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        task = Task.objects.create(name='Test Task', owner=user)
+        self.upload = TaskUpload.objects.create(task=task, owner=user, filename='job.py')
+
+    def test_checksum_is_computed_while_chunks_arrive(self):
+        content = b"print('chunked')\n" * 10
+        upload = append_chunk(self.upload, 0, BytesIO(content[:50]), 50)
+        upload = append_chunk(upload, 50, BytesIO(content[50:]), len(content) - 50)
+        storage = TaskVersion._meta.get_field('file').storage
+        with patch.object(storage, '_save_temporary', wraps=storage._save_temporary) as save:
+            version = finalize_upload(upload)
+        # El storage recibe el checksum y no vuelve a leer el archivo
+        self.assertEqual(save.call_args.args[3], hashlib.sha256(content).hexdigest())
+        self.assertEqual(version.checksum, hashlib.sha256(content).hexdigest())
+
+    def test_finalize_twice_creates_one_version(self):
+        append_chunk(self.upload, 0, BytesIO(b"print('once')\n"), 14)
+        finalize_upload(self.upload)
+        with self.assertRaisesMessage(Exception, 'Upload is already finalized'):
+            finalize_upload(self.upload)
+
+    def test_abandoned_uploads_expire(self):
+        append_chunk(self.upload, 0, BytesIO(b'print(1)'), 8)
+        orphan = os.path.join(os.path.dirname(self.upload.temp_path), 'gone.part')
+        open(orphan, 'w').close()
+        os.utime(orphan, (0, 0))
+
+        self.assertEqual(expire_uploads(), 0)
+        self.assertTrue(os.path.exists(self.upload.temp_path))
+        self.assertFalse(os.path.exists(orphan))
+
+        later = timezone.now() + timedelta(seconds=24 * 60 * 60 + 1)
+        self.assertEqual(expire_uploads(now=later), 1)
+        self.assertFalse(os.path.exists(self.upload.temp_path))
+        self.assertEqual(TaskUpload.objects.get().status, 'aborted')
\ No newline at end of file
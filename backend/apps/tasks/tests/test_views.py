@@ -3,8 +3,16 @@ from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
+from django.utils import timezone
 from unittest.mock import patch
-from ..models import Task, TaskVersion, TaskExecution
+from datetime import timedelta
+from array import array
+import hashlib
+from apps.metrics.models import TaskRollup
+from ..models import ParameterSweep, ResultCacheEntry, Task, TaskVersion, TaskExecution, TaskUpload
+from ..result_cache import cache_keys
+from ..signals import execution_finished
+from ..sampling import METRICS, encode_series
 from ..tasks import execute_task
 
 User = get_user_model()
@@ -28,6 +36,27 @@ class TaskViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_list_tasks_sparse_fields(self):
+        response = self.client.get('/api/tasks/?fields=id,name,owner')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'][0],
+            {'id': self.task.id, 'name': 'Test Task', 'owner': 'testuser'}
+        )
+
+    def test_list_tasks_query_count_is_constant(self):
+        for index in range(5):
+            task = Task.objects.create(name=f'Task {index}', owner=self.user)
+            TaskVersion.objects.create(
+                task=task,
+                file=SimpleUploadedFile('test.py', b"print('hi')"),
+                status='active'
+            )
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tasks/')
+        versions = [row['active_version'] for row in response.data['results']]
+        self.assertEqual(sum(version is not None for version in versions), 5)
+
     def test_create_task(self):
         data = {
             'name': 'New Task',
@@ -38,18 +67,97 @@ class TaskViewSetTests(TestCase):
         self.assertEqual(Task.objects.count(), 2)
         self.assertEqual(response.data['name'], 'New Task')
 
-    @patch('apps.tasks.tasks.execute_task.delay')
+    def test_only_staff_can_change_priority(self):
+        response = self.client.patch(f'/api/tasks/{self.task.id}/', {'priority': 'high'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.priority, 'normal')
+
+        response = self.client.post('/api/tasks/', {'name': 'Urgent', 'priority': 'high'})
+        self.assertEqual(response.data['priority'], 'normal')
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.patch(f'/api/tasks/{self.task.id}/', {'priority': 'high'})
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.priority, 'high')
+
+    @patch('apps.tasks.dispatch.send_executions')
     def test_execute_task(self, mock_execute):
         version = TaskVersion.objects.create(
             task=self.task,
             file='test.py',
             status='active'
         )
-        response = self.client.post(f'/api/tasks/{self.task.id}/execute/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/tasks/{self.task.id}/execute/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(TaskExecution.objects.count(), 1)
         mock_execute.assert_called_once()
 
+    @patch('apps.tasks.dispatch.send_executions')
+    def test_execute_task_serves_cached_result(self, mock_execute):
+        self.task.cache_results = True
+        self.task.save()
+        version = TaskVersion.objects.create(task=self.task, file='test.py', status='active')
+        original = TaskExecution.objects.create(
+            task_version=version, status='completed', cache_key='k' * 64, metrics={'returncode': 0}
+        )
+        ResultCacheEntry.objects.create(
+            key=cache_keys([(version, {})])[0], task=self.task, execution=original,
+            last_used_at=timezone.now(), expires_at=timezone.now() + timedelta(hours=1)
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/tasks/{self.task.id}/execute/')
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['cached_from'], original.id)
+        mock_execute.assert_not_called()
+
+        response = self.client.get(f"/api/executions/{response.data['id']}/metrics/")
+        self.assertEqual(response.data['returncode'], 0)
+
+        response = self.client.post(f'/api/tasks/{self.task.id}/invalidate_cache/')
+        self.assertEqual(response.data, {'invalidated': 1})
+
+    @patch('apps.tasks.dispatch.send_executions')
+    def test_bulk_execute(self, mock_send):
+        tasks = [self.task] + [Task.objects.create(name=f'Task {i}', owner=self.user) for i in range(3)]
+        for task in tasks[:3]:
+            TaskVersion.objects.create(task=task, file='test.py', status='active')
+        other = Task.objects.create(
+            name='Other', owner=User.objects.create_user(username='other', password='testpass123')
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/tasks/bulk_execute/', {
+                'tasks': [task.id for task in tasks] + [other.id]
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['skipped'], [tasks[3].id])
+        self.assertEqual(TaskExecution.objects.filter(status='pending').count(), 3)
+        self.assertEqual(len(mock_send.call_args.args[0]), 3)
+        self.assertEqual(Task.objects.filter(last_run__isnull=False).count(), 3)
+
+    @patch('apps.tasks.dispatch.send_executions')
+    def test_bulk_execute_by_tags(self, mock_send):
+        tagged = Task.objects.create(name='Nightly', owner=self.user, tags={'schedule': 'nightly'})
+        TaskVersion.objects.create(task=tagged, file='test.py', status='active')
+        TaskVersion.objects.create(task=self.task, file='test.py', status='active')
+
+        response = self.client.post('/api/tasks/bulk_execute/', {
+            'tags': {'schedule': 'nightly'}
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual([row['task'] for row in response.data['executions']], [tagged.id])
+
+        response = self.client.post('/api/tasks/bulk_execute/', {
+            'tasks': [self.task.id], 'tags': {'schedule': 'nightly'}
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 class TaskVersionViewSetTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -109,6 +217,54 @@ class TaskVersionViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(TaskVersion.objects.count(), 0)
 
+    def test_chunked_upload(self):
+        content = b"import pandas\nprint('chunked')\n"
+        response = self.client.post(
+            '/api/versions/uploads/',
+            {'task': self.task.id, 'filename': 'job.py', 'size': len(content)},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = f"/api/versions/uploads/{response.data['id']}/"
+
+        response = self.client.put(f'{url}?offset=0', content[:10], content_type='application/octet-stream')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offset'], 10)
+
+        # Un offset que no coincide devuelve el offset actual para reanudar
+        response = self.client.put(f'{url}?offset=4', content[4:], content_type='application/octet-stream')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 10)
+
+        response = self.client.post(f'{url}finalize/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(TaskVersion.objects.count(), 0)
+
+        # Sin Content-Length no se sabe cuánto leer
+        response = self.client.put(
+            f'{url}?offset=10', content[10:], content_type='application/octet-stream', CONTENT_LENGTH=''
+        )
+        self.assertEqual(response.status_code, status.HTTP_411_LENGTH_REQUIRED)
+
+        self.client.put(f'{url}?offset=10', content[10:], content_type='application/octet-stream')
+        response = self.client.post(f'{url}finalize/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        version = TaskVersion.objects.get()
+        self.assertEqual(version.checksum, hashlib.sha256(content).hexdigest())
+        self.assertEqual(version.file_size, len(content))
+        self.assertEqual(version.requirements, 'pandas')
+        self.assertEqual(TaskUpload.objects.get().status, 'completed')
+
+    def test_chunked_upload_invalid_extension(self):
+        response = self.client.post(
+            '/api/versions/uploads/',
+            {'task': self.task.id, 'filename': 'job.txt'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(TaskUpload.objects.count(), 0)
+
     def test_activate_version(self):
         version = TaskVersion.objects.create(
             task=self.task,
@@ -146,6 +302,27 @@ class TaskExecutionViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_list_executions_is_compact(self):
+        response = self.client.get('/api/executions/')
+        row = response.data['results'][0]
+        self.assertNotIn('logs', row)
+        self.assertNotIn('metrics', row)
+        self.assertEqual(row['task_name'], 'Test Task')
+
+        response = self.client.get('/api/executions/?expand=metrics')
+        self.assertIn('metrics', response.data['results'][0])
+        self.assertIn('task_name', response.data['results'][0])
+
+    def test_executions_sparse_fields(self):
+        response = self.client.get('/api/executions/?fields=id,status')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status'})
+
+        response = self.client.get(f'/api/executions/{self.execution.id}/?fields=id,logs')
+        self.assertEqual(set(response.data), {'id', 'logs'})
+
+        response = self.client.get('/api/executions/?fields=id,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_get_execution_logs(self):
         self.execution.logs = "Test logs"
         self.execution.save()
@@ -153,6 +330,31 @@ class TaskExecutionViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['logs'], "Test logs")
 
+    def test_get_execution_logs_since_offset(self):
+        self.execution.logs = "line 1\nline 2\n"
+        self.execution.save()
+        response = self.client.get(f'/api/executions/{self.execution.id}/logs/?since=7')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['logs'], "line 2\n")
+        self.assertEqual(response.data['next_offset'], 14)
+
+        response = self.client.get(f'/api/executions/{self.execution.id}/logs/?since=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_result_of_another_owner_is_not_followed(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        other_version = TaskVersion.objects.create(task=Task.objects.create(name='Other', owner=other), file='test.py')
+        foreign = TaskExecution.objects.create(
+            task_version=other_version, status='completed', logs='secret', metrics={'secret': 1}
+        )
+        self.execution.cached_from = foreign
+        self.execution.metrics = {'cache': 'hit'}
+        self.execution.save()
+        response = self.client.get(f'/api/executions/{self.execution.id}/logs/')
+        self.assertEqual(response.data['logs'], '')
+        response = self.client.get(f'/api/executions/{self.execution.id}/metrics/')
+        self.assertEqual(response.data, {'cache': 'hit'})
+
     def test_get_execution_metrics(self):
         self.execution.metrics = {'cpu': 50, 'memory': 100}
         self.execution.save()
@@ -160,6 +362,20 @@ class TaskExecutionViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, {'cpu': 50, 'memory': 100})
 
+    def test_get_execution_metrics_series(self):
+        series = {name: array('f', range(10)) for name in METRICS}
+        self.execution.resources = encode_series(series, 1.0)
+        self.execution.save()
+
+        response = self.client.get(f'/api/executions/{self.execution.id}/metrics/?points=5')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['sample_interval'], 1.0)
+        self.assertEqual(response.data['series']['rss'], [1, 3, 5, 7, 9])
+        self.assertEqual(response.data['series']['cpu'], [0.5, 2.5, 4.5, 6.5, 8.5])
+
+        response = self.client.get(f'/api/executions/{self.execution.id}/metrics/?points=0')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_get_execution_status(self):
         response = self.client.get(f'/api/executions/{self.execution.id}/status/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -167,12 +383,119 @@ class TaskExecutionViewSetTests(TestCase):
         self.assertIn('metrics', response.data)
         self.assertIn('resources', response.data)
 
-    @patch('celery.result.AsyncResult')
-    def test_cancel_execution(self, mock_async_result):
+    @patch('apps.tasks.cancellation.fairshare')
+    def test_cancel_running_execution_waits_for_worker(self, mock_fairshare):
+        self.execution.status = 'running'
+        self.execution.save()
+        redis_client = mock_fairshare.get_redis.return_value
+        redis_client.blpop.return_value = ('key', '1')
+        response = self.client.post(f'/api/executions/{self.execution.id}/cancel/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'status': 'cancelled'})
+        redis_client.pipeline.return_value.rpush.assert_called_once_with(
+            f'taskflow:fair:cancel:{self.execution.id}', 1
+        )
+        mock_fairshare.withdraw.assert_not_called()
+
+    @patch('apps.tasks.cancellation.fairshare')
+    def test_cancel_running_execution_not_confirmed(self, mock_fairshare):
         self.execution.status = 'running'
         self.execution.save()
+        mock_fairshare.get_redis.return_value.blpop.return_value = None
+        response = self.client.post(f'/api/executions/{self.execution.id}/cancel/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data, {'status': 'cancelling'})
+
+    @patch('apps.tasks.cancellation.fairshare')
+    def test_cancel_pending_execution(self, mock_fairshare):
         response = self.client.post(f'/api/executions/{self.execution.id}/cancel/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.execution.refresh_from_db()
         self.assertEqual(self.execution.status, 'cancelled')
-        mock_async_result.assert_called_once_with('test-task-id') 
\ No newline at end of file
+        self.assertIsNotNone(self.execution.completed_at)
+        withdrawn = mock_fairshare.withdraw.call_args.args[0]
+        self.assertEqual([execution.id for execution in withdrawn], [self.execution.id])
+        mock_fairshare.get_redis.return_value.blpop.assert_not_called()
+
+    def test_cancel_finished_execution_is_rejected(self):
+        self.execution.status = 'completed'
+        self.execution.save()
+        response = self.client.post(f'/api/executions/{self.execution.id}/cancel/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('apps.tasks.cancellation.fairshare')
+    def test_bulk_cancel_sweep(self, mock_fairshare):
+        sweep = ParameterSweep.objects.create(task=self.task, task_version=self.version, owner=self.user, total=3)
+        for execution_status in ('pending', 'pending', 'running'):
+            TaskExecution.objects.create(task_version=self.version, sweep=sweep, status=execution_status)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/executions/bulk_cancel/', {'sweep': sweep.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'cancelled': 2, 'cancelling': 1})
+        self.assertEqual(sweep.executions.filter(status='cancelled').count(), 2)
+        sweep.refresh_from_db()
+        self.assertEqual(sweep.failed, 2)
+        rollup = TaskRollup.objects.get(task_version=self.version, granularity='hour')
+        self.assertEqual((rollup.count, rollup.cancelled), (2, 2))
+        # Las de fuera del barrido no se tocan
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.status, 'pending')
+
+    def test_bulk_cancel_requires_one_selector(self):
+        response = self.client.post(
+            '/api/executions/bulk_cancel/', {'task': self.task.id, 'sweep': 1}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ParameterSweepViewSetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(name='Notebook', owner=self.user)
+        self.version = TaskVersion.objects.create(task=self.task, file='test.ipynb', status='active')
+
+    @patch('apps.tasks.dispatch.send_executions')
+    def test_sweep_fans_out_and_tracks_progress(self, mock_send):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/sweeps/', {
+                'task': self.task.id,
+                'grid': {'alpha': [0.1, 0.2, 0.3], 'depth': [2, 4]},
+                'parameters': {'seed': 7},
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['total'], response.data['status']), (6, 'running'))
+        self.assertEqual(len(mock_send.call_args.args[0]), 6)
+
+        sweep = ParameterSweep.objects.get()
+        executions = list(sweep.executions.order_by('id'))
+        self.assertEqual(executions[0].parameters, {'seed': 7, 'alpha': 0.1, 'depth': 2})
+
+        for index, execution in enumerate(executions):
+            execution.status = 'completed' if index else 'failed'
+            execution.save()
+            execution_finished.send(sender=TaskExecution, execution=execution)
+
+        response = self.client.get(f'/api/sweeps/{sweep.id}/')
+        self.assertEqual(
+            (response.data['completed'], response.data['failed'], response.data['status']),
+            (5, 1, 'failed')
+        )
+        response = self.client.get(f'/api/sweeps/{sweep.id}/results/')
+        self.assertEqual([row['status'] for row in response.data][:2], ['failed', 'completed'])
+
+        response = self.client.get(f'/api/executions/?sweep={sweep.id}')
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_sweep_validation(self):
+        response = self.client.post('/api/sweeps/', {
+            'task': self.task.id, 'grid': {'not valid': [1]}
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.settings(TASK_SWEEP_MAX_POINTS=4):
+            response = self.client.post('/api/sweeps/', {
+                'task': self.task.id, 'grid': {'a': [1, 2, 3], 'b': [1, 2]}
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
@@ -0,0 +1,250 @@
+import hashlib
+import os
+import tokenize
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TaskUpload, TaskVersion
+
+READ_BLOCK_SIZE = 64 * 1024
+
+# SHA-256 en curso de las subidas cuyos bloques llegan a este proceso:
+# id -> (offset, hasher). El estado de hashlib no se puede guardar en la
+# base de datos; si un bloque llega a otro proceso se pierde y
+# finalize_upload deja que el storage vuelva a leer el archivo
+_running_hashes = OrderedDict()
+RUNNING_HASHES_MAX = 256
+
+
+class UploadError(Exception):
+    """
+    Error de validación de una subida; lleva el status HTTP a devolver
+    """
+    def __init__(self, message, status_code=400, **extra):
+        super().__init__(message)
+        self.status_code = status_code
+        self.extra = extra
+
+
+class AssembledUpload(File):
+    """
+    Archivo ya ensamblado en disco; el storage puede moverlo en lugar de
+    copiarlo y, si se conoce `checksum`, no necesita volver a leerlo
+    """
+    def __init__(self, file, name=None, checksum=None):
+        super().__init__(file, name)
+        self.checksum = checksum
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def detect_requirements(fileobj):
+    """
+    Detecta los módulos importados leyendo el archivo token a token,
+    sin cargar todo el contenido en memoria
+    """
+    modules = []
+    statement = []
+    skipping = False
+
+    try:
+        for token in tokenize.tokenize(fileobj.readline):
+            if token.type in (tokenize.NEWLINE, tokenize.ENDMARKER) or token.string == ';':
+                modules.extend(_imported_modules(statement))
+                statement = []
+                skipping = False
+            elif skipping or token.type not in (tokenize.NAME, tokenize.OP):
+                continue
+            elif not statement and token.string not in ('import', 'from'):
+                # No es un import: se ignora el resto de la sentencia
+                skipping = True
+            else:
+                statement.append(token.string)
+    except (tokenize.TokenError, SyntaxError, UnicodeDecodeError):
+        pass
+    finally:
+        fileobj.seek(0)
+
+    return '\n'.join(dict.fromkeys(modules))
+
+
+def _imported_modules(statement):
+    if not statement:
+        return []
+
+    if statement[0] == 'from':
+        # Los imports relativos no son dependencias externas
+        if len(statement) < 2 or statement[1] in ('.', '...'):
+            return []
+        return [statement[1]]
+
+    modules = []
+    expect_name = True
+    for part in statement[1:]:
+        if part == ',':
+            expect_name = True
+        elif expect_name and part.isidentifier():
+            modules.append(part)
+            expect_name = False
+    return modules
+
+
+def _running_hash(upload_id, offset):
+    """
+    Copia del hash en curso si llega hasta `offset` exactamente
+    """
+    if offset == 0:
+        return hashlib.sha256()
+    entry = _running_hashes.get(upload_id)
+    if entry is None or entry[0] != offset:
+        return None
+    return entry[1].copy()
+
+
+def _remember_hash(upload_id, offset, hasher):
+    if hasher is None:
+        _running_hashes.pop(upload_id, None)
+        return
+    _running_hashes[upload_id] = (offset, hasher)
+    _running_hashes.move_to_end(upload_id)
+    while len(_running_hashes) > RUNNING_HASHES_MAX:
+        _running_hashes.popitem(last=False)
+
+
+def running_checksum(upload):
+    """
+    SHA-256 del archivo completo si todos sus bloques pasaron por este proceso
+    """
+    entry = _running_hashes.get(upload.pk)
+    if entry is None or entry[0] != upload.offset:
+        return None
+    return entry[1].hexdigest()
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Escribe un bloque en el archivo temporal de la subida a partir de
+    `offset`, con la fila bloqueada para que dos peticiones no escriban a la
+    vez, y devuelve la subida actualizada. El hash del archivo se va
+    calculando con los bytes que se escriben
+    """
+    with transaction.atomic():
+        upload = TaskUpload.objects.select_for_update().get(pk=upload.pk)
+        _append_chunk(upload, offset, stream, length)
+    return upload
+
+
+def _append_chunk(upload, offset, stream, length):
+    if upload.status != 'uploading':
+        raise UploadError('Upload is no longer accepting chunks', status_code=409)
+
+    if offset != upload.offset:
+        raise UploadError('Unexpected offset', status_code=409, offset=upload.offset)
+
+    if length > settings.TASK_UPLOAD_CHUNK_MAX_SIZE:
+        raise UploadError('Chunk too large', status_code=413)
+
+    max_size = upload.size or settings.TASK_CHUNKED_UPLOAD_MAX_SIZE
+    if offset + length > max_size:
+        raise UploadError('File size exceeds the upload limit', status_code=413)
+
+    os.makedirs(os.path.dirname(upload.temp_path), exist_ok=True)
+    mode = 'r+b' if os.path.exists(upload.temp_path) else 'wb'
+    hasher = _running_hash(upload.pk, offset)
+    written = 0
+    with open(upload.temp_path, mode) as f:
+        f.seek(offset)
+        while written < length:
+            block = stream.read(min(READ_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            f.write(block)
+            if hasher is not None:
+                hasher.update(block)
+            written += len(block)
+        f.truncate()
+
+    upload.offset = offset + written
+    upload.save(update_fields=['offset', 'updated_at'])
+    _remember_hash(upload.pk, upload.offset, hasher)
+
+
+def finalize_upload(upload):
+    """
+    Valida el archivo ensamblado y crea la versión de la tarea. La fila queda
+    bloqueada hasta el final: dos finalize a la vez crean una sola versión
+    """
+    with transaction.atomic():
+        upload = TaskUpload.objects.select_for_update().select_related('task').get(pk=upload.pk)
+        version = _finalize_upload(upload)
+    _running_hashes.pop(upload.pk, None)
+    return version
+
+
+def _finalize_upload(upload):
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already finalized', status_code=409)
+
+    if upload.size is not None and upload.offset != upload.size:
+        raise UploadError('Upload is incomplete', status_code=409, offset=upload.offset)
+
+    if not os.path.exists(upload.temp_path) or upload.offset == 0:
+        raise UploadError('No data received')
+
+    with open(upload.temp_path, 'rb') as f:
+        requirements_text = detect_requirements(f) if upload.filename.endswith('.py') else ''
+        version = TaskVersion.objects.create(
+            task=upload.task,
+            file=AssembledUpload(f, name=upload.filename, checksum=running_checksum(upload)),
+            change_note=upload.change_note,
+            requirements=requirements_text
+        )
+
+    # Si el contenido ya existía como blob el temporal no se movió
+    if os.path.exists(upload.temp_path):
+        os.remove(upload.temp_path)
+
+    upload.status = 'completed'
+    upload.version = version
+    upload.save(update_fields=['status', 'version', 'updated_at'])
+    return version
+
+
+def abort_upload(upload):
+    if os.path.exists(upload.temp_path):
+        os.remove(upload.temp_path)
+    _running_hashes.pop(upload.pk, None)
+    upload.status = 'aborted'
+    upload.save(update_fields=['status', 'updated_at'])
+
+
+def expire_uploads(now=None):
+    """
+    Cancela las subidas sin bloques nuevos desde hace TASK_UPLOAD_EXPIRY y
+    borra los .part que ya no son de ninguna subida en curso. Devuelve
+    cuántas subidas se cancelaron
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.TASK_UPLOAD_EXPIRY)
+    expired = list(TaskUpload.objects.filter(status='uploading', updated_at__lt=cutoff))
+    for upload in expired:
+        abort_upload(upload)
+
+    root = settings.TASK_UPLOADS_ROOT
+    if os.path.isdir(root):
+        active = {str(pk) for pk in TaskUpload.objects.filter(status='uploading').values_list('pk', flat=True)}
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if not name.endswith('.part') or name[:-len('.part')] in active:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff.timestamp():
+                    os.remove(path)
+            except OSError:
+                pass
+    return len(expired)
@@ -1,12 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, TaskVersionViewSet, TaskExecutionViewSet
+from .views import (
+    ParameterSweepViewSet, TaskViewSet, TaskVersionViewSet, TaskExecutionViewSet,
+    execution_events, task_events
+)
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet, basename='task')
 router.register(r'versions', TaskVersionViewSet, basename='taskversion')
 router.register(r'executions', TaskExecutionViewSet, basename='taskexecution')
+router.register(r'sweeps', ParameterSweepViewSet, basename='parametersweep')
 
 urlpatterns = [
     path('', include(router.urls)),
+    # Server-Sent Events, servidos por el proceso ASGI
+    path('events/executions/<int:pk>/', execution_events, name='execution-events'),
+    path('events/tasks/<int:pk>/', task_events, name='task-events'),
 ] 
\ No newline at end of file
@@ -1,23 +1,59 @@
-from rest_framework import viewsets, status, decorators
+from rest_framework import viewsets, status, decorators, mixins
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.parsers import MultiPartParser, FormParser
-from django.utils import timezone
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Q
 from django.core.files.uploadedfile import UploadedFile
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 import requirements
+from redis import RedisError
 from io import StringIO
-from .models import Task, TaskVersion, TaskExecution
-from .serializers import TaskSerializer, TaskVersionSerializer, TaskExecutionSerializer
-from .tasks import execute_task
+from .models import ParameterSweep, Task, TaskVersion, TaskExecution, TaskUpload
+from .serializers import (
+    BulkCancelSerializer, BulkExecuteSerializer, ExecuteSerializer, ParameterSweepSerializer, TaskSerializer,
+    TaskVersionSerializer, TaskExecutionSerializer, TaskUploadSerializer
+)
+from . import events, fairshare, read_cache
+from .cancellation import cancel_executions, wait_for_confirmation
+from .dispatch import enqueue_executions, touch_last_run
+from .result_cache import invalidate
+from .logstore import tail
+from .filters import ExecutionFilterBackend
+from .mixins import SparseFieldsetMixin
+from .pagination import ExecutionCursorPagination, TaskCursorPagination
+from .sampling import decode_series, downsample
+from .uploads import UploadError, abort_upload, append_chunk, detect_requirements, finalize_upload
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TaskCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Task.objects.filter(owner=user) | Task.objects.filter(is_public=True)
+        return Task.objects.filter(Q(owner=user) | Q(is_public=True))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Detalle de la tarea, desde la caché de lectura mientras no cambie
+        """
+        variant = read_cache.request_variant(request)
+        entry = read_cache.get('task', kwargs['pk'], variant)
+        if entry is not None and (entry['owner'] == request.user.pk or entry['public']):
+            return Response(entry['data'])
+
+        task = self.get_object()
+        data = self.get_serializer(task).data
+        read_cache.put('task', task.pk, variant, {'owner': task.owner_id, 'public': task.is_public, 'data': data})
+        return Response(data)
 
     @decorators.action(detail=True, methods=['post'])
     def execute(self, request, pk=None):
@@ -30,24 +66,87 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        serializer = ExecuteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
         with transaction.atomic():
-            execution = TaskExecution.objects.create(
-                task_version=active_version,
-                triggered_by=request.user,
-                started_at=timezone.now()
+            # Se encola al confirmar; con caché de resultados puede salir ya completada
+            execution, = enqueue_executions(
+                [(active_version, request.user, serializer.validated_data['parameters'])]
             )
-            
-            # Iniciar tarea asíncrona
-            celery_task = execute_task.delay(execution.id)
-            execution.celery_task_id = celery_task.id
-            execution.save()
-
-            task.last_run = timezone.now()
-            task.save()
+            touch_last_run([task.pk])
 
         return Response(TaskExecutionSerializer(execution).data)
 
-class TaskVersionViewSet(viewsets.ModelViewSet):
+    @decorators.action(detail=True, methods=['post'])
+    def invalidate_cache(self, request, pk=None):
+        """
+        Descarta los resultados reutilizables de la tarea
+        """
+        task = self.get_object()
+        if task.owner != request.user:
+            return Response(
+                {'error': 'Only the task owner can invalidate its cache'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response({'invalidated': invalidate(task)})
+
+    @decorators.action(detail=True, methods=['post'])
+    def stream_ticket(self, request, pk=None):
+        """
+        Ticket para abrir /api/events/tasks/<id>/ desde EventSource
+        """
+        task = self.get_object()
+        if task.owner != request.user:
+            return Response(
+                {'error': 'Only the task owner can follow its events'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return stream_ticket_response(request, events.task_channel(task.pk), reverse('task-events', args=[task.pk]))
+
+    @decorators.action(detail=False, methods=['post'])
+    def bulk_execute(self, request):
+        """
+        Ejecuta de una vez varias tareas propias, por id (`tasks`) o por
+        etiquetas (`tags`). Las ejecuciones se insertan juntas, se encolan
+        en un grupo de Celery al confirmar y last_run se actualiza con un
+        solo UPDATE; las tareas sin versión activa se omiten.
+        """
+        serializer = BulkExecuteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        limit = settings.TASK_BULK_EXECUTE_MAX
+        rows = list(
+            Task.objects.filter(owner=request.user)
+            .filter(serializer.task_filter())
+            .order_by('id')
+            .values_list('id', 'active_version_id')[:limit + 1]
+        )
+        if len(rows) > limit:
+            return Response(
+                {'error': f'More than {limit} tasks match; narrow the selection'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        runnable = [(task_id, version_id) for task_id, version_id in rows if version_id]
+        with transaction.atomic():
+            parameters = serializer.validated_data['parameters']
+            executions = enqueue_executions(
+                (TaskVersion(pk=version_id, task_id=task_id), request.user, parameters)
+                for task_id, version_id in runnable
+            )
+            touch_last_run([task_id for task_id, _ in runnable])
+
+        return Response({
+            'count': len(executions),
+            'executions': [
+                {'id': execution.id, 'task': task_id, 'celery_task_id': execution.celery_task_id}
+                for (task_id, _), execution in zip(runnable, executions)
+            ],
+            'skipped': [task_id for task_id, version_id in rows if not version_id],
+        }, status=status.HTTP_202_ACCEPTED)
+
+class TaskVersionViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = TaskVersionSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
@@ -55,6 +154,21 @@ class TaskVersionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return TaskVersion.objects.filter(task__owner=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Detalle de la versión, desde la caché de lectura: el archivo no cambia
+        una vez subido, solo el estado al activar otra
+        """
+        variant = read_cache.request_variant(request)
+        entry = read_cache.get('version', kwargs['pk'], variant)
+        if entry is not None and entry['owner'] == request.user.pk:
+            return Response(entry['data'])
+
+        version = self.get_object()
+        data = self.get_serializer(version).data
+        read_cache.put('version', version.pk, variant, {'owner': request.user.pk, 'data': data})
+        return Response(data)
+
     @decorators.action(detail=False, methods=['post'])
     def upload(self, request):
         """
@@ -85,7 +199,7 @@ class TaskVersionViewSet(viewsets.ModelViewSet):
             )
 
         # Validar tamaño
-        if file.size > 10 * 1024 * 1024:  # 10MB
+        if file.size > settings.TASK_UPLOAD_MAX_SIZE:
             return Response(
                 {'error': 'File size exceeds 10MB limit'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -94,16 +208,7 @@ class TaskVersionViewSet(viewsets.ModelViewSet):
         # Detectar dependencias si es archivo Python
         requirements_text = ''
         if file.name.endswith('.py'):
-            content = file.read().decode('utf-8')
-            file.seek(0)
-            try:
-                # Parsear imports
-                import ast
-                tree = ast.parse(content)
-                imports = [node for node in ast.walk(tree) if isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom)]
-                requirements_text = '\n'.join(node.names[0].name.split('.')[0] for node in imports)
-            except:
-                pass
+            requirements_text = detect_requirements(file)
 
         # Crear nueva versión
         version = TaskVersion.objects.create(
@@ -117,6 +222,79 @@ class TaskVersionViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
 
+    @decorators.action(
+        detail=False, methods=['post'], url_path='uploads',
+        parser_classes=[JSONParser, FormParser, MultiPartParser]
+    )
+    def start_upload(self, request):
+        """
+        Inicia una subida por partes; los bloques se envían con PUT
+        """
+        serializer = TaskUploadSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save()
+        return Response(TaskUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+    @decorators.action(detail=False, methods=['get', 'put', 'delete'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)')
+    def upload_chunk(self, request, upload_id=None):
+        """
+        GET devuelve el offset para reanudar, PUT añade un bloque en ?offset=N
+        y DELETE cancela la subida
+        """
+        upload = get_object_or_404(TaskUpload, pk=upload_id, owner=request.user)
+
+        if request.method == 'DELETE':
+            abort_upload(upload)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'PUT':
+            try:
+                offset = int(request.query_params.get('offset', ''))
+            except ValueError:
+                return Response(
+                    {'error': 'offset query parameter is required'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if not request.META.get('CONTENT_LENGTH'):
+                return Response(
+                    {'error': 'Content-Length header is required'},
+                    status=status.HTTP_411_LENGTH_REQUIRED
+                )
+            try:
+                length = int(request.META['CONTENT_LENGTH'])
+            except ValueError:
+                length = -1
+            if length < 0:
+                return Response(
+                    {'error': 'Invalid Content-Length header'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                # Se lee el cuerpo crudo por bloques, sin pasar por los parsers
+                upload = append_chunk(upload, offset, request.stream, length)
+            except UploadError as e:
+                return Response({'error': str(e), **e.extra}, status=e.status_code)
+
+        return Response(TaskUploadSerializer(upload).data)
+
+    @decorators.action(detail=False, methods=['post'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)/finalize')
+    def complete_upload(self, request, upload_id=None):
+        """
+        Ensambla la subida y crea la nueva versión
+        """
+        upload = get_object_or_404(TaskUpload, pk=upload_id, owner=request.user)
+
+        try:
+            version = finalize_upload(upload)
+        except UploadError as e:
+            return Response({'error': str(e), **e.extra}, status=e.status_code)
+
+        return Response(
+            TaskVersionSerializer(version, context={'request': request}).data,
+            status=status.HTTP_201_CREATED
+        )
+
     @decorators.action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
         version = self.get_object()
@@ -137,82 +315,281 @@ class TaskVersionViewSet(viewsets.ModelViewSet):
             )
         serializer.save()
 
-class TaskExecutionViewSet(viewsets.ReadOnlyModelViewSet):
+class TaskExecutionViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TaskExecutionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ExecutionCursorPagination
+    filter_backends = [ExecutionFilterBackend]
 
     def get_queryset(self):
-        return TaskExecution.objects.filter(
+        queryset = TaskExecution.objects.filter(
             task_version__task__owner=self.request.user
         )
+        if self.action == 'status':
+            queryset = queryset.defer('logs')
+        return queryset
 
     @decorators.action(detail=True)
     def logs(self, request, pk=None):
+        """
+        Log de la ejecución desde el offset `since`, como mucho `limit` bytes;
+        el cliente vuelve a pedir desde `next_offset`
+        """
         execution = self.get_object()
-        return Response({'logs': execution.logs})
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', settings.TASK_LOGS_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'since and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if since < 0 or limit <= 0:
+            return Response(
+                {'error': 'since must be >= 0 and limit > 0'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Un resultado reutilizado muestra el log de la ejecución original
+        source = execution.result_source()
+        return Response(tail(source, since, min(limit, settings.TASK_LOGS_MAX_PAGE_SIZE)))
 
     @decorators.action(detail=True)
     def metrics(self, request, pk=None):
-        execution = self.get_object()
-        return Response(execution.metrics)
+        """
+        Métricas finales y, si hay muestras, la serie de recursos reducida a
+        como mucho `points` puntos
+        """
+        execution = self.get_object().result_source()
+        data = dict(execution.metrics)
+
+        if execution.resources.get('series'):
+            try:
+                points = int(request.query_params.get('points', settings.TASK_METRICS_DEFAULT_POINTS))
+            except ValueError:
+                return Response(
+                    {'error': 'points must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if points <= 0:
+                return Response(
+                    {'error': 'points must be > 0'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            data['sample_interval'] = execution.resources['interval']
+            data['series'] = downsample(decode_series(execution.resources), points)
+
+        return Response(data)
 
     @decorators.action(detail=True)
     def status(self, request, pk=None):
         """
-        Obtener estado detallado de la ejecución
+        Obtener estado detallado de la ejecución. El de las terminadas ya no
+        cambia y se sirve desde la caché de lectura
         """
+        entry = read_cache.get('status', pk)
+        if entry is not None and entry['owner'] == request.user.pk:
+            return Response(entry['data'])
+
         execution = self.get_object()
-        
+
         data = {
             'status': execution.status,
             'started_at': execution.started_at,
             'completed_at': execution.completed_at,
-            'logs': execution.logs,
+            'log_size': execution.log_size,
+            'log_lines': execution.log_lines,
             'error_message': execution.error_message,
             'metrics': execution.metrics,
-            'resources': execution.resources,
+            # La serie completa se sirve reducida en el endpoint de métricas
+            'resources': {k: v for k, v in execution.resources.items() if k != 'series'},
         }
 
-        # Si está en ejecución, obtener métricas en tiempo real
-        if execution.status == 'running' and execution.celery_task_id:
-            from celery.result import AsyncResult
-            task = AsyncResult(execution.celery_task_id)
-            data['task_status'] = task.status
-            
-            # Obtener información del proceso si está disponible
+        # Si espera turno, posición en la cola de su usuario y espera estimada
+        if execution.status == 'pending' and execution.queued_at:
             try:
-                import psutil
-                process = psutil.Process(task.worker.pid)
-                data['current_resources'] = {
-                    'cpu_percent': process.cpu_percent(),
-                    'memory_percent': process.memory_percent(),
-                    'memory_info': dict(process.memory_info()._asdict())
-                }
-            except:
-                pass
+                data['queue'] = fairshare.queue_status(execution)
+            except RedisError:
+                data['queue'] = None
+
+        # Si está en ejecución, la última muestra de recursos que publicó el
+        # worker; para seguirla en vivo está /api/events/executions/<id>/
+        if execution.status == 'running':
+            try:
+                data['current_resources'] = events.latest_sample(execution.id)
+            except RedisError:
+                data['current_resources'] = None
+
+        if execution.status in events.FINISHED_STATUSES:
+            read_cache.put('status', execution.pk, '', {'owner': request.user.pk, 'data': data})
 
         return Response(data)
 
     @decorators.action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """
-        Cancelar una ejecución en curso
+        Cancelar una ejecución pendiente o en curso. Una en curso queda
+        cancelada cuando su worker confirma que la ha parado; si no lo hace a
+        tiempo se responde 202 y la cancelación sigue adelante
         """
         execution = self.get_object()
-        
-        if execution.status != 'running':
+
+        if execution.status not in ('pending', 'running'):
             return Response(
-                {'error': 'Only running executions can be cancelled'},
+                {'error': 'Only pending or running executions can be cancelled'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if execution.celery_task_id:
-            from celery.result import AsyncResult
-            task = AsyncResult(execution.celery_task_id)
-            task.revoke(terminate=True)
+        result = cancel_executions(TaskExecution.objects.filter(pk=execution.pk))
+        if result['cancelling'] and not wait_for_confirmation(
+            execution.pk, settings.TASK_CANCEL_CONFIRM_TIMEOUT
+        ):
+            return Response({'status': 'cancelling'}, status=status.HTTP_202_ACCEPTED)
+
+        return Response({'status': 'cancelled'})
+
+    @decorators.action(detail=True, methods=['post'])
+    def stream_ticket(self, request, pk=None):
+        """
+        Ticket para abrir /api/events/executions/<id>/ desde EventSource
+        """
+        execution = self.get_object()
+        return stream_ticket_response(
+            request, events.execution_channel(execution.pk), reverse('execution-events', args=[execution.pk])
+        )
+
+    @decorators.action(detail=False, methods=['post'])
+    def bulk_cancel(self, request):
+        """
+        Cancelar en bloque las ejecuciones pendientes y en curso indicadas;
+        no espera a que los workers confirmen
+        """
+        serializer = BulkCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = cancel_executions(self.get_queryset().filter(serializer.execution_filter()))
+        return Response({
+            'cancelled': len(result['cancelled']),
+            'cancelling': len(result['cancelling']),
+        })
+
+
+class ParameterSweepViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Barridos de parámetros: al crearlo se lanza una ejecución por punto de
+    la rejilla y el detalle muestra el progreso
+    """
+    serializer_class = ParameterSweepSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ParameterSweep.objects.filter(owner=self.request.user)
 
-        execution.status = 'cancelled'
-        execution.completed_at = timezone.now()
-        execution.save()
+    @decorators.action(detail=True)
+    def results(self, request, pk=None):
+        """
+        Parámetros, estado y métricas de cada punto del barrido
+        """
+        sweep = self.get_object()
+        executions = sweep.executions.order_by('id').only(
+            'id', 'parameters', 'status', 'metrics', 'error_message', 'cached_from'
+        )
+        return Response([
+            {
+                'execution': execution.id,
+                'parameters': execution.parameters,
+                'status': execution.status,
+                'metrics': execution.metrics,
+                'error_message': execution.error_message,
+                'cached_from': execution.cached_from_id,
+            }
+            for execution in executions
+        ])
+
+def stream_ticket_response(request, channel, path):
+    try:
+        ticket = events.issue_ticket(request.user, channel)
+    except RedisError:
+        return Response(
+            {'error': 'Event streams are not available right now'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return Response({
+        'ticket': ticket,
+        'url': f'{path}?ticket={ticket}',
+        'expires_in': settings.TASK_EVENTS_TICKET_TTL,
+    })
+
+async def authenticate_stream(request, channel):
+    """
+    Usuario del ticket ?ticket= (EventSource no puede enviar cabeceras; ver
+    las acciones stream_ticket) o del JWT de la cabecera Authorization
+    """
+    ticket = request.GET.get('ticket')
+    if ticket is not None:
+        user_id = await sync_to_async(events.redeem_ticket)(ticket, channel)
+        if user_id is None:
+            return None
+        return await get_user_model().objects.filter(pk=user_id, is_active=True).afirst()
+
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+        return await sync_to_async(authentication.get_user)(token)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+
+def event_stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx no debe acumular la respuesta
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def execution_events(request, pk):
+    """
+    Eventos de una ejecución por SSE: su estado actual y después cambios de
+    estado, bloques de log y muestras de recursos; se cierra al terminar.
+    Necesita un servidor ASGI (servicio events de docker-compose)
+    """
+    user = await authenticate_stream(request, events.execution_channel(pk))
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    executions = TaskExecution.objects.filter(task_version__task__owner=user).select_related('task_version').defer('logs')
+    if not await executions.filter(pk=pk).aexists():
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    async def snapshot():
+        execution = await executions.aget(pk=pk)
+        return [events.encode_event(execution, 'status', events.status_data(execution))]
+
+    return event_stream_response(
+        events.stream_events([events.execution_channel(pk)], snapshot, until_finished=True)
+    )
+
+async def task_events(request, pk):
+    """
+    Eventos de todas las ejecuciones de una tarea por SSE, empezando por el
+    estado de las que están pendientes o en curso
+    """
+    user = await authenticate_stream(request, events.task_channel(pk))
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not await Task.objects.filter(pk=pk, owner=user).aexists():
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    async def snapshot():
+        active = (
+            TaskExecution.objects.filter(task_version__task_id=pk, status__in=('pending', 'running'))
+            .select_related('task_version').defer('logs').order_by('-id')[:settings.TASK_EVENTS_SNAPSHOT_SIZE]
+        )
+        return [
+            events.encode_event(execution, 'status', events.status_data(execution))
+            async for execution in active
+        ]
 
-        return Response({'status': 'cancelled'}) 
\ No newline at end of file
+    return event_stream_response(events.stream_events([events.task_channel(pk)], snapshot))
\ No newline at end of file
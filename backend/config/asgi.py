@@ -0,0 +1,14 @@
+"""
+ASGI config for TaskFlow project.
+
+Sirve los eventos en vivo de las ejecuciones (/api/events/), que mantienen
+conexiones abiertas; el resto de la API sigue en WSGI.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.production')
+
+application = get_asgi_application()
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 import environ
 
@@ -73,6 +74,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 # Database
 DATABASES = {
@@ -107,6 +109,11 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Datos privados de las ejecuciones (logs, caché de celdas, subidas a medias,
+# directorios de trabajo): fuera de MEDIA_ROOT, que nginx sirve sin
+# autenticación; solo se leen a través de la API
+PRIVATE_ROOT = env('PRIVATE_ROOT', default=str(BASE_DIR / 'private'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -130,6 +137,143 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Ejecución en bloque (POST /api/tasks/bulk_execute/)
+TASK_BULK_EXECUTE_MAX = env.int('TASK_BULK_EXECUTE_MAX', default=5000)
+
+# Caché de resultados de tareas deterministas (Task.cache_results)
+TASK_RESULT_CACHE_TTL = env.int('TASK_RESULT_CACHE_TTL', default=24 * 3600)
+TASK_RESULT_CACHE_MAX_ENTRIES = env.int('TASK_RESULT_CACHE_MAX_ENTRIES', default=100)  # por tarea
+# Raíz de los archivos de entrada de Task.cache_inputs; fuera de ella no se mira nada
+TASK_INPUTS_ROOT = env('TASK_INPUTS_ROOT', default=str(MEDIA_ROOT))
+
+# Barridos de parámetros (POST /api/sweeps/)
+TASK_SWEEP_MAX_POINTS = env.int('TASK_SWEEP_MAX_POINTS', default=1000)
+
+# Reparto de ejecuciones por usuario (ver apps.tasks.fairshare). Los workers
+# consumen las colas executions.high, executions.normal y executions.low
+TASK_QUEUE_REDIS_URL = env('TASK_QUEUE_REDIS_URL', default=CELERY_BROKER_URL)
+TASK_QUEUE_PREFIX = env('TASK_QUEUE_PREFIX', default='taskflow:fair')
+TASK_OWNER_MAX_CONCURRENCY = env.int('TASK_OWNER_MAX_CONCURRENCY', default=10)
+TASK_QUEUE_RECONCILE_INTERVAL = env.float('TASK_QUEUE_RECONCILE_INTERVAL', default=30.0)
+# El worker renueva su hueco cada HEARTBEAT_INTERVAL segundos; sin renovar
+# durante CLAIM_TIMEOUT, run_dispatcher lo recupera
+TASK_QUEUE_HEARTBEAT_INTERVAL = env.float('TASK_QUEUE_HEARTBEAT_INTERVAL', default=15.0)
+TASK_QUEUE_CLAIM_TIMEOUT = env.float('TASK_QUEUE_CLAIM_TIMEOUT', default=300.0)
+# Una pendiente despachada no late hasta que empieza: solo se vuelve a encolar
+# si sigue sin empezar tras DISPATCH_TIMEOUT (más que la espera normal en Celery)
+TASK_QUEUE_DISPATCH_TIMEOUT = env.float('TASK_QUEUE_DISPATCH_TIMEOUT', default=6 * 3600.0)
+# Segundos que POST /api/executions/<id>/cancel/ espera a que el worker confirme
+TASK_CANCEL_CONFIRM_TIMEOUT = env.float('TASK_CANCEL_CONFIRM_TIMEOUT', default=5.0)
+
+# Eventos de las ejecuciones en vivo por SSE (ver apps.tasks.events)
+TASK_EVENTS_REDIS_URL = env('TASK_EVENTS_REDIS_URL', default=CELERY_BROKER_URL)
+TASK_EVENTS_PREFIX = env('TASK_EVENTS_PREFIX', default='taskflow:events')
+TASK_EVENTS_KEEPALIVE = env.float('TASK_EVENTS_KEEPALIVE', default=15.0)
+TASK_EVENTS_CLIENT_BUFFER = env.int('TASK_EVENTS_CLIENT_BUFFER', default=1000)  # eventos por cliente
+TASK_EVENTS_LOG_CHUNK = env.int('TASK_EVENTS_LOG_CHUNK', default=64 * 1024)
+TASK_EVENTS_SNAPSHOT_SIZE = env.int('TASK_EVENTS_SNAPSHOT_SIZE', default=100)
+# Segundos de validez de un ticket de stream (POST .../stream_ticket/)
+TASK_EVENTS_TICKET_TTL = env.int('TASK_EVENTS_TICKET_TTL', default=30)
+
+# Caché de lectura de detalles de tareas y versiones y del estado de las
+# ejecuciones terminadas (ver apps.tasks.read_cache); TTL 0 la desactiva
+TASK_READ_CACHE_REDIS_URL = env('TASK_READ_CACHE_REDIS_URL', default=CELERY_BROKER_URL)
+TASK_READ_CACHE_PREFIX = env('TASK_READ_CACHE_PREFIX', default='taskflow:read')
+TASK_READ_CACHE_TTL = env.int('TASK_READ_CACHE_TTL', default=300)
+
+# Task.last_run se actualiza como mucho una vez por intervalo (segundos)
+# aunque la tarea se ejecute muchas veces seguidas
+TASK_LAST_RUN_RESOLUTION = env.int('TASK_LAST_RUN_RESOLUTION', default=60)
+
+# Límites por defecto de cada ejecución (Task.timeout, cpu_limit y memory_limit); 0 es sin límite
+TASK_DEFAULT_TIMEOUT = env.int('TASK_DEFAULT_TIMEOUT', default=3600)
+TASK_DEFAULT_CPU_LIMIT = env.int('TASK_DEFAULT_CPU_LIMIT', default=0)
+TASK_DEFAULT_MEMORY_LIMIT = env.int('TASK_DEFAULT_MEMORY_LIMIT', default=0)
+# Máximos que un usuario puede poner en su tarea; sin límite (0) o por encima
+# de estos valores solo el staff
+TASK_MAX_TIMEOUT = env.int('TASK_MAX_TIMEOUT', default=24 * 3600)
+TASK_MAX_CPU_LIMIT = env.int('TASK_MAX_CPU_LIMIT', default=24 * 3600)
+TASK_MAX_MEMORY_LIMIT = env.int('TASK_MAX_MEMORY_LIMIT', default=16 * 1024 ** 3)
+
+# Task uploads
+TASK_UPLOADS_ROOT = env('TASK_UPLOADS_ROOT', default=os.path.join(PRIVATE_ROOT, 'uploads'))
+TASK_EXECUTIONS_ROOT = env('TASK_EXECUTIONS_ROOT', default=os.path.join(PRIVATE_ROOT, 'executions'))
+TASK_UPLOAD_MAX_SIZE = 10 * 1024 * 1024  # 10MB, subida en una sola petición
+TASK_CHUNKED_UPLOAD_MAX_SIZE = env.int('TASK_CHUNKED_UPLOAD_MAX_SIZE', default=500 * 1024 * 1024)
+TASK_UPLOAD_CHUNK_MAX_SIZE = env.int('TASK_UPLOAD_CHUNK_MAX_SIZE', default=8 * 1024 * 1024)
+# Segundos sin bloques nuevos tras los que manage.py expire_uploads cancela una subida
+TASK_UPLOAD_EXPIRY = env.int('TASK_UPLOAD_EXPIRY', default=24 * 60 * 60)
+
+# Task execution environments (virtualenvs cacheados por hash de requirements)
+TASK_ENVS_ROOT = env('TASK_ENVS_ROOT', default=os.path.join(tempfile.gettempdir(), 'taskflow-envs'))
+TASK_ENVS_MAX_BYTES = env.int('TASK_ENVS_MAX_BYTES', default=5 * 1024 * 1024 * 1024)
+TASK_ENVS_BUILD_TIMEOUT = env.int('TASK_ENVS_BUILD_TIMEOUT', default=900)
+
+# Task executors (intérpretes precalentados por proceso del worker)
+TASK_EXECUTOR_PRELOAD = env.list('TASK_EXECUTOR_PRELOAD', default=['numpy', 'pandas'])
+TASK_EXECUTOR_MAX_IDLE = env.int('TASK_EXECUTOR_MAX_IDLE', default=2)
+TASK_EXECUTOR_MAX_RUNS = env.int('TASK_EXECUTOR_MAX_RUNS', default=100)
+TASK_EXECUTOR_MAX_RSS = env.int('TASK_EXECUTOR_MAX_RSS', default=1024 * 1024 * 1024)
+
+# Kernels Jupyter calientes por entorno y proceso del worker
+TASK_KERNEL_POOL_SIZE = env.int('TASK_KERNEL_POOL_SIZE', default=1)
+TASK_KERNEL_POOL_PREWARM = env.bool('TASK_KERNEL_POOL_PREWARM', default=True)
+# Máximo de kernels ociosos por proceso sumando todos los entornos
+TASK_KERNEL_POOL_MAX_IDLE = env.int('TASK_KERNEL_POOL_MAX_IDLE', default=4)
+
+# Ejecución incremental de notebooks
+TASK_NOTEBOOK_CACHE_ROOT = env('TASK_NOTEBOOK_CACHE_ROOT', default=os.path.join(PRIVATE_ROOT, 'notebook_cache'))
+TASK_NOTEBOOK_CHECKPOINT_MIN_SECONDS = env.float('TASK_NOTEBOOK_CHECKPOINT_MIN_SECONDS', default=1.0)
+# Cadenas de celdas (versión y semilla) que se conservan por tarea
+TASK_NOTEBOOK_CACHE_CHAINS = env.int('TASK_NOTEBOOK_CACHE_CHAINS', default=8)
+
+# Logs de ejecución (archivos de solo escritura al final, leídos por offset)
+TASK_LOGS_ROOT = env('TASK_LOGS_ROOT', default=os.path.join(PRIVATE_ROOT, 'logs'))
+TASK_LOGS_PAGE_SIZE = env.int('TASK_LOGS_PAGE_SIZE', default=64 * 1024)
+TASK_LOGS_MAX_PAGE_SIZE = env.int('TASK_LOGS_MAX_PAGE_SIZE', default=1024 * 1024)
+TASK_LOGS_SEGMENT_SIZE = env.int('TASK_LOGS_SEGMENT_SIZE', default=1024 * 1024)  # sin comprimir
+TASK_LOGS_COMPRESS_LEVEL = env.int('TASK_LOGS_COMPRESS_LEVEL', default=6)
+
+# Muestreo de recursos de las ejecuciones en curso
+TASK_RESOURCE_SAMPLE_INTERVAL = env.float('TASK_RESOURCE_SAMPLE_INTERVAL', default=1.0)
+TASK_RESOURCE_MAX_SAMPLES = env.int('TASK_RESOURCE_MAX_SAMPLES', default=3600)
+# Puntos que se guardan en TaskExecution.resources al terminar (unos 3 KB por métrica)
+TASK_RESOURCE_STORED_POINTS = env.int('TASK_RESOURCE_STORED_POINTS', default=300)
+TASK_METRICS_DEFAULT_POINTS = env.int('TASK_METRICS_DEFAULT_POINTS', default=200)
+
+# Scheduler (python manage.py run_scheduler)
+SCHEDULER_BATCH_SIZE = env.int('SCHEDULER_BATCH_SIZE', default=500)
+SCHEDULER_MAX_SLEEP = env.float('SCHEDULER_MAX_SLEEP', default=5.0)
+
+# Notificaciones (python manage.py run_notifier, ver apps.notifications)
+NOTIFICATIONS_REDIS_URL = env('NOTIFICATIONS_REDIS_URL', default=CELERY_BROKER_URL)
+NOTIFICATIONS_PREFIX = env('NOTIFICATIONS_PREFIX', default='taskflow:notify')
+NOTIFICATIONS_REDIS_TIMEOUT = env.float('NOTIFICATIONS_REDIS_TIMEOUT', default=5.0)
+NOTIFICATIONS_BATCH_WINDOW = env.float('NOTIFICATIONS_BATCH_WINDOW', default=60.0)
+NOTIFICATIONS_BATCH_SIZE = env.int('NOTIFICATIONS_BATCH_SIZE', default=10000)
+# Con más eventos por canal y lote se envía un resumen en vez de uno por ejecución
+NOTIFICATIONS_DIGEST_THRESHOLD = env.int('NOTIFICATIONS_DIGEST_THRESHOLD', default=3)
+NOTIFICATIONS_DIGEST_MAX_LINES = env.int('NOTIFICATIONS_DIGEST_MAX_LINES', default=20)
+NOTIFICATIONS_MAX_ATTEMPTS = env.int('NOTIFICATIONS_MAX_ATTEMPTS', default=5)
+NOTIFICATIONS_RETRY_DELAY = env.float('NOTIFICATIONS_RETRY_DELAY', default=30.0)
+NOTIFICATIONS_HTTP_TIMEOUT = env.float('NOTIFICATIONS_HTTP_TIMEOUT', default=10.0)
+NOTIFICATIONS_HTTP_POOL_SIZE = env.int('NOTIFICATIONS_HTTP_POOL_SIZE', default=4)
+# Eventos recogidos por una réplica que lleva este tiempo sin dar señales vuelven a la cola
+NOTIFICATIONS_CONSUMER_TIMEOUT = env.float('NOTIFICATIONS_CONSUMER_TIMEOUT', default=600.0)
+# Solo se aceptan webhooks de Slack bajo este prefijo
+SLACK_WEBHOOK_URL = env('SLACK_WEBHOOK_URL', default='https://hooks.slack.com/services/')
+TELEGRAM_API_URL = env('TELEGRAM_API_URL', default='https://api.telegram.org')
+TELEGRAM_BOT_TOKEN = env('TELEGRAM_BOT_TOKEN', default='')
+
+# Email
+EMAIL_HOST = env('EMAIL_HOST', default='localhost')
+EMAIL_PORT = env.int('EMAIL_PORT', default=25)
+EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=False)
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=30)
+DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='TaskFlow <noreply@taskflow.local>')
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = [
@@ -12,6 +12,9 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/', include('apps.tasks.urls')),
+    path('api/metrics/', include('apps.metrics.urls')),
+    path('api/scheduler/', include('apps.scheduler.urls')),
+    path('api/notifications/', include('apps.notifications.urls')),
 ]
 
 if settings.DEBUG: